@@ -0,0 +1,238 @@
+"""
+Async Spotify api module
+
+Defines the AsyncSpotifyApi class, an asyncio variant of SpotifyApi with the same public methods as coroutines.
+Pages are fetched through the pooled HTTP client and the shared request scheduler in worker threads, so requests of
+many playlists run concurrently in one event loop while still respecting the global Spotify request budget.
+The results are stored in the same 'spotify_playlists' and 'spotify_playlist_songs' structures as in SpotifyApi.
+
+"""
+
+import asyncio
+from collections import deque
+
+import src.assets.config as config_variables
+from src.SpotifyHandler.spotify_api import SpotifyApi, SpotifyApiError
+from src.SpotifyHandler.track import TrackList
+
+
+class AsyncSpotifyApi:
+    """
+    Class that handles spotify api responses asynchronously and gets playlists/songs of current user
+    """
+    def __init__(self, spotify_api=None, max_concurrency=None):
+        """
+        Initializes the AsyncSpotifyApi class.
+
+        Parameters:
+        - spotify_api (SpotifyApi, optional): Synchronous client whose token and results are shared with this one.
+        - max_concurrency (int, optional): Maximum number of requests in flight. Defaults to
+          config.spotify_async_concurrency.
+        """
+        self.api = spotify_api if spotify_api is not None else SpotifyApi()
+        self.max_concurrency = max_concurrency or config_variables.spotify_async_concurrency
+        self.semaphore = None
+        self.semaphore_loop = None
+
+    @property
+    def access_token(self):
+        """
+        The Spotify access token, shared with the synchronous client.
+        """
+        return self.api.access_token
+
+    @access_token.setter
+    def access_token(self, value):
+        self.api.access_token = value
+
+    @property
+    def spotify_playlists(self):
+        """
+        Playlist information by playlist name, shared with the synchronous client.
+        """
+        return self.api.spotify_playlists
+
+    @property
+    def spotify_playlist_songs(self):
+        """
+        Playlist tracks by playlist name, shared with the synchronous client.
+        """
+        return self.api.spotify_playlist_songs
+
+    def get_auth_header(self):
+        """
+        Generates an authorization header with the access token.
+
+        Returns:
+        - dict: The authorization header with the access token.
+        """
+        return self.api.get_auth_header()
+
+    async def run_blocking(self, function, *args):
+        """
+        Runs a blocking call in a worker thread, limited by the concurrency semaphore.
+
+        Parameters:
+        - function (callable): The blocking function.
+        - args: Arguments of the function.
+
+        Returns:
+        - The return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        if self.semaphore_loop is not loop:
+            # Semaphore is bound to the event loop it is first used in
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.semaphore_loop = loop
+        async with self.semaphore:
+            return await asyncio.to_thread(function, *args)
+
+    async def make_test_request(self):
+        """
+        Makes a test request to the Spotify API to verify the access token.
+
+        Returns:
+        - dict or None: The JSON response from the test request if successful, otherwise None.
+        """
+        return await self.run_blocking(self.api.make_test_request)
+
+    async def get_playlist(self, playlist_id):
+        """
+        Retrieves information about a Spotify playlist.
+
+        Parameters:
+        - playlist_id (str): The ID of the Spotify playlist.
+
+        Returns:
+        - dict or None: The JSON response containing playlist information if successful, otherwise None.
+        """
+        return await self.run_blocking(self.api.get_playlist, playlist_id)
+
+    async def get_pages(self, url, first_page):
+        """
+        Fetches all pages following the first page of a paginated response concurrently.
+
+        Parameters:
+        - url (str): The URL used to fetch the first page.
+        - first_page (dict): The first page containing 'total', 'limit' and 'offset'.
+
+        Returns:
+        - list: All pages including the first one, in order.
+        """
+        if first_page.get('next') is None or 'total' not in first_page:
+            return [first_page]
+        page_urls = self.api.get_page_urls(url, first_page)
+        pages = await asyncio.gather(*(self.run_blocking(self.api.get_page, page_url) for page_url in page_urls))
+        return [first_page, *pages]
+
+    async def get_all_playlists(self):
+        """
+        Retrieves all of the user's Spotify playlists.
+
+        The offsets of all pages are computed from the first page and the pages are fetched concurrently.
+
+        This function updates the attribute 'self.spotify_playlists' with the complete playlist information, the same
+        as SpotifyApi.get_all_playlists.
+
+        Returns:
+        - bool: True if the playlists were listed, False if the first page could not be retrieved.
+
+        Raises:
+        - SpotifyApiError: When a following page could not be retrieved. 'self.spotify_playlists' is not changed.
+        """
+        first_page = await self.run_blocking(self.api.get_user_playlists)
+        if first_page is None:
+            return False
+        playlists_info = {}
+        for page in await self.get_pages(config_variables.spotify_user_playlists_info_url, first_page):
+            self.api.check_page(config_variables.spotify_user_playlists_info_url, page)
+            playlists_info.update(self.api.get_page_playlists(page))
+
+        self.api.spotify_playlists = playlists_info
+        return True
+
+    async def get_playlist_items(self, playlist_url):
+        """
+        Retrieves the items (tracks) from a Spotify playlist, fetching its pages concurrently.
+
+        Parameters:
+        - playlist_url (str): The URL of the Spotify playlist.
+
+        Returns:
+        - TrackList: The tracks from the playlist in playlist order.
+
+        Raises:
+        - SpotifyApiError: When a page could not be retrieved.
+        """
+        first_page = self.api.check_page(playlist_url, await self.run_blocking(self.api.get_page, playlist_url))
+
+        tracks = TrackList()
+        for page in await self.get_pages(playlist_url, first_page):
+            self.api.check_page(playlist_url, page)
+            if 'items' in page:
+                tracks.extend(self.api.get_tracks(page['items']) or [])
+        return tracks
+
+    async def iter_playlist_items(self, playlist_url):
+        """
+        Yields the items (tracks) of a Spotify playlist page by page, the async counterpart of
+        SpotifyApi.iter_playlist_items.
+
+        At most max_concurrency pages are fetched ahead of the page being consumed, so memory stays bounded.
+
+        Parameters:
+        - playlist_url (str): The URL of the Spotify playlist.
+
+        Yields:
+        - Track: The tracks from the playlist in playlist order.
+
+        Raises:
+        - SpotifyApiError: When a page could not be retrieved.
+        """
+        page = await self.run_blocking(self.api.get_page, playlist_url)
+        if 'error' not in page and page.get('next') is not None and 'total' in page:
+            page_urls = iter(self.api.get_page_urls(playlist_url, page))
+            window = self.max_concurrency
+        else:
+            page_urls = None
+            window = 1
+        ahead = deque()
+        try:
+            while True:
+                self.api.check_page(playlist_url, page)
+                while len(ahead) < window:
+                    url = next(page_urls, None) if page_urls is not None else page.get('next')
+                    if url is None:
+                        break
+                    ahead.append(asyncio.ensure_future(self.run_blocking(self.api.get_page, url)))
+                    if page_urls is None:
+                        break
+                for track in self.api.get_tracks(page.get('items')) or ():
+                    yield track
+                if not ahead:
+                    break
+                page = await ahead.popleft()
+        finally:
+            for task in ahead:
+                task.cancel()
+
+    async def get_all_playlist_items(self, names=None):
+        """
+        Retrieves tracks of many playlists concurrently.
+
+        Parameters:
+        - names (list, optional): Names of playlists from 'self.spotify_playlists'. Defaults to all playlists.
+
+        This function updates the attribute 'self.spotify_playlist_songs' with the tracks of every playlist.
+        """
+        if names is None:
+            names = list(self.spotify_playlists)
+        urls = [self.spotify_playlists[name]['tracks_api']['href'] for name in names]
+        results = await asyncio.gather(*(self.get_playlist_items(url) for url in urls), return_exceptions=True)
+        for name, tracks in zip(names, results):
+            if isinstance(tracks, SpotifyApiError):
+                print(f'Getting items for {name} failed: {tracks}')
+            elif isinstance(tracks, BaseException):
+                raise tracks
+            else:
+                self.api.store_playlist_songs(name, tracks)
@@ -0,0 +1,224 @@
+"""
+Library mirror module
+
+Defines the LibraryMirror class, a local SQLite copy of the user's Spotify library: playlists, tracks and the
+membership of tracks in playlists. The app shows the mirrored library right after start and reconciles it with
+Spotify in the background, downloading tracks only of playlists whose snapshot_id changed since they were mirrored.
+Tracks are indexed by Spotify ID, ISRC and normalized title and artists, so they can also be looked up locally.
+
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from src.app.text import normalize
+from src.assets import config
+from src.SpotifyHandler.track import Track, TrackList, track_key
+
+ARTIST_SEPARATOR = '\x1f'  # separates artist names stored in one column
+
+
+class LibraryMirror:
+    """
+    Class that stores Spotify playlists and their tracks in a local database
+    """
+    def __init__(self, path=None):
+        """
+        Initializes the LibraryMirror class.
+
+        Parameters:
+        - path (str or Path, optional): Path to the SQLite database. Defaults to config.library_mirror_file in assets.
+          Use ':memory:' for a mirror that is not persisted.
+        """
+        if path is None:
+            path = Path(__file__).resolve().parent.parent / 'assets' / config.library_mirror_file
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS playlists (
+                    name TEXT PRIMARY KEY, id TEXT, snapshot_id TEXT, position INTEGER NOT NULL,
+                    images TEXT, tracks_href TEXT, total INTEGER, mirrored_snapshot_id TEXT);
+                CREATE TABLE IF NOT EXISTS tracks (
+                    key TEXT PRIMARY KEY, id TEXT, isrc TEXT, duration_ms INTEGER, artists TEXT NOT NULL,
+                    title TEXT, album TEXT, normalized_title TEXT NOT NULL, normalized_artists TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS playlist_tracks (
+                    playlist TEXT NOT NULL, position INTEGER NOT NULL, track_key TEXT NOT NULL,
+                    PRIMARY KEY (playlist, position));
+                CREATE INDEX IF NOT EXISTS tracks_id ON tracks (id);
+                CREATE INDEX IF NOT EXISTS tracks_isrc ON tracks (isrc);
+                CREATE INDEX IF NOT EXISTS tracks_normalized ON tracks (normalized_title, normalized_artists);
+                CREATE INDEX IF NOT EXISTS playlist_tracks_track ON playlist_tracks (track_key);
+            ''')
+
+    def load_playlists(self):
+        """
+        Returns the mirrored playlists in the format of SpotifyApi.spotify_playlists.
+
+        Returns:
+        - dict: Playlist information by playlist name, in the order of the user's library.
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT name, id, snapshot_id, images, tracks_href, total FROM playlists '
+                                           'ORDER BY position').fetchall()
+        return {name: {'images': json.loads(images) if images else None,
+                       'tracks_api': {'href': tracks_href, 'total': total},
+                       'id': playlist_id, 'snapshot_id': snapshot_id}
+                for name, playlist_id, snapshot_id, images, tracks_href, total in rows}
+
+    def save_playlists(self, playlists):
+        """
+        Replaces the mirrored playlists. Tracks of playlists that are no longer in the library are forgotten.
+
+        Parameters:
+        - playlists (dict): Playlist information by playlist name, as in SpotifyApi.spotify_playlists.
+        """
+        with self.lock, self.connection:
+            mirrored = dict(self.connection.execute('SELECT name, mirrored_snapshot_id FROM playlists').fetchall())
+            removed = [(name,) for name in mirrored if name not in playlists]
+            removed_keys = set()
+            for name, in removed:
+                removed_keys.update(self.playlist_track_keys(name))
+            self.connection.executemany('DELETE FROM playlist_tracks WHERE playlist = ?', removed)
+            self.connection.execute('DELETE FROM playlists')
+            self.connection.executemany(
+                'INSERT INTO playlists (name, id, snapshot_id, position, images, tracks_href, total, '
+                'mirrored_snapshot_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(name, info.get('id'), info.get('snapshot_id'), position, json.dumps(info.get('images')),
+                  (info.get('tracks_api') or {}).get('href'), (info.get('tracks_api') or {}).get('total'),
+                  mirrored.get(name))
+                 for position, (name, info) in enumerate(playlists.items())])
+            self.remove_orphaned_tracks(removed_keys)
+
+    def stale_playlists(self):
+        """
+        Returns playlists whose tracks are not mirrored or were mirrored from another snapshot.
+
+        Returns:
+        - list: Names of the playlists in library order.
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT name FROM playlists WHERE mirrored_snapshot_id IS NULL '
+                                           'OR snapshot_id IS NULL OR mirrored_snapshot_id != snapshot_id '
+                                           'ORDER BY position').fetchall()
+        return [name for name, in rows]
+
+    def save_tracks(self, name, tracks):
+        """
+        Replaces the mirrored tracks of a playlist and marks them as mirrored from its current snapshot.
+
+        Parameters:
+        - name (str): Name of the playlist.
+        - tracks (iterable): Tracks of the playlist in playlist order.
+        """
+        rows = []
+        membership = []
+        for position, track in enumerate(tracks):
+            key = track_key(track)
+            rows.append((key, track.id, track.isrc, track.duration_ms, ARTIST_SEPARATOR.join(track.artists),
+                         track.title, track.album, normalize(track.title), normalize(' '.join(track.artists))))
+            membership.append((name, position, key))
+        with self.lock, self.connection:
+            removed_keys = self.playlist_track_keys(name).difference(key for _, _, key in membership)
+            self.connection.executemany('INSERT OR REPLACE INTO tracks (key, id, isrc, duration_ms, artists, title, '
+                                        'album, normalized_title, normalized_artists) '
+                                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.execute('DELETE FROM playlist_tracks WHERE playlist = ?', (name,))
+            self.connection.executemany('INSERT INTO playlist_tracks (playlist, position, track_key) '
+                                        'VALUES (?, ?, ?)', membership)
+            self.connection.execute('UPDATE playlists SET mirrored_snapshot_id = snapshot_id WHERE name = ?', (name,))
+            self.remove_orphaned_tracks(removed_keys)
+
+    def playlist_track_keys(self, name):
+        """
+        Returns keys of the mirrored tracks of a playlist. Must be called with the lock held.
+        """
+        return {key for key, in self.connection.execute('SELECT track_key FROM playlist_tracks WHERE playlist = ?',
+                                                        (name,))}
+
+    def remove_orphaned_tracks(self, keys):
+        """
+        Removes the tracks with the keys that are in no playlist any more. Must be called with the lock held.
+
+        Only tracks removed from playlists are checked, each with a lookup in the playlist_tracks_track index, so
+        saving a playlist does not scan the whole library.
+
+        Parameters:
+        - keys (iterable): Keys of the tracks removed from playlists.
+        """
+        self.connection.executemany('DELETE FROM tracks WHERE key = ? AND NOT EXISTS '
+                                    '(SELECT 1 FROM playlist_tracks WHERE track_key = ?)',
+                                    [(key, key) for key in keys])
+
+    def load_tracks(self, name):
+        """
+        Returns the mirrored tracks of a playlist.
+
+        Parameters:
+        - name (str): Name of the playlist.
+
+        Returns:
+        - TrackList: The tracks in playlist order.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT t.title, t.artists, t.album, t.duration_ms, t.isrc, t.id FROM playlist_tracks p '
+                'JOIN tracks t ON t.key = p.track_key WHERE p.playlist = ? ORDER BY p.position', (name,)).fetchall()
+        return TrackList(self.row_to_track(row) for row in rows)
+
+    def load_mirrored_tracks(self):
+        """
+        Returns tracks of all playlists that are mirrored from their current snapshot.
+
+        Returns:
+        - dict: TrackList by playlist name.
+        """
+        stale = set(self.stale_playlists())
+        return {name: self.load_tracks(name) for name in self.load_playlists() if name not in stale}
+
+    def find_tracks(self, track_id=None, isrc=None, title=None, artists=None):
+        """
+        Looks up mirrored tracks by Spotify ID, ISRC or normalized title and artists.
+
+        Parameters:
+        - track_id (str, optional): Spotify ID of the track.
+        - isrc (str, optional): ISRC of the track.
+        - title (str, optional): Title of the track, compared after normalization.
+        - artists (iterable, optional): Artists of the track, compared after normalization. Used only with title.
+
+        Returns:
+        - list: Matching tracks.
+        """
+        if track_id is not None:
+            condition, params = 'id = ?', (track_id,)
+        elif isrc is not None:
+            condition, params = 'isrc = ?', (isrc,)
+        elif title is not None and artists is not None:
+            condition, params = 'normalized_title = ? AND normalized_artists = ?', (normalize(title),
+                                                                                   normalize(' '.join(artists)))
+        elif title is not None:
+            condition, params = 'normalized_title = ?', (normalize(title),)
+        else:
+            return []
+        with self.lock:
+            rows = self.connection.execute(f'SELECT title, artists, album, duration_ms, isrc, id FROM tracks '
+                                           f'WHERE {condition}', params).fetchall()
+        return [self.row_to_track(row) for row in rows]
+
+    @staticmethod
+    def row_to_track(row):
+        """
+        Creates a track from a database row (title, artists, album, duration_ms, isrc, id).
+        """
+        title, artists, album, duration_ms, isrc, track_id = row
+        return Track(title=title, artists=artists.split(ARTIST_SEPARATOR) if artists else (), album=album,
+                     duration_ms=duration_ms, isrc=isrc, track_id=track_id)
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self.lock:
+            self.connection.close()
@@ -15,7 +15,6 @@ import logging
 
 from flask import Flask, request
 
-from src.app.auxiliary_functions import find_files
 from src.assets import config
 
 
@@ -40,8 +39,8 @@ class MyFlask:
         Handles the Spotify callback.
 
         Retrieves the authorization code from the callback URL,
-        exchanges it for an access token, and stores the access
-        and refresh tokens in files.
+        exchanges it for an access token, and hands the access
+        and refresh tokens over to the app through the token store.
 
         Returns:
         - A message indicating the success of obtaining the access token.
@@ -54,16 +53,9 @@ class MyFlask:
         # Exchange the authorization code for an access token
         token_response = self.spotify_login.exchange_code_for_token(authorization_code, code_verifier)
 
-        # Store the access token
-        access_token = token_response.get('access_token')
-        refresh_token = token_response.get('refresh_token')
-        access_token_path, refresh_token_path = find_files()
-        with open(access_token_path, 'a', encoding='utf-8') as f:
-            f.write(access_token)
-        # print(f"\nSpotify access token writen to {access_token_path}")
-        with open(refresh_token_path, 'a', encoding='utf-8') as rf:
-            rf.write(refresh_token)
-        # print("Refresh token writen")
+        # Store the access token, subscribers of the token store are notified immediately
+        if not self.spotify_login.store_tokens(token_response):
+            return 'Obtaining access token failed. Please try again.'
 
         return 'Access token obtained successfully. You can now make API requests.'
 
@@ -0,0 +1,146 @@
+"""
+Playlist prefetcher module
+
+Defines the PlaylistPrefetcher class, which loads tracks of all user playlists in background threads after the
+playlists are listed. Playlists are taken from a priority queue, so the playlist the user clicks or hovers over
+is moved to the front and is usually already loaded when it is shown. Playlists that fail to load are reported by
+a callback and remembered, so the app can load them in the foreground when they are clicked.
+
+"""
+
+import itertools
+import queue
+import threading
+
+import src.assets.config as config_variables
+
+
+class PlaylistPrefetcher:
+    """
+    Class that fills SpotifyApi.spotify_playlist_songs in background threads
+    """
+    def __init__(self, spotify_api, on_loaded=None, workers=None, on_failed=None):
+        """
+        Initializes the PlaylistPrefetcher class.
+
+        Parameters:
+        - spotify_api (SpotifyApi): Client used to fetch playlist tracks, the results are stored in its
+          'spotify_playlist_songs'.
+        - on_loaded (callable, optional): Called from the worker thread with the playlist name after its tracks are
+          stored. It must not touch Tk widgets directly.
+        - workers (int, optional): Number of worker threads. Defaults to config.spotify_prefetch_workers.
+        - on_failed (callable, optional): Called from the worker thread with the playlist name and the exception
+          when loading its tracks failed. It must not touch Tk widgets directly.
+        """
+        self.spotify_api = spotify_api
+        self.on_loaded = on_loaded
+        self.on_failed = on_failed
+        self.workers = workers or config_variables.spotify_prefetch_workers
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.in_progress = set()
+        self.failed = {}  # playlist name -> exception of the last failed load
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def enqueue(self, names):
+        """
+        Adds playlists to the queue in the given order.
+
+        Parameters:
+        - names (iterable): Names of playlists from 'spotify_api.spotify_playlists'.
+        """
+        for position, name in enumerate(names):
+            self.queue.put((position, next(self.counter), name))
+
+    def prioritize(self, name):
+        """
+        Moves the playlist to the front of the queue. The most recently prioritized playlist is loaded first.
+
+        Parameters:
+        - name (str): Name of the playlist.
+        """
+        if name not in self.spotify_api.spotify_playlist_songs:
+            self.queue.put((-next(self.counter), 0, name))
+
+    def has_failed(self, name):
+        """
+        Returns True if the last attempt to load the playlist in background failed.
+        """
+        with self.lock:
+            return name in self.failed
+
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.run_worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """
+        Stops the worker threads. Playlists they are loading are dropped: after stop returns, no tracks are stored and
+        no callback is called, as the library may be refreshed in the meantime.
+        """
+        with self.lock:
+            self.stopped.set()
+        for _ in self.threads:
+            self.queue.put((float('-inf'), -1, None))
+
+    def join(self):
+        """
+        Blocks until all queued playlists are processed.
+        """
+        self.queue.join()
+
+    def run_worker(self):
+        """
+        Takes playlists from the queue and loads their tracks until stopped.
+        """
+        while True:
+            _, _, name = self.queue.get()
+            try:
+                if self.stopped.is_set():
+                    return
+                self.load(name)
+            finally:
+                self.queue.task_done()
+
+    def load(self, name):
+        """
+        Loads tracks of one playlist unless they are already loaded or being loaded. The result is dropped if the
+        prefetcher has been stopped meanwhile.
+
+        Parameters:
+        - name (str): Name of the playlist.
+        """
+        with self.lock:
+            if name in self.spotify_api.spotify_playlist_songs or name in self.in_progress:
+                return
+            self.in_progress.add(name)
+        try:
+            tracks_api = self.spotify_api.spotify_playlists[name]['tracks_api']
+            tracks = self.spotify_api.get_playlist_items(tracks_api['href'])
+            with self.lock:
+                if self.stopped.is_set():
+                    return
+                self.spotify_api.store_playlist_songs(name, tracks)
+        except Exception as e:
+            print(f'Prefetching {name} failed: {e}')
+            with self.lock:
+                if self.stopped.is_set():
+                    return
+                self.failed[name] = e
+            if self.on_failed is not None and not self.stopped.is_set():
+                self.on_failed(name, e)
+            return
+        finally:
+            with self.lock:
+                self.in_progress.discard(name)
+        with self.lock:
+            self.failed.pop(name, None)
+        if self.on_loaded is not None and not self.stopped.is_set():
+            self.on_loaded(name)
@@ -6,22 +6,79 @@ retrieve the user's playlists and songs.
 
 """
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
 import requests
+
 import src.assets.config as config_variables
 from src.app.auxiliary_functions import send_request, error_in_json
+from src.app.http_client import HttpClient
+from src.app.metrics import instrument
+from src.app.request_scheduler import get_scheduler
+from src.SpotifyHandler.track import Track, TrackList
+
+
+class SpotifyApiError(ValueError):
+    """
+    Error raised when a page of a Spotify API response could not be retrieved, even after the request scheduler
+    retried it
+    """
+    def __init__(self, url, error):
+        """
+        Initializes the SpotifyApiError class.
+
+        Parameters:
+        - url (str): The URL of the page.
+        - error (dict or str): The 'error' object of the response.
+        """
+        self.url = url
+        self.status = error.get('status') if isinstance(error, dict) else None
+        message = error.get('message') if isinstance(error, dict) else error
+        super().__init__(f'Spotify request {url} failed: {message}' + (f' ({self.status})' if self.status else ''))
 
 
 class SpotifyApi:
     """
     Class that handles spotify api responses and get playlists/songs of current user
     """
-    def __init__(self):
+    def __init__(self, token_manager=None, mirror=None):
+        """
+        Initializes the SpotifyApi class.
+
+        Parameters:
+        - token_manager (TokenManager, optional): Manager that keeps the access token valid. Without it the token
+          set to 'access_token' is used until it expires.
+        - mirror (LibraryMirror, optional): Local copy of the library that playlists and tracks are loaded from and
+          saved to.
+        """
+        self.token_manager = token_manager
+        self.mirror = mirror
+        self.http = HttpClient(scheduler=get_scheduler(), token_manager=token_manager)
         self.access_token = None
         self.spotify_current_playlist = None
         self.spotify_playlists = {}
         self.spotify_playlist_songs = {}
         self.spotify_chosen_songs = []
 
+    @property
+    def access_token(self):
+        """
+        The Spotify access token. Setting it also updates the default authorization header of self.http.
+        With a token manager the managed token is returned, refreshed if it is about to expire.
+        """
+        if self.token_manager is not None:
+            return self.token_manager.get_token() or self._access_token
+        return self._access_token
+
+    @access_token.setter
+    def access_token(self, value):
+        self._access_token = value
+        if value is None:
+            self.http.default_headers.pop('Authorization', None)
+        else:
+            self.http.default_headers.update(self.get_auth_header())
 
     def get_auth_header(self):
         """
@@ -32,6 +89,7 @@ class SpotifyApi:
         """
         return {"Authorization": "Bearer " + self.access_token}
 
+    @instrument('spotify.make_test_request')
     def make_test_request(self):
         """
         Makes a test request to the Spotify API to verify the access token.
@@ -44,12 +102,13 @@ class SpotifyApi:
             return None
 
         headers = self.get_auth_header()
-        response = send_request(url=url, headers=headers)
+        response = send_request(url=url, headers=headers, client=self.http)
         if not error_in_json(response):
             return response.json()
 
         return None
 
+    @instrument('spotify.get_playlist')
     def get_playlist(self, playlist_id):
         """
         Retrieves information about a Spotify playlist.
@@ -64,12 +123,13 @@ class SpotifyApi:
         headers = self.get_auth_header()
         if headers is None:
             return None
-        response = send_request(url=url, headers=headers)
+        response = send_request(url=url, headers=headers, client=self.http)
         if not error_in_json(response):
             return response.json()
 
         return None
 
+    @instrument('spotify.get_user_playlists')
     def get_user_playlists(self):
         """
         Retrieves the user's Spotify playlists.
@@ -84,35 +144,99 @@ class SpotifyApi:
         query = {
             "limit": 50
         }
-        response = send_request(url=url, headers=headers, params=query)
+        response = send_request(url=url, headers=headers, params=query, client=self.http)
         if not error_in_json(response):
             return response.json()
 
         return None
 
+    @instrument('spotify.get_all_playlists')
     def get_all_playlists(self):
         """
         Retrieves all of the user's Spotify playlists.
 
         This function iteratively fetches playlist information using paginated responses.
 
-        This function updates the class attribute 'self.spotify_playlists' with the complete playlist information.
+        This function updates the class attribute 'self.spotify_playlists' with the complete playlist information,
+        including the playlist 'id' and 'snapshot_id' used for syncing. If the first page cannot be retrieved,
+        'self.spotify_playlists' is not changed, so a network error does not look like an empty library.
+
+        Returns:
+        - bool: True if the playlists were listed, False if the first page could not be retrieved.
+
+        Raises:
+        - SpotifyApiError: When a following page could not be retrieved. 'self.spotify_playlists' is not changed.
         """
         playlists_info = {}
         response = self.get_user_playlists()
+        if response is None:
+            return False
         while response:
-            playlists_prev, playlists_next, playlists = self.get_playlists_info(response)
-            playlists_info.update(playlists)
+            playlists_info.update(self.get_page_playlists(response))
 
+            playlists_next = response['next']
             if playlists_next:
-                response = send_request(playlists_next, self.get_auth_header())
-                if response is None:
-                    break
-                response = response.json()
+                response = self.check_page(playlists_next, self.get_page(playlists_next))
             else:
                 response = None
 
         self.spotify_playlists = playlists_info
+        return True
+
+    def load_from_mirror(self):
+        """
+        Loads playlists and the tracks of playlists mirrored from their current snapshot from the library mirror,
+        without any request to Spotify.
+
+        This function updates the attributes 'self.spotify_playlists' and 'self.spotify_playlist_songs'.
+        """
+        if self.mirror is None:
+            return
+        self.spotify_playlists = self.mirror.load_playlists()
+        self.spotify_playlist_songs = self.mirror.load_mirrored_tracks()
+
+    def refresh_library(self):
+        """
+        Reconciles the library mirror with Spotify. Playlists are listed again and tracks are kept only for
+        playlists whose snapshot_id did not change, the others are loaded again on demand or by the prefetcher.
+
+        This function updates the attributes 'self.spotify_playlists' and 'self.spotify_playlist_songs'.
+
+        Returns:
+        - list: Names of playlists whose tracks have to be loaded, in library order.
+        """
+        try:
+            listed = self.get_all_playlists()
+        except SpotifyApiError as e:
+            print(f'Listing playlists failed: {e}')
+            listed = False
+        if not listed:
+            return []  # keep the library loaded before, e.g. from the mirror
+        if self.mirror is None:
+            return [name for name in self.spotify_playlists if name not in self.spotify_playlist_songs]
+        self.mirror.save_playlists(self.spotify_playlists)
+        stale = self.mirror.stale_playlists()
+        songs = {name: tracks for name, tracks in self.spotify_playlist_songs.items()
+                 if name in self.spotify_playlists and name not in stale}
+        for name, tracks in self.mirror.load_mirrored_tracks().items():
+            songs.setdefault(name, tracks)
+        self.spotify_playlist_songs = songs
+        return stale
+
+    def store_playlist_songs(self, name, tracks):
+        """
+        Stores the loaded tracks of a playlist, also in the library mirror.
+
+        Parameters:
+        - name (str): Name of the playlist.
+        - tracks (TrackList): The tracks of the playlist.
+        """
+        self.spotify_playlist_songs[name] = tracks
+        if self.mirror is not None and name in self.spotify_playlists:
+            try:
+                self.mirror.save_tracks(name, tracks)
+            except Exception as e:
+                print(f'Saving {name} to library mirror failed: {e}')
 
     @staticmethod
     def get_playlists_info(response):
@@ -138,36 +262,205 @@ class SpotifyApi:
             playlists_info[name] = ({"images": images, "tracks_api": tracks_api})
         return [playlists_prev, playlists_next, playlists_info]
 
-    def get_playlist_items(self, playlist_url):
+    @classmethod
+    def get_page_playlists(cls, response):
+        """
+        Creates the playlist information of one page of the user's playlists, as stored in 'spotify_playlists'.
+
+        Parameters:
+        - response (dict): The JSON response from a Spotify API call.
+
+        Returns:
+        - dict: Playlist information by playlist name, see get_playlists_info, with the playlist 'id' and
+          'snapshot_id' used for syncing.
+        """
+        _, _, playlists = cls.get_playlists_info(response)
+        for playlist in response['items']:
+            if playlist.get('name') in playlists:
+                playlists[playlist['name']].update(id=playlist.get('id'), snapshot_id=playlist.get('snapshot_id'))
+        return playlists
+
+    @instrument('spotify.get_playlist_items')
+    def get_playlist_items(self, playlist_url, workers=None):
         """
         Retrieves the items (tracks) from a Spotify playlist.
 
+        The first page tells the total number of tracks and the page size, so when more than one worker is allowed
+        the offsets of all remaining pages are computed from it and the pages are fetched concurrently.
+
         Parameters:
         - playlist_url (str): The URL of the Spotify playlist.
+        - workers (int, optional): Number of concurrently fetched pages. Defaults to config.spotify_page_workers,
+          1 follows the 'next' links one page at a time.
 
         Returns:
-        - list: A list containing the tracks from the playlist.
+        - TrackList: The tracks from the playlist in playlist order.
+
+        Raises:
+        - SpotifyApiError: When a page could not be retrieved.
         """
         headers = self.get_auth_header()
-        url = playlist_url
-
-        tracks = []
-        while url:
-            response = requests.get(url, headers=headers, timeout=30)
-            response_json = response.json()
-            if 'error' in response_json:
-                return response_json
-            response_next = response_json['next']
-            if 'items' in response_json:
-                items = response_json['items']
-                current = self.get_tracks(items)
-                tracks.extend(current)
-            if response_next is not None:
-                url = response_json.get('next')
+        workers = workers or config_variables.spotify_page_workers
+
+        response_json = self.check_page(playlist_url, self.get_page(playlist_url, headers))
+
+        if workers > 1 and response_json.get('next') is not None and 'total' in response_json:
+            pages = [response_json]
+            page_urls = self.get_page_urls(playlist_url, response_json)
+            with ThreadPoolExecutor(max_workers=min(workers, len(page_urls))) as executor:
+                pages.extend(executor.map(lambda url: self.get_page(url, headers), page_urls))
+        else:
+            pages = self.follow_pages(response_json, headers)
+
+        tracks = TrackList()
+        for page in pages:
+            self.check_page(playlist_url, page)
+            if 'items' in page:
+                current = self.get_tracks(page['items'])
+                tracks.extend(current or [])
+
+        return tracks
+
+    def iter_playlist_items(self, playlist_url, workers=None):
+        """
+        Yields the items (tracks) of a Spotify playlist page by page, so they can be processed while the following
+        pages are still being fetched.
+
+        At most 'workers' pages are fetched ahead of the page being consumed, so memory stays bounded even for huge
+        playlists. Pages are fetched only as the generator is consumed; closing it stops fetching.
+
+        Parameters:
+        - playlist_url (str): The URL of the Spotify playlist.
+        - workers (int, optional): Number of pages fetched ahead. Defaults to config.spotify_page_workers.
+
+        Yields:
+        - Track: The tracks from the playlist in playlist order.
+
+        Raises:
+        - SpotifyApiError: When a page could not be retrieved.
+        """
+        for page in self.iter_pages(playlist_url, workers):
+            self.check_page(playlist_url, page)
+            yield from self.get_tracks(page.get('items')) or ()
+
+    def iter_pages(self, playlist_url, workers=None):
+        """
+        Yields pages of a paginated Spotify API response in order, fetching up to 'workers' following pages in
+        background threads while a page is being consumed.
+
+        Parameters:
+        - playlist_url (str): The URL of the first page.
+        - workers (int, optional): Number of pages fetched ahead. Defaults to config.spotify_page_workers.
+
+        Returns:
+        - generator: Pages of the paginated response. Iteration stops after a page with an error.
+        """
+        headers = self.get_auth_header()
+        workers = workers or config_variables.spotify_page_workers
+        page = self.get_page(playlist_url, headers)
+        # not a with block: its exit would wait for the pages still being fetched when the generator is closed early
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            if page.get('next') is not None and 'total' in page:
+                page_urls = iter(self.get_page_urls(playlist_url, page))
+                ahead = deque(executor.submit(self.get_page, url, headers)
+                              for _, url in zip(range(workers), page_urls))
+                while True:
+                    yield page
+                    if 'error' in page or not ahead:
+                        break
+                    page = ahead.popleft().result()
+                    url = next(page_urls, None)
+                    if url is not None:
+                        ahead.append(executor.submit(self.get_page, url, headers))
             else:
+                while True:
+                    next_url = page.get('next') if 'error' not in page else None
+                    ahead = executor.submit(self.get_page, next_url, headers) if next_url else None
+                    yield page
+                    if ahead is None:
+                        break
+                    page = ahead.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def follow_pages(self, response_json, headers):
+        """
+        Yields the given page and every following page by following 'next' links one at a time.
+
+        Parameters:
+        - response_json (dict): The first page of the paginated response.
+        - headers (dict): The headers to include in the requests.
+
+        Returns:
+        - generator: Pages of the paginated response. Iteration stops after a page with an error.
+        """
+        while response_json is not None:
+            yield response_json
+            if 'error' in response_json or response_json.get('next') is None:
                 break
+            response_json = self.get_page(response_json['next'], headers)
 
-        return tracks
+    def get_page(self, url, headers=None):
+        """
+        Retrieves one page of a paginated Spotify API response.
+
+        Parameters:
+        - url (str): The URL of the page.
+        - headers (dict, optional): The headers to include in the request, added to the default auth header.
+
+        Returns:
+        - dict: The JSON response of the page, or a dict with 'error' key if the request failed after all retries of
+          the request scheduler or the response is not valid JSON.
+        """
+        try:
+            response = self.http.get(url, headers=headers)
+        except requests.exceptions.RequestException as e:
+            return {'error': {'status': None, 'message': str(e)}}
+        try:
+            return response.json()
+        except ValueError:
+            return {'error': {'status': response.status_code, 'message': 'Invalid JSON response'}}
+
+    @staticmethod
+    def check_page(url, page):
+        """
+        Checks a page returned by get_page.
+
+        Parameters:
+        - url (str): The URL the page belongs to.
+        - page (dict): The page.
+
+        Returns:
+        - dict: The page if it is valid.
+
+        Raises:
+        - SpotifyApiError: When the page is an error response.
+        """
+        if 'error' in page:
+            raise SpotifyApiError(url, page['error'])
+        return page
+
+    @staticmethod
+    def get_page_urls(playlist_url, first_page):
+        """
+        Computes URLs of all pages following the first page of a paginated Spotify API response.
+
+        Parameters:
+        - playlist_url (str): The URL used to fetch the first page.
+        - first_page (dict): The first page containing 'total', 'limit' and 'offset'.
+
+        Returns:
+        - list: URLs of the remaining pages in playlist order.
+        """
+        limit = first_page['limit']
+        url = urlparse(playlist_url)
+        query = dict(parse_qsl(url.query))
+        page_urls = []
+        for offset in range(first_page.get('offset', 0) + limit, first_page['total'], limit):
+            query.update({'offset': offset, 'limit': limit})
+            page_urls.append(urlunparse(url._replace(query=urlencode(query))))
+        return page_urls
 
     @staticmethod
     def get_tracks(response):
@@ -178,22 +471,16 @@ class SpotifyApi:
         - response (list): The list of items containing track information.
 
         Returns:
-        - list: A list containing formatted track names.
+        - TrackList: The tracks with their ID, ISRC, duration, artists, title and album.
         """
         if response and "error" in response:
             return 401
         if response:
-            tracks = []
-            i = 1
+            tracks = TrackList()
             for item in response:
                 track = item.get("track")
                 if track is None:
                     continue
-                artists = track.get('artists')
-                i += 1
-                artists_tuple = tuple(artist.get("name") for artist in artists)
-                name = track.get('name')
-                song = ','.join(artists_tuple) + f' - {name}'
-                tracks.append(song)
+                tracks.append(Track.from_api(track))
 
             return tracks
@@ -2,36 +2,58 @@
 Spotify Login Module
 
 This module handles Spotify authentication, including exchanging authorization code for tokens,
-generating the authorization URL, and checking token availability.
+refreshing the access token, generating the authorization URL, and checking token availability.
 
 """
 import base64
 import os
 from urllib.parse import urlencode
 
-import requests
-
 from src.assets import config
 from src.app import auxiliary_functions
+from src.app.http_client import HttpClient
+from src.SpotifyHandler.token_manager import TokenManager
+from src.SpotifyHandler.token_store import TokenStore
 
 
 class SpotifyLogin:
     """
     Class that handles Spotify Login and getting token
     """
-    def __init__(self):
+    def __init__(self, token_store=None):
         """
         Initializes the SpotifyLogin class.
 
+        Parameters:
+        - token_store (TokenStore, optional): Store the obtained tokens are handed over through.
+
         Attributes:
         - access_token (str or None): The Spotify access token obtained during authentication.
         - refresh_token (str or None): The Spotify refresh token obtained during authentication.
+        - http (HttpClient): Client for the token endpoint with the client credentials as default headers.
+        - token_store (TokenStore): In-memory store notifying subscribers when tokens arrive.
+        - token_manager (TokenManager): Keeps the access token in the token store valid, share it with SpotifyApi.
         """
         self.access_token = None
         self.refresh_token = None
+        self.http = HttpClient(default_headers=self.get_client_auth_header())
+        self.token_store = token_store if token_store is not None else TokenStore()
+        self.token_manager = TokenManager(self.token_store, self.refresh_access_token)
 
     @staticmethod
-    def exchange_code_for_token(authorization_code, code_verifier):
+    def get_client_auth_header():
+        """
+        Generates the headers used for requests to the Spotify token endpoint.
+
+        Returns:
+        - dict: The basic authorization header with client credentials and the form content type.
+        """
+        return {
+            'Authorization': 'Basic ' + base64.b64encode(f'{config.spotify_client_id}:{config.spotify_client_secret}'.encode()).decode(),
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+    def exchange_code_for_token(self, authorization_code, code_verifier):
         """
         Exchanges an authorization code for Spotify access and refresh tokens.
 
@@ -42,11 +64,6 @@ class SpotifyLogin:
         Returns:
         - dict: The JSON response containing access and refresh tokens.
         """
-        headers = {
-            'Authorization': 'Basic ' + base64.b64encode(f'{config.spotify_client_id}:{config.spotify_client_secret}'.encode()).decode(),
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-
         data = {
             'grant_type': 'authorization_code',
             'code': authorization_code,
@@ -54,7 +71,26 @@ class SpotifyLogin:
             'code_verifier': code_verifier
         }
 
-        response = requests.post(config.spotify_token_url, headers=headers, data=data, timeout=30)
+        response = self.http.post(config.spotify_token_url, data=data)
+        return response.json()
+
+    def refresh_access_token(self, refresh_token):
+        """
+        Exchanges a refresh token for a new Spotify access token.
+
+        Parameters:
+        - refresh_token (str): The refresh token obtained during authentication.
+
+        Returns:
+        - dict: The JSON response containing the new access token, its expiry and possibly a new refresh token.
+        """
+        data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token,
+            'client_id': config.spotify_client_id
+        }
+
+        response = self.http.post(config.spotify_token_url, data=data)
         return response.json()
 
     @staticmethod
@@ -82,22 +118,35 @@ class SpotifyLogin:
         authorization_url += '?' + urlencode(query_params)
         return authorization_url
 
+    def store_tokens(self, token_response):
+        """
+        Stores tokens from the token endpoint response and notifies the token store subscribers.
+
+        Parameters:
+        - token_response (dict): The JSON response of exchange_code_for_token.
+
+        Returns:
+        - bool: True if the response contained an access token, False otherwise.
+        """
+        access_token = token_response.get('access_token')
+        if access_token is None:
+            print(f"Spotify token exchange failed: {token_response.get('error')}")
+            return False
+        self.access_token = access_token
+        self.refresh_token = token_response.get('refresh_token') or self.refresh_token
+        self.token_store.set(access_token, token_response.get('refresh_token'), token_response.get('expires_in'))
+        return True
+
     def is_token_available(self):
         """
-         Checks if the Spotify access token is available by examining the token file.
+         Checks if a valid Spotify access token is available in the token store. An expired token is refreshed
+         if there is a refresh token, e.g. one persisted by the previous run.
 
          Returns:
          - bool: True if the access token is available, False otherwise.
          """
-        access_token_path, _ = auxiliary_functions.find_files()
-        if os.path.getsize(access_token_path) == 0:
+        access = self.token_manager.get_token()
+        if access is None:
             return False
-
-        with open(access_token_path, 'r', encoding='utf-8') as file:
-            access = file.readline()
-        # Could be done in the future be enabling refreshing token
-        # with open(refresh_token_path, 'r') as file:
-        #    refresh = file.readline()
         self.access_token = access
-        # self.refresh_token = refresh
         return True
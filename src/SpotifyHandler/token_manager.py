@@ -0,0 +1,88 @@
+"""
+Token manager module
+
+Defines the TokenManager class, which keeps the Spotify access token of a TokenStore valid. The token is refreshed
+with the refresh token shortly before it expires and again when a request is rejected with 401. Refreshes are
+single-flight: when several threads find the token stale at once, only one of them calls the token endpoint and the
+others reuse its result.
+
+"""
+
+import threading
+import time
+
+import requests
+
+from src.assets import config
+
+
+class TokenManager:
+    """
+    Class that refreshes the Spotify access token before it expires, shared by all clients and workers
+    """
+    def __init__(self, token_store, refresh, margin=None, clock=time.time):
+        """
+        Initializes the TokenManager class.
+
+        Parameters:
+        - token_store (TokenStore): Store holding the tokens, refreshed tokens are set there.
+        - refresh (callable): Function accepting the refresh token and returning the token endpoint JSON response,
+          e.g. SpotifyLogin.refresh_access_token.
+        - margin (int, optional): Seconds before expiry when the token is refreshed. Defaults to
+          config.token_refresh_margin.
+        - clock (callable, optional): Function returning current time in seconds.
+        """
+        self.token_store = token_store
+        self.refresh_function = refresh
+        self.margin = margin if margin is not None else config.token_refresh_margin
+        self.clock = clock
+        self.refresh_lock = threading.Lock()
+
+    def get_token(self):
+        """
+        Returns the access token, refreshing it first if it expires within the margin.
+
+        Returns:
+        - str or None: The access token, None if there is none.
+        """
+        store = self.token_store
+        with store.lock:
+            token, refresh_token, expires_at = store.access_token, store.refresh_token, store.expires_at
+        if token is not None and (not refresh_token or expires_at is None
+                                  or expires_at - self.margin > self.clock()):
+            return token
+        if not refresh_token:
+            return None
+        return self.refresh(token)
+
+    def refresh(self, stale_token=None):
+        """
+        Refreshes the access token unless another thread already replaced the stale one.
+
+        Parameters:
+        - stale_token (str, optional): The token that was found expired or rejected.
+
+        Returns:
+        - str or None: The current access token, None if the refresh failed and no valid token is left.
+        """
+        store = self.token_store
+        with self.refresh_lock:
+            with store.lock:
+                current, refresh_token, expires_at = store.access_token, store.refresh_token, store.expires_at
+            if current is not None and current != stale_token and (expires_at is None
+                                                                   or expires_at - self.margin > self.clock()):
+                return current  # refreshed by another thread while this one waited
+            if not refresh_token:
+                return store.get()
+            print("Refreshing Spotify access token")
+            try:
+                response = self.refresh_function(refresh_token)
+            except requests.exceptions.RequestException as e:  # also invalid JSON in the response
+                print(f'Refreshing Spotify access token failed: {e}')
+                return store.get()
+            access_token = response.get('access_token')
+            if access_token is None:
+                print(f"Refreshing Spotify access token failed: {response.get('error')}")
+                return store.get()
+            store.set(access_token, response.get('refresh_token'), response.get('expires_in'), notify=False)
+            return access_token
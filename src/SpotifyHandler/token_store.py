@@ -0,0 +1,159 @@
+"""
+Token store module
+
+Defines the TokenStore class, which keeps the Spotify tokens in memory and notifies subscribers the moment new
+tokens arrive, so the app does not have to poll token files. The tokens can optionally be persisted between runs in
+a file encrypted with Fernet; this needs the 'cryptography' package and a key in the environment variable named by
+config.token_store_key_env.
+
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.assets import config
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # encrypted persistence is optional
+    Fernet = None
+    InvalidToken = ValueError
+
+
+class TokenStore:
+    """
+    Class that holds Spotify tokens in memory and hands them over to waiting threads
+    """
+    def __init__(self, path=None, key=None):
+        """
+        Initializes the TokenStore class.
+
+        Parameters:
+        - path (str or Path, optional): File the encrypted tokens are persisted to. Defaults to
+          config.token_store_file in assets, tokens are kept only in memory if that is None.
+        - key (bytes or str, optional): Fernet key. Defaults to the environment variable config.token_store_key_env.
+        """
+        if path is None and config.token_store_file:
+            path = Path(__file__).resolve().parent.parent / 'assets' / config.token_store_file
+        key = key or os.environ.get(config.token_store_key_env)
+        self.cipher = None
+        if path is not None and key and Fernet is None:
+            print("Tokens are not persisted, install 'cryptography' to enable it")
+        elif path is not None and key:
+            self.cipher = Fernet(key)
+        self.path = Path(path) if self.cipher is not None else None
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = None
+        self.lock = threading.Lock()
+        self.available = threading.Event()
+        self.listeners = []
+        self.load()
+
+    def set(self, access_token, refresh_token=None, expires_in=None, notify=True):
+        """
+        Stores new tokens, persists them if enabled and notifies waiting threads and subscribers.
+
+        Subscribers are called in the thread that sets the tokens, e.g. the Flask request thread. They are meant for
+        a login, so a refresh of the access token sets the tokens without notifying them.
+
+        Parameters:
+        - access_token (str): The Spotify access token.
+        - refresh_token (str, optional): The Spotify refresh token. The previous one is kept if not given.
+        - expires_in (int, optional): Seconds until the access token expires.
+        - notify (bool, optional): Whether subscribers are called. Defaults to True.
+        """
+        with self.lock:
+            self.access_token = access_token
+            self.refresh_token = refresh_token or self.refresh_token
+            self.expires_at = time.time() + expires_in if expires_in else None
+            listeners = list(self.listeners) if notify else []
+        self.save()
+        self.available.set()
+        for listener in listeners:
+            listener(access_token)
+
+    def get(self):
+        """
+        Returns the access token if it is available and not expired.
+
+        Returns:
+        - str or None: The access token.
+        """
+        with self.lock:
+            if self.access_token is None or (self.expires_at is not None and self.expires_at <= time.time()):
+                return None
+            return self.access_token
+
+    def wait(self, timeout=None):
+        """
+        Blocks until an access token is available.
+
+        Parameters:
+        - timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+        - str or None: The access token, None if it did not arrive in time.
+        """
+        self.available.wait(timeout)
+        return self.get()
+
+    def subscribe(self, listener):
+        """
+        Registers a function called with the access token whenever the user logs in, i.e. tokens are set with
+        notify.
+
+        If a valid token is already stored, the listener is called immediately.
+
+        Parameters:
+        - listener (callable): Function accepting the access token.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+        token = self.get()
+        if token is not None:
+            listener(token)
+
+    def clear(self):
+        """
+        Forgets the tokens and removes the persisted file.
+        """
+        with self.lock:
+            self.access_token = None
+            self.refresh_token = None
+            self.expires_at = None
+        self.available.clear()
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+    def save(self):
+        """
+        Writes the encrypted tokens to the file if persistence is enabled.
+        """
+        if self.path is None:
+            return
+        with self.lock:
+            data = json.dumps({'access_token': self.access_token, 'refresh_token': self.refresh_token,
+                               'expires_at': self.expires_at})
+        self.path.write_bytes(self.cipher.encrypt(data.encode()))
+
+    def load(self):
+        """
+        Reads the persisted tokens if persistence is enabled and the file exists. Expired tokens are ignored.
+        """
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.cipher.decrypt(self.path.read_bytes()))
+        except (InvalidToken, ValueError) as e:
+            print(f'Stored Spotify tokens could not be read: {e}')
+            return
+        with self.lock:
+            self.access_token = data.get('access_token')
+            self.refresh_token = data.get('refresh_token')
+            self.expires_at = data.get('expires_at')
+        if self.get() is not None:
+            self.available.set()
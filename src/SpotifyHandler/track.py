@@ -0,0 +1,187 @@
+"""
+Track model module
+
+Defines the Track class, a compact record of one Spotify track, and the TrackList class, a columnar container of
+tracks. Unlike the former 'artists - name' strings they keep the Spotify ID, ISRC, duration and album, so exporters
+can match songs exactly. str() of a track still gives the 'artists - name' label used in the GUI and in searches.
+
+"""
+
+import sys
+from array import array
+
+
+def track_key(song):
+    """
+    Returns the key identifying a song, e.g. in caches.
+
+    Parameters:
+    - song (Track or str): The track or song in format 'artists - name'.
+
+    Returns:
+    - str: 'spotify:<id>' for tracks with Spotify ID, otherwise lowercase label with collapsed whitespace.
+    """
+    track_id = getattr(song, 'id', None)
+    if track_id:
+        return f'spotify:{track_id}'
+    return ' '.join(str(song).lower().split())
+
+
+class Track:
+    """
+    Class that holds information about one Spotify track
+    """
+    __slots__ = ('id', 'isrc', 'duration_ms', 'artists', 'title', 'album')
+
+    def __init__(self, title, artists=(), album=None, duration_ms=None, isrc=None, track_id=None):
+        """
+        Initializes the Track class.
+
+        Parameters:
+        - title (str): Name of the track.
+        - artists (tuple): Names of the track artists.
+        - album (str, optional): Name of the album.
+        - duration_ms (int, optional): Duration of the track in milliseconds.
+        - isrc (str, optional): International Standard Recording Code of the track.
+        - track_id (str, optional): Spotify ID of the track. Local files have none.
+        """
+        self.id = track_id
+        self.isrc = isrc
+        self.duration_ms = duration_ms
+        self.artists = tuple(artists)
+        self.title = title
+        self.album = album
+
+    @classmethod
+    def from_api(cls, track):
+        """
+        Creates a track from the track object of a Spotify API response.
+
+        Parameters:
+        - track (dict): The track object.
+
+        Returns:
+        - Track: The created track.
+        """
+        artists = tuple(sys.intern(artist.get('name') or '') for artist in track.get('artists') or ())
+        album = (track.get('album') or {}).get('name')
+        return cls(title=track.get('name'),
+                   artists=artists,
+                   album=sys.intern(album) if album else album,
+                   duration_ms=track.get('duration_ms'),
+                   isrc=(track.get('external_ids') or {}).get('isrc'),
+                   track_id=track.get('id'))
+
+    @property
+    def key(self):
+        """
+        The key identifying the track, see track_key.
+        """
+        return track_key(self)
+
+    def astuple(self):
+        """
+        Returns all fields of the track.
+
+        Returns:
+        - tuple: (id, isrc, duration_ms, artists, title, album).
+        """
+        return self.id, self.isrc, self.duration_ms, self.artists, self.title, self.album
+
+    def __str__(self):
+        return ','.join(self.artists) + f' - {self.title}'
+
+    def __repr__(self):
+        return f'Track({str(self)!r}, id={self.id!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Track):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __hash__(self):
+        return hash(self.astuple())
+
+
+class TrackList:
+    """
+    Class that stores tracks column by column and creates Track objects only when they are accessed
+    """
+    def __init__(self, tracks=()):
+        """
+        Initializes the TrackList class.
+
+        Parameters:
+        - tracks (iterable, optional): Tracks to add.
+        """
+        self.ids = []
+        self.isrcs = []
+        self.durations = array('l')  # -1 marks unknown duration
+        self.artists = []
+        self.titles = []
+        self.albums = []
+        self.extend(tracks)
+
+    def append(self, track):
+        """
+        Adds a track to the end of the list.
+
+        Parameters:
+        - track (Track): The track.
+        """
+        self.ids.append(track.id)
+        self.isrcs.append(track.isrc)
+        self.durations.append(track.duration_ms if track.duration_ms is not None else -1)
+        self.artists.append(track.artists)
+        self.titles.append(track.title)
+        self.albums.append(track.album)
+
+    def extend(self, tracks):
+        """
+        Adds tracks to the end of the list.
+
+        Parameters:
+        - tracks (iterable): Tracks or another TrackList.
+        """
+        if isinstance(tracks, TrackList):
+            self.ids.extend(tracks.ids)
+            self.isrcs.extend(tracks.isrcs)
+            self.durations.extend(tracks.durations)
+            self.artists.extend(tracks.artists)
+            self.titles.extend(tracks.titles)
+            self.albums.extend(tracks.albums)
+            return
+        for track in tracks:
+            self.append(track)
+
+    def labels(self):
+        """
+        Returns the 'artists - name' labels of all tracks.
+
+        Returns:
+        - list: Labels of the tracks.
+        """
+        return [','.join(artists) + f' - {title}' for artists, title in zip(self.artists, self.titles)]
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        duration = self.durations[index]
+        return Track(title=self.titles[index], artists=self.artists[index], album=self.albums[index],
+                     duration_ms=duration if duration >= 0 else None, isrc=self.isrcs[index],
+                     track_id=self.ids[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, TrackList):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f'TrackList({len(self)} tracks)'
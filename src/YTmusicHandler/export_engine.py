@@ -0,0 +1,232 @@
+"""
+YT Music export engine
+
+Defines the ExportEngine class, which resolves songs to YouTube Music videoIds on a bounded pool of worker threads
+and adds the found videoIds to a playlist in large batches instead of one request per song.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.app.metrics import get_metrics
+from src.assets import config
+from src.YTmusicHandler.match_cache import SongMatchCache
+from src.YTmusicHandler.matcher import TrackMatcher
+
+
+class ExportEngine:
+    """
+    Class that searches songs concurrently and pushes found videos to YT Music playlist in batches
+    """
+    def __init__(self, yt_music, workers=None, batch_size=None, cache=None, matcher=None, journal=None, present=()):
+        """
+        Initializes the ExportEngine class.
+
+        Parameters:
+        - yt_music: YTMusic object used for searching and adding songs.
+        - workers (int, optional): Number of concurrent searches. Defaults to config.yt_search_workers.
+        - batch_size (int, optional): Number of videoIds added in one request. Defaults to config.yt_add_batch_size.
+        - cache (SongMatchCache, optional): Cache checked before searching and filled with new matches.
+        - matcher (optional): Object with best_match(song, candidates) method returning (videoId, confidence).
+          Defaults to TrackMatcher.
+        - journal (ExportJournal, optional): Journal the resolved and added songs are recorded to. Songs it records
+          as added are skipped and songs it records as resolved are not searched again.
+        - present (iterable, optional): VideoIds already in the playlist. Songs matched to them count as added, they
+          are not added again.
+        """
+        self.yt_music = yt_music
+        self.cache = cache
+        self.matcher = matcher if matcher is not None else TrackMatcher()
+        self.journal = journal
+        self.present = set(present)
+        self.confidences = {}  # song key -> confidence of match found by search
+        self.exported = {}  # song key -> videoId of songs added to the playlist by export
+        self.workers = workers or config.yt_search_workers
+        self.batch_size = batch_size or config.yt_add_batch_size
+
+    def search_song(self, song):
+        """
+        Searches YouTube Music for the song and chooses the best matching result.
+
+        Parameters:
+        - song (Track or str): The track or song in format 'artists - name'.
+
+        Returns:
+        - tuple: (videoId, confidence) of the best result, videoId is None if no result is confident enough.
+        """
+        with get_metrics().timer('ytmusic.search'):
+            response = self.yt_music.search(str(song), filter='songs')
+        video_id, confidence = self.matcher.best_match(song, response)
+        if video_id is None:
+            print(f'No confident match for {song} (best confidence {confidence:.2f})')
+        return video_id, confidence
+
+    def resolve(self, songs, executor=None):
+        """
+        Resolves songs to videoIds using a bounded pool of worker threads.
+
+        Songs found in the cache are not searched again and every song is searched at most once per call.
+
+        Parameters:
+        - songs (list): List of songs to resolve.
+        - executor (ThreadPoolExecutor, optional): Pool used for searching. A new pool is created if not given.
+
+        Returns:
+        - list: VideoIds in the same order as songs, None for songs that were not found.
+        """
+        def task(song):
+            try:
+                print(f'Exporting {song}')
+                return self.search_song(song)
+            except Exception as e:
+                print(f'Error: {e}')
+                return None, 0.0
+
+        keys = [SongMatchCache.normalize_key(song) for song in songs]
+        matches = self.cache.get_many(keys) if self.cache is not None else {}
+        if self.journal is not None:
+            matches.update((key, self.journal.resolved[key]) for key in keys if key in self.journal.resolved)
+        cached = sum(key in matches for key in keys)
+        if matches:
+            print(f"Songs found in cache: {cached}")
+        if self.cache is not None:
+            get_metrics().count('cache_hits', 'match_cache', cached)
+            get_metrics().count('cache_misses', 'match_cache', len(keys) - cached)
+
+        to_search = {}
+        for song, key in zip(songs, keys):
+            if key not in matches and key not in to_search:
+                to_search[key] = song
+        if to_search:
+            if executor is None:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(to_search))) as own_executor:
+                    results = dict(zip(to_search, own_executor.map(task, to_search.values())))
+            else:
+                results = dict(zip(to_search, executor.map(task, to_search.values())))
+            self.confidences.update((key, confidence) for key, (_, confidence) in results.items())
+            found = {key: video_id for key, (video_id, _) in results.items() if video_id is not None}
+            if self.cache is not None:
+                self.cache.put_many(found)
+            if self.journal is not None:
+                self.journal.record_resolved(found)
+            matches.update(found)
+
+        return [matches.get(key) for key in keys]
+
+    def add_batch(self, playlist_id, video_ids):
+        """
+        Adds videoIds to the playlist with one request.
+
+        Duplicated videoIds are sent only once, because YT Music refuses to add the same video twice.
+
+        Parameters:
+        - playlist_id (str): The ID of the YT Music playlist.
+        - video_ids (list): VideoIds to add.
+
+        Returns:
+        - bool: True if the request succeeded, False otherwise.
+        """
+        unique_ids = list(dict.fromkeys(video_ids))
+        try:
+            with get_metrics().timer('ytmusic.add_playlist_items'):
+                status = self.yt_music.add_playlist_items(playlistId=playlist_id, videoIds=unique_ids)
+            return 'STATUS_SUCCEEDED' in status['status']
+        except Exception as e:
+            print(f'Error: {e}')
+            return False
+
+    def add(self, playlist_id, resolved):
+        """
+        Adds resolved songs to the playlist in batches.
+
+        If a batch is refused, its songs are added one by one so only the songs that really failed are reported.
+
+        Parameters:
+        - playlist_id (str): The ID of the YT Music playlist.
+        - resolved (list): List of (song, videoId) pairs.
+
+        Returns:
+        - list: Songs (first items of the pairs) for which the addition to the playlist failed.
+        """
+        errors_list = []
+        for start in range(0, len(resolved), self.batch_size):
+            batch = resolved[start:start + self.batch_size]
+            if self.add_batch(playlist_id, [video_id for _, video_id in batch]):
+                continue
+            for song, video_id in batch:
+                if not self.add_batch(playlist_id, [video_id]):
+                    errors_list.append(song)
+        return errors_list
+
+    def export(self, playlist_id, songs, on_progress=None, cancel_event=None):
+        """
+        Searches songs and adds the found ones to the playlist, one batch of songs at a time.
+
+        Songs of a batch are searched concurrently and added with one request before the next batch starts, so the
+        progress is reported continuously and the export can be cancelled between batches. Songs may be a generator,
+        e.g. SpotifyApi.iter_playlist_items, then a batch is exported as soon as its songs are retrieved and the rest
+        of the playlist is retrieved meanwhile.
+
+        Parameters:
+        - playlist_id (str): The ID of the YT Music playlist.
+        - songs (iterable): Songs to export.
+        - on_progress (callable, optional): Called after each batch with keyword arguments 'done' and 'failed',
+          the numbers of newly exported and failed songs.
+        - cancel_event (threading.Event, optional): When set, the export stops and songs that were not exported yet
+          are returned as failed. Songs of a generator that were not retrieved yet are not retrieved.
+
+        Returns:
+        - list: Songs for which the export failed, in the original order.
+        """
+        sized = hasattr(songs, '__len__')
+        if sized:
+            print(f"Total songs to export: {len(songs)}")
+        else:
+            print("Exporting songs as they are retrieved")
+        iterator = iter(songs)
+        added_before = set(self.journal.added) if self.journal is not None else ()  # added by previous runs
+        skipped = 0
+        errors_list = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    not_exported = list(iterator) if sized else []
+                    print(f"Export cancelled, {len(not_exported) or 'remaining'} songs were not exported")
+                    errors_list.extend(song for song in not_exported
+                                       if SongMatchCache.normalize_key(song) not in added_before)
+                    break
+                batch = []
+                batch_skipped = 0
+                for song in iterator:
+                    if added_before and SongMatchCache.normalize_key(song) in added_before:
+                        batch_skipped += 1
+                        continue
+                    batch.append(song)
+                    if len(batch) == self.batch_size:
+                        break
+                if batch_skipped:
+                    skipped += batch_skipped
+                    if on_progress is not None:
+                        on_progress(done=batch_skipped, failed=0)
+                if not batch:
+                    break
+                video_ids = self.resolve(batch, executor)
+                resolved = [(i, video_id) for i, video_id in enumerate(video_ids)
+                            if video_id is not None and video_id not in self.present]
+                failed = set(self.add(playlist_id, resolved))
+                batch_errors = []
+                added = []
+                for i, (song, video_id) in enumerate(zip(batch, video_ids)):
+                    if video_id is None or i in failed:
+                        batch_errors.append(song)
+                    else:
+                        added.append(SongMatchCache.normalize_key(song))
+                        self.exported[added[-1]] = video_id
+                if self.journal is not None:
+                    self.journal.record_added(added)
+                errors_list.extend(batch_errors)
+                if on_progress is not None:
+                    on_progress(done=len(batch) - len(batch_errors), failed=len(batch_errors))
+        if skipped:
+            print(f"Resumed export, {skipped} songs were added before")
+        return errors_list
@@ -0,0 +1,150 @@
+"""
+Export job module
+
+Defines the ExportJob class, which runs an export in a background thread so the GUI stays responsive. The job
+counts exported and failed songs as the export reports them, computes throughput and ETA and can be cancelled.
+
+"""
+
+import threading
+import time
+
+
+class ExportJob:
+    """
+    Class that runs export in background thread and tracks its progress
+    """
+    def __init__(self, export, total, clock=time.monotonic):
+        """
+        Initializes the ExportJob class.
+
+        Parameters:
+        - export (callable): Export function accepting keyword arguments 'on_progress' and 'cancel_event' and
+          returning the list of failed songs, e.g. a partial of YTMusicHandler.create_playlist_push_songs.
+        - total (int): Number of songs to export.
+        - clock (callable, optional): Function returning current time in seconds.
+        """
+        self.export = export
+        self.total = total
+        self.clock = clock
+        self.done = 0
+        self.failed = 0
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the export in a background thread.
+        """
+        self.started = self.clock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """
+        Runs the export and stores its result. Exceptions are stored in 'self.error'.
+        """
+        try:
+            self.result = self.export(on_progress=self.update, cancel_event=self.cancel_event)
+        except Exception as e:
+            print(f'Export failed: {e}')
+            self.error = e
+        finally:
+            self.finished = self.clock()
+
+    def update(self, done=0, failed=0):
+        """
+        Adds newly exported and failed songs to the counters. Called from the export thread.
+
+        Parameters:
+        - done (int): Number of newly exported songs.
+        - failed (int): Number of newly failed songs.
+        """
+        with self.lock:
+            self.done += done
+            self.failed += failed
+
+    def cancel(self):
+        """
+        Asks the export to stop. Songs that were not exported yet are reported as failed.
+        """
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """
+        True if the job was asked to stop.
+        """
+        return self.cancel_event.is_set()
+
+    def is_running(self):
+        """
+        Checks if the export is still running.
+
+        Returns:
+        - bool: True if the job was started and has not finished yet.
+        """
+        return self.started is not None and self.finished is None
+
+    def elapsed(self):
+        """
+        Returns seconds since the job started, until it finished.
+
+        Returns:
+        - float: Elapsed time in seconds, 0 if the job has not started.
+        """
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else self.clock()
+        return end - self.started
+
+    def throughput(self):
+        """
+        Returns the number of processed (exported or failed) songs per second.
+
+        Returns:
+        - float: Songs per second, 0 before the first song is processed.
+        """
+        elapsed = self.elapsed()
+        with self.lock:
+            processed = self.done + self.failed
+        return processed / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """
+        Estimates seconds until the export finishes from the current throughput.
+
+        Returns:
+        - float or None: Remaining seconds, None while the throughput is unknown.
+        """
+        throughput = self.throughput()
+        if throughput == 0:
+            return None
+        with self.lock:
+            remaining = self.total - self.done - self.failed
+        return max(0.0, remaining / throughput)
+
+    def snapshot(self):
+        """
+        Returns the current progress of the job.
+
+        Returns:
+        - dict: Keys 'total', 'done', 'failed', 'fraction', 'throughput', 'eta', 'running' and 'cancelled'.
+        """
+        with self.lock:
+            done, failed = self.done, self.failed
+        return {
+            'total': self.total,
+            'done': done,
+            'failed': failed,
+            'fraction': (done + failed) / self.total if self.total else 1.0,
+            'throughput': self.throughput(),
+            'eta': self.eta(),
+            'running': self.is_running(),
+            'cancelled': self.cancelled,
+        }
@@ -0,0 +1,170 @@
+"""
+Export journal module
+
+Defines the ExportJournal class, an append-only write-ahead journal of one export to a YouTube Music playlist. The
+export records the playlist it created, the videoIds songs were resolved to and the songs that were added. When the
+export is interrupted, by a crash or by closing the app, the next run of the same export replays the journal, reuses
+the playlist and continues with the songs that were not added yet instead of searching and adding everything again
+and creating duplicates. The journal is removed when the export finishes.
+
+Records are JSON lines. They are flushed after every write, but fsync, which makes them survive a power loss, is
+called only every config.export_journal_fsync_every records, so journaling stays cheap for huge exports.
+
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from src.assets import config
+from src.SpotifyHandler.track import track_key
+
+
+def default_directory():
+    """
+    Returns the directory of export journals, config.export_journal_dir in assets.
+    """
+    return Path(__file__).resolve().parent.parent / 'assets' / config.export_journal_dir
+
+
+class ExportJournal:
+    """
+    Class that records the progress of one export so that it can be resumed
+    """
+    def __init__(self, path, fsync_every=None):
+        """
+        Initializes the ExportJournal class and replays records written by a previous run.
+
+        Parameters:
+        - path (str or Path): Path to the journal file, created when the first record is written.
+        - fsync_every (int, optional): Number of records after which the file is synced to disk. Defaults to
+          config.export_journal_fsync_every.
+        """
+        self.path = Path(path)
+        self.fsync_every = fsync_every or config.export_journal_fsync_every
+        self.lock = threading.Lock()
+        self.file = None
+        self.unsynced = 0
+        self.valid_size = 0  # bytes of complete records in the file
+        self.playlist_id = None
+        self.resolved = {}  # song key -> videoId
+        self.added = set()  # keys of songs added to the playlist
+        self.replay()
+
+    @classmethod
+    def for_export(cls, target, songs, directory=None, fsync_every=None):
+        """
+        Opens the journal of an export identified by its target and songs, so a rerun of the same export finds it.
+
+        Parameters:
+        - target (str): Title or ID of the YT Music playlist.
+        - songs (list): Songs of the export.
+        - directory (str or Path, optional): Directory of journals. Defaults to default_directory().
+        - fsync_every (int, optional): See __init__.
+
+        Returns:
+        - ExportJournal: The journal, with the progress of an interrupted run if there was one.
+        """
+        if directory is None:
+            directory = default_directory()
+        digest = hashlib.sha1(target.encode())
+        for song in songs:
+            digest.update(b'\n' + track_key(song).encode())
+        return cls(Path(directory) / f'{digest.hexdigest()[:20]}.ndjson', fsync_every)
+
+    @property
+    def resumed(self):
+        """
+        True if a previous run of the export was interrupted.
+        """
+        return self.playlist_id is not None
+
+    def replay(self):
+        """
+        Reads the records of the journal file. A partly written last record is ignored and later cut off.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('partly written record')
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.valid_size += len(line)
+                if record.get('type') == 'playlist':
+                    self.playlist_id = record['playlist_id']
+                elif record.get('type') == 'resolved':
+                    self.resolved.update(record['videos'])
+                elif record.get('type') == 'added':
+                    self.added.update(record['keys'])
+
+    def write(self, record):
+        """
+        Appends a record to the journal.
+
+        Parameters:
+        - record (dict): The JSON serializable record.
+        """
+        with self.lock:
+            if self.file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+                self.file.truncate(self.valid_size)
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.fsync_every:
+                os.fsync(self.file.fileno())
+                self.unsynced = 0
+
+    def record_playlist(self, playlist_id):
+        """
+        Records the ID of the YT Music playlist the songs are exported to.
+        """
+        self.playlist_id = playlist_id
+        self.write({'type': 'playlist', 'playlist_id': playlist_id})
+
+    def record_resolved(self, videos):
+        """
+        Records videoIds that songs were resolved to.
+
+        Parameters:
+        - videos (dict): VideoIds by song key.
+        """
+        if videos:
+            self.resolved.update(videos)
+            self.write({'type': 'resolved', 'videos': videos})
+
+    def record_added(self, keys):
+        """
+        Records songs that were added to the playlist.
+
+        Parameters:
+        - keys (list): Keys of the added songs.
+        """
+        if keys:
+            self.added.update(keys)
+            self.write({'type': 'added', 'keys': list(keys)})
+
+    def close(self):
+        """
+        Syncs and closes the journal file. The journal stays, so the export can be resumed.
+        """
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+                self.unsynced = 0
+
+    def finish(self):
+        """
+        Closes and removes the journal of a finished export.
+        """
+        self.close()
+        self.path.unlink(missing_ok=True)
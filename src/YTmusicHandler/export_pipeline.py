@@ -0,0 +1,300 @@
+"""
+YT Music export pipeline
+
+Defines the ExportPipeline class, which exports songs retrieved from Spotify in three stages running at the same
+time: fetch (taking songs from a generator such as SpotifyApi.iter_playlist_items), resolve (searching them on
+YouTube Music) and add (pushing the found videoIds to the playlist in batches). The stages are connected by bounded
+queues, so a stage that is faster than the next one waits instead of piling up songs in memory (backpressure).
+
+Every stage has its own concurrency: pages of Spotify tracks are prefetched by config.spotify_page_workers, songs are
+resolved by config.yt_search_workers threads and added by a single thread, which keeps the order of the playlist.
+The time every stage spends working is measured, so the stats show which stage limits the export.
+
+"""
+
+import queue
+import threading
+import time
+
+from src.app.metrics import get_metrics
+from src.assets import config
+from src.YTmusicHandler.match_cache import SongMatchCache
+
+RESOLVE_CHUNK = 8  # songs a resolve worker takes from the queue at once, looked up in the match cache together
+DONE = None  # put to a queue by a stage when it finishes
+
+
+class InlineExecutor:
+    """
+    Executor running the searches of one resolve worker one after another in the worker's thread
+    """
+    @staticmethod
+    def map(fn, *iterables):
+        """
+        Calls fn for every item, like ThreadPoolExecutor.map.
+        """
+        return map(fn, *iterables)
+
+
+class StageStats:
+    """
+    Class that measures the time one stage of the pipeline spends working and waiting for the next stage
+    """
+    def __init__(self, name, workers):
+        """
+        Initializes the StageStats class.
+
+        Parameters:
+        - name (str): Name of the stage.
+        - workers (int): Number of threads of the stage.
+        """
+        self.name = name
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.busy = 0.0  # seconds spent working, summed over the threads
+        self.blocked = 0.0  # seconds spent waiting for a free place in the queue of the next stage
+        self.items = 0
+
+    def record(self, busy=0.0, blocked=0.0, items=0):
+        """
+        Adds measured times of the stage.
+        """
+        with self.lock:
+            self.busy += busy
+            self.blocked += blocked
+            self.items += items
+        if busy:
+            get_metrics().observe(f'pipeline.{self.name}', busy)
+
+    def summary(self, elapsed):
+        """
+        Returns the stats of the stage.
+
+        Parameters:
+        - elapsed (float): Seconds the pipeline ran.
+
+        Returns:
+        - dict: 'workers', 'items', 'busy' and 'blocked' seconds and 'utilization', the share of the capacity of the
+          stage that was used.
+        """
+        capacity = elapsed * self.workers
+        return {'workers': self.workers, 'items': self.items, 'busy': self.busy, 'blocked': self.blocked,
+                'utilization': self.busy / capacity if capacity else 0.0}
+
+
+class ExportPipeline:
+    """
+    Class that fetches, resolves and adds songs in concurrent stages connected by bounded queues
+    """
+    def __init__(self, engine, resolve_workers=None, queue_size=None):
+        """
+        Initializes the ExportPipeline class.
+
+        Parameters:
+        - engine (ExportEngine): Engine used for searching and adding songs, with its match cache and journal.
+        - resolve_workers (int, optional): Number of threads resolving songs. Defaults to engine.workers.
+        - queue_size (int, optional): Number of songs each queue between stages holds. Defaults to
+          config.export_pipeline_queue_size.
+        """
+        self.engine = engine
+        self.resolve_workers = resolve_workers or engine.workers
+        self.queue_size = queue_size or config.export_pipeline_queue_size
+        self.stages = {}
+        self.stats = {}  # stage name -> summary of the last export, see StageStats.summary
+
+    def put(self, target, item, stage):
+        """
+        Puts an item to the queue of the next stage, measuring how long the stage waits for a free place.
+        """
+        started = time.perf_counter()
+        target.put(item)
+        stage.record(blocked=time.perf_counter() - started)
+
+    def fetch(self, songs, fetched, stop, errors, cancel_event):
+        """
+        Fetch stage, takes songs from the iterable and puts (index, song, skipped) to the fetched queue.
+
+        Songs the journal records as added are passed on as skipped. After the export is cancelled, the remaining
+        songs of a list are passed on to be reported as failed, a generator is not read further.
+        """
+        stage = self.stages['fetch']
+        journal = self.engine.journal
+        added_before = set(journal.added) if journal is not None else ()  # added by previous runs
+        sized = hasattr(songs, '__len__')
+        iterator = iter(songs)
+        index = 0
+        try:
+            while True:
+                if (stop.is_set() or cancel_event is not None and cancel_event.is_set()) and not sized:
+                    break
+                started = time.perf_counter()
+                song = next(iterator, DONE)
+                stage.record(busy=time.perf_counter() - started, items=song is not DONE)
+                if song is DONE:
+                    break
+                skipped = bool(added_before) and SongMatchCache.normalize_key(song) in added_before
+                self.put(fetched, (index, song, skipped), stage)
+                index += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(self.resolve_workers):
+                fetched.put(DONE)
+
+    def resolve(self, fetched, resolved, stop, errors, cancel_event):
+        """
+        Resolve stage, takes songs from the fetched queue and puts (index, song, skipped, videoId) to the resolved
+        queue. Songs are not searched any more once the export is cancelled or failed.
+        """
+        stage = self.stages['resolve']
+        finished = False
+        try:
+            while not finished:
+                chunk = [fetched.get()]
+                while len(chunk) < RESOLVE_CHUNK and chunk[-1] is not DONE:
+                    try:
+                        chunk.append(fetched.get_nowait())
+                    except queue.Empty:
+                        break
+                if chunk[-1] is DONE:
+                    chunk.pop()
+                    finished = True
+                to_resolve = [song for _, song, skipped in chunk if not skipped]
+                video_ids = {}
+                if to_resolve and not stop.is_set() and (cancel_event is None or not cancel_event.is_set()):
+                    started = time.perf_counter()
+                    try:
+                        video_ids = dict(zip(map(id, to_resolve), self.engine.resolve(to_resolve, InlineExecutor)))
+                    except Exception as e:
+                        errors.append(e)
+                        stop.set()
+                    stage.record(busy=time.perf_counter() - started, items=len(to_resolve))
+                for index, song, skipped in chunk:
+                    self.put(resolved, (index, song, skipped, video_ids.get(id(song))), stage)
+        finally:
+            resolved.put(DONE)
+
+    def add(self, playlist_id, batch, errors_list, on_progress):
+        """
+        Adds one batch of resolved songs to the playlist and reports the progress.
+
+        Parameters:
+        - playlist_id (str): The ID of the YT Music playlist.
+        - batch (list): (song, videoId) pairs in the order of the playlist, videoId None for songs not found.
+        - errors_list (list): List the failed songs are appended to.
+        - on_progress (callable): See export.
+        """
+        engine = self.engine
+        started = time.perf_counter()
+        resolved = [(i, video_id) for i, (_, video_id) in enumerate(batch) if video_id is not None]
+        failed = set(engine.add(playlist_id, resolved)) if resolved else set()
+        batch_errors = []
+        added = []
+        for i, (song, video_id) in enumerate(batch):
+            if video_id is None or i in failed:
+                batch_errors.append(song)
+            else:
+                added.append(SongMatchCache.normalize_key(song))
+                engine.exported[added[-1]] = video_id
+        if engine.journal is not None:
+            engine.journal.record_added(added)
+        self.stages['add'].record(busy=time.perf_counter() - started, items=len(batch))
+        errors_list.extend(batch_errors)
+        if on_progress is not None:
+            on_progress(done=len(batch) - len(batch_errors), failed=len(batch_errors))
+
+    def export(self, playlist_id, songs, on_progress=None, cancel_event=None):
+        """
+        Exports songs to the playlist, see ExportEngine.export. The songs are fetched, resolved and added in
+        concurrent stages and added in the original order. The add stage runs in the calling thread.
+
+        Parameters:
+        - playlist_id (str): The ID of the YT Music playlist.
+        - songs (iterable): Songs to export, e.g. a generator retrieving them page by page.
+        - on_progress (callable, optional): Called after each added batch with keyword arguments 'done' and
+          'failed', the numbers of newly exported and failed songs.
+        - cancel_event (threading.Event, optional): When set, the export stops and songs that were retrieved but
+          not exported yet are returned as failed, with the remaining songs if songs is a list.
+
+        Returns:
+        - list: Songs for which the export failed, in the original order.
+
+        Raises:
+        - Exception: The error of a stage that failed, e.g. ValueError of a Spotify page that could not be retrieved.
+        """
+        self.stages = {'fetch': StageStats('fetch', 1), 'resolve': StageStats('resolve', self.resolve_workers),
+                       'add': StageStats('add', 1)}
+        fetched = queue.Queue(self.queue_size)
+        resolved = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        errors = []  # exceptions raised in the stages
+        threads = [threading.Thread(target=self.fetch, args=(songs, fetched, stop, errors, cancel_event),
+                                    daemon=True)]
+        threads += [threading.Thread(target=self.resolve, args=(fetched, resolved, stop, errors, cancel_event),
+                                     daemon=True) for _ in range(self.resolve_workers)]
+        print("Exporting songs as they are retrieved")
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        errors_list = []
+        pending = {}  # index -> (song, skipped, videoId) of songs resolved before the songs preceding them
+        batch = []
+        next_index = 0
+        skipped = 0
+        unreported = 0  # skipped songs not reported by on_progress yet
+        cancelled = 0
+        finished = 0
+        try:
+            while finished < self.resolve_workers:
+                item = resolved.get()
+                if item is DONE:
+                    finished += 1
+                else:
+                    pending[item[0]] = item[1:]
+                last = finished == self.resolve_workers
+                while next_index in pending or last:
+                    if next_index in pending:
+                        song, was_skipped, video_id = pending.pop(next_index)
+                        next_index += 1
+                        if was_skipped:
+                            skipped += 1
+                            unreported += 1
+                        else:
+                            batch.append((song, video_id))
+                        if len(batch) < self.engine.batch_size and unreported < self.engine.batch_size:
+                            continue
+                    else:
+                        last = False
+                    if stop.is_set() or cancel_event is not None and cancel_event.is_set():
+                        stop.set()
+                        cancelled += len(batch)
+                        errors_list.extend(song for song, _ in batch)
+                    else:
+                        if unreported and on_progress is not None:
+                            on_progress(done=unreported, failed=0)
+                        if batch:
+                            self.add(playlist_id, batch, errors_list, on_progress)
+                    batch = []
+                    unreported = 0
+        finally:
+            stop.set()
+            while finished < self.resolve_workers:
+                finished += resolved.get() is DONE
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - started
+        self.stats = {name: stage.summary(elapsed) for name, stage in self.stages.items()}
+        if errors:
+            raise errors[0]
+        if cancelled:
+            print(f"Export cancelled, {cancelled} songs were not exported")
+        if skipped:
+            print(f"Resumed export, {skipped} songs were added before")
+        bottleneck = max(self.stats, key=lambda name: self.stats[name]['utilization'])
+        print("Pipeline utilization: " + ", ".join(f"{name} {stats['utilization']:.0%}"
+                                                    for name, stats in self.stats.items())
+              + f" (bottleneck: {bottleneck})")
+        return errors_list
@@ -0,0 +1,142 @@
+"""
+YT Music export planner
+
+Defines the ExportPlanner class, which exports several playlists at once. The same track often appears in many
+playlists of a library, so the planner collects the union of tracks of all target playlists, resolves every unique
+track only once with the ExportEngine and fans the found videoIds out to the target playlists in batched adds, each
+playlist as soon as all its tracks are resolved.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.YTmusicHandler.match_cache import SongMatchCache
+
+
+class ExportPlanner:
+    """
+    Class that resolves songs shared by several playlists once and adds them to every playlist
+    """
+    def __init__(self, engine):
+        """
+        Initializes the ExportPlanner class.
+
+        Parameters:
+        - engine (ExportEngine): Engine used for searching and adding songs.
+        """
+        self.engine = engine
+        self.exported = []  # song key -> videoId of songs added by export, one dict per target playlist
+
+    @staticmethod
+    def plan(playlists):
+        """
+        Collects the unique songs of the playlists.
+
+        Parameters:
+        - playlists (list): List of (playlist_id, songs) pairs.
+
+        Returns:
+        - dict: Songs by their key, in the order they first appear.
+        """
+        unique = {}
+        for _, songs in playlists:
+            for song in songs:
+                unique.setdefault(SongMatchCache.normalize_key(song), song)
+        return unique
+
+    def fill(self, playlist_id, songs, matches, journal):
+        """
+        Adds the resolved songs to one playlist.
+
+        Parameters:
+        - playlist_id (str): The ID of the YT Music playlist.
+        - songs (list): Songs of the playlist that were not added before.
+        - matches (dict): VideoIds by song key, None for songs that were not found.
+        - journal (ExportJournal or None): Journal the added songs are recorded to.
+
+        Returns:
+        - list: Songs for which the export failed.
+        """
+        exported = {}
+        self.exported.append(exported)
+        song_keys = [SongMatchCache.normalize_key(song) for song in songs]
+        resolved = [(i, matches[key]) for i, key in enumerate(song_keys) if matches.get(key) is not None]
+        failed = set(self.engine.add(playlist_id, resolved)) if resolved else set()
+        playlist_errors = []
+        for i, (song, key) in enumerate(zip(songs, song_keys)):
+            if matches.get(key) is None or i in failed:
+                playlist_errors.append(song)
+            else:
+                exported[key] = matches[key]
+        if journal is not None:
+            journal.record_added(list(exported))
+        return playlist_errors
+
+    def export(self, playlists, on_progress=None, cancel_event=None, journals=None):
+        """
+        Searches the unique songs of all playlists and adds the found ones to every playlist containing them.
+
+        Songs are searched in the order of the playlists on one shared pool of worker threads, and every playlist is
+        filled as soon as all its songs are resolved, so the first playlists are complete long before the last
+        ones are searched.
+
+        Parameters:
+        - playlists (list): List of (playlist_id, songs) pairs.
+        - on_progress (callable, optional): Called after each playlist is filled with keyword arguments 'done' and
+          'failed', the numbers of newly exported and failed songs of the playlist.
+        - cancel_event (threading.Event, optional): When set, searching stops and songs of playlists that were not
+          filled yet are returned as failed.
+        - journals (list, optional): ExportJournal of every playlist, or None for playlists without one. Songs a
+          journal records as added are skipped and the songs added to the playlist are recorded to it.
+
+        Returns:
+        - list: Songs for which the export failed, one list per playlist in the given order.
+        """
+        engine = self.engine
+        journals = journals or [None] * len(playlists)
+        pending = []
+        for (playlist_id, songs), journal in zip(playlists, journals):
+            if journal is not None and journal.added:
+                songs = [song for song in songs if SongMatchCache.normalize_key(song) not in journal.added]
+            pending.append((playlist_id, songs))
+        unique = self.plan(pending)
+        total = sum(len(songs) for _, songs in playlists)
+        print(f"Total songs to export: {total} in {len(playlists)} playlists, {len(unique)} unique")
+
+        # number of unique songs that must be resolved before each playlist can be filled
+        ends = []
+        seen = set()
+        for _, songs in pending:
+            seen.update(SongMatchCache.normalize_key(song) for song in songs)
+            ends.append(len(seen))
+
+        keys = list(unique)
+        matches = {}
+        errors = []
+        self.exported = []
+
+        def fill_resolved(resolved_count):
+            while len(errors) < len(pending) and ends[len(errors)] <= resolved_count:
+                i = len(errors)
+                if cancel_event is not None and cancel_event.is_set():
+                    errors.append(list(pending[i][1]))
+                    self.exported.append({})
+                    continue
+                errors.append(self.fill(pending[i][0], pending[i][1], matches, journals[i]))
+                if on_progress is not None:
+                    on_progress(done=len(playlists[i][1]) - len(errors[i]), failed=len(errors[i]))
+
+        fill_resolved(0)
+        if keys:
+            with ThreadPoolExecutor(max_workers=min(engine.workers, len(keys))) as executor:
+                for start in range(0, len(keys), engine.batch_size):
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    batch = keys[start:start + engine.batch_size]
+                    video_ids = engine.resolve([unique[key] for key in batch], executor)
+                    matches.update(zip(batch, video_ids))
+                    fill_resolved(start + len(batch))
+        for i in range(len(errors), len(pending)):
+            errors.append(list(pending[i][1]))
+            self.exported.append({})
+        return errors
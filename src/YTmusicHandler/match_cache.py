@@ -0,0 +1,147 @@
+"""
+Song match cache module
+
+Defines the SongMatchCache class, a persistent SQLite cache that maps a song key (Spotify track ID, or normalized
+'artists - name' for songs without it) to the YouTube Music videoId it was resolved to. Entries expire after a TTL
+and the cache is trimmed to a maximum number of entries, removing the least recently used ones first.
+
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.assets import config
+from src.SpotifyHandler.track import track_key
+
+
+class SongMatchCache:
+    """
+    Class that stores resolved YT Music videoIds on disk so the same song is not searched again
+    """
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        """
+        Initializes the SongMatchCache class.
+
+        Parameters:
+        - path (str or Path, optional): Path to the SQLite database. Defaults to config.match_cache_file in assets.
+          Use ':memory:' for a cache that is not persisted.
+        - ttl (int, optional): Seconds after which an entry expires. Defaults to config.match_cache_ttl.
+        - max_entries (int, optional): Maximum number of stored entries. Defaults to config.match_cache_max_entries.
+        """
+        if path is None:
+            path = Path(__file__).resolve().parent.parent / 'assets' / config.match_cache_file
+        self.ttl = ttl if ttl is not None else config.match_cache_ttl
+        self.max_entries = max_entries if max_entries is not None else config.match_cache_max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS matches ('
+                                    'key TEXT PRIMARY KEY, video_id TEXT NOT NULL, '
+                                    'created REAL NOT NULL, last_used REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS matches_last_used ON matches (last_used)')
+
+    @staticmethod
+    def normalize_key(song):
+        """
+        Creates the cache key for a song.
+
+        Parameters:
+        - song (Track or str): The track or song in format 'artists - name'.
+
+        Returns:
+        - str: 'spotify:<id>' for tracks with Spotify ID, otherwise lowercase song with collapsed whitespace.
+        """
+        return track_key(song)
+
+    def get(self, key):
+        """
+        Returns cached videoId for the key.
+
+        Parameters:
+        - key (str): Normalized song key.
+
+        Returns:
+        - str or None: The cached videoId, None if missing or expired.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Returns cached videoIds for several keys with a single query.
+
+        Parameters:
+        - keys (list): Normalized song keys.
+
+        Returns:
+        - dict: Mapping of found keys to videoIds. Missing and expired keys are left out.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self.lock, self.connection:
+            # SQLite limits the number of query parameters, so keys are looked up in chunks
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.connection.execute(f'SELECT key, video_id FROM matches WHERE created >= ? '
+                                               f'AND key IN ({placeholders})', [now - self.ttl, *chunk])
+                found.update(rows.fetchall())
+            self.connection.executemany('UPDATE matches SET last_used = ? WHERE key = ?',
+                                        [(now, key) for key in found])
+        return found
+
+    def put(self, key, video_id):
+        """
+        Stores videoId for the key.
+
+        Parameters:
+        - key (str): Normalized song key.
+        - video_id (str): Resolved YT Music videoId.
+        """
+        self.put_many({key: video_id})
+
+    def put_many(self, matches):
+        """
+        Stores several videoIds and evicts expired and least recently used entries.
+
+        Parameters:
+        - matches (dict): Mapping of normalized song keys to videoIds.
+        """
+        if not matches:
+            return
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO matches (key, video_id, created, last_used) '
+                                        'VALUES (?, ?, ?, ?)',
+                                        [(key, video_id, now, now) for key, video_id in matches.items()])
+            self._evict(now)
+
+    def _evict(self, now):
+        """
+        Removes expired entries and trims the cache to max_entries. Must be called with the lock held.
+        """
+        self.connection.execute('DELETE FROM matches WHERE created < ?', (now - self.ttl,))
+        overflow = self.connection.execute('SELECT COUNT(*) FROM matches').fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.connection.execute('DELETE FROM matches WHERE key IN '
+                                    '(SELECT key FROM matches ORDER BY last_used LIMIT ?)', (overflow,))
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM matches')
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self.lock:
+            self.connection.close()
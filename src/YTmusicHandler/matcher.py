@@ -0,0 +1,195 @@
+"""
+Track matcher module
+
+Defines the TrackMatcher class, which scores YouTube Music search results against a Spotify track. The score
+combines fuzzy similarity of title, artists and album with the difference of durations, and results with words
+like 'live', 'cover' or 'remix' missing in the Spotify title are penalized. The best result is accepted only when
+its score reaches the confidence threshold, so wrong versions are reported as failed instead of exported.
+
+The ISRC identifies a recording exactly, so when both the Spotify track and a search result carry one, it decides
+instead of the fuzzy score: a result with the same ISRC is a full match and a result with a different ISRC is a
+different recording. YT Music search results carry an ISRC only for some songs, so the fuzzy score stays the rule.
+
+"""
+
+import re
+from difflib import SequenceMatcher
+
+from src.app.text import normalize
+from src.assets import config
+
+PENALIZED_WORDS = ('live', 'cover', 'remix', 'karaoke', 'instrumental', 'acoustic', 'nightcore', 'slowed',
+                   'sped up', 'reverb', 'tribute')
+
+
+def normalize_isrc(isrc):
+    """
+    Normalizes an ISRC for comparison.
+
+    Parameters:
+    - isrc (str or None): The ISRC, e.g. 'US-RC1-76-07839' or 'usrc17607839'.
+
+    Returns:
+    - str or None: Uppercase ISRC without hyphens and spaces, None if there is none.
+    """
+    if not isrc:
+        return None
+    return re.sub(r'[\s-]', '', isrc).upper() or None
+
+
+class MatchSource:
+    """
+    Normalized fields of one Spotify track, prepared once and compared with many candidates
+    """
+    __slots__ = ('title', 'padded_title', 'artists', 'album', 'duration', 'isrc', 'title_matcher', 'artists_matcher',
+                 'album_matcher')
+
+    def __init__(self, song):
+        """
+        Initializes the MatchSource class.
+
+        Parameters:
+        - song (Track or str): The track or song in format 'artists - name'.
+        """
+        if isinstance(song, str):
+            artists, _, title = song.rpartition(' - ')
+            artists = artists.split(',') if artists else []
+            album = None
+            duration_ms = None
+            isrc = None
+        else:
+            artists, title, album, duration_ms = song.artists, song.title, song.album, song.duration_ms
+            isrc = song.isrc
+        self.title = normalize(title)
+        self.artists = normalize(' '.join(sorted(artists)))
+        self.album = normalize(album)
+        self.duration = duration_ms / 1000 if duration_ms else None
+        self.isrc = normalize_isrc(isrc)
+        self.padded_title = f' {self.title} '
+        # SequenceMatcher caches information about its second sequence, so it is reused for all candidates
+        self.title_matcher = SequenceMatcher(None, b=self.title, autojunk=False)
+        self.artists_matcher = SequenceMatcher(None, b=self.artists, autojunk=False)
+        self.album_matcher = SequenceMatcher(None, b=self.album, autojunk=False)
+
+
+class TrackMatcher:
+    """
+    Class that chooses the best YouTube Music search result for a Spotify track
+    """
+    TITLE_WEIGHT = 0.45
+    ARTISTS_WEIGHT = 0.3
+    ALBUM_WEIGHT = 0.1
+    DURATION_WEIGHT = 0.15
+    PENALTY = 0.7
+
+    def __init__(self, threshold=None, duration_tolerance=None):
+        """
+        Initializes the TrackMatcher class.
+
+        Parameters:
+        - threshold (float, optional): Minimal confidence of accepted match between 0 and 1.
+          Defaults to config.match_threshold.
+        - duration_tolerance (float, optional): Difference of durations in seconds that is still a full match.
+          Defaults to config.match_duration_tolerance.
+        """
+        self.threshold = threshold if threshold is not None else config.match_threshold
+        self.duration_tolerance = (duration_tolerance if duration_tolerance is not None
+                                   else config.match_duration_tolerance)
+
+    @staticmethod
+    def similarity(matcher, text):
+        """
+        Computes similarity of text with the second sequence of the matcher.
+
+        Parameters:
+        - matcher (SequenceMatcher): Matcher with prepared second sequence.
+        - text (str): Normalized text.
+
+        Returns:
+        - float: Similarity between 0 and 1.
+        """
+        if text == matcher.b:
+            return 1.0
+        matcher.set_seq1(text)
+        if matcher.real_quick_ratio() == 0:
+            return 0.0
+        return matcher.ratio()
+
+    def duration_score(self, source_duration, candidate_duration):
+        """
+        Scores the difference of durations.
+
+        Returns:
+        - float: 1 within the tolerance, decreasing linearly to 0 at five times the tolerance.
+        """
+        difference = abs(source_duration - candidate_duration)
+        if difference <= self.duration_tolerance:
+            return 1.0
+        return max(0.0, 1 - (difference - self.duration_tolerance) / (4 * self.duration_tolerance))
+
+    def score(self, source, candidate):
+        """
+        Scores one search result against the track.
+
+        Parameters:
+        - source (MatchSource): The prepared track.
+        - candidate (dict): Search result from YTMusic.search.
+
+        Returns:
+        - float: Confidence between 0 and 1, 1 for a result with the ISRC of the track and 0 for a result with
+          a different ISRC.
+        """
+        candidate_isrc = normalize_isrc(candidate.get('isrc'))
+        if source.isrc and candidate_isrc:
+            return 1.0 if candidate_isrc == source.isrc else 0.0
+
+        candidate_title = normalize(candidate.get('title'))
+        total = self.TITLE_WEIGHT * self.similarity(source.title_matcher, candidate_title)
+        weights = self.TITLE_WEIGHT
+
+        if source.artists:
+            candidate_artists = normalize(' '.join(sorted(artist.get('name') or ''
+                                                          for artist in candidate.get('artists') or ())))
+            total += self.ARTISTS_WEIGHT * self.similarity(source.artists_matcher, candidate_artists)
+            weights += self.ARTISTS_WEIGHT
+
+        candidate_album = normalize((candidate.get('album') or {}).get('name'))
+        if source.album and candidate_album:
+            total += self.ALBUM_WEIGHT * self.similarity(source.album_matcher, candidate_album)
+            weights += self.ALBUM_WEIGHT
+
+        candidate_duration = candidate.get('duration_seconds')
+        if source.duration and candidate_duration:
+            total += self.DURATION_WEIGHT * self.duration_score(source.duration, candidate_duration)
+            weights += self.DURATION_WEIGHT
+
+        confidence = total / weights
+        padded_title = f' {candidate_title} '
+        if any(f' {word} ' in padded_title and f' {word} ' not in source.padded_title for word in PENALIZED_WORDS):
+            confidence *= self.PENALTY
+        return confidence
+
+    def best_match(self, song, candidates):
+        """
+        Chooses the best search result for the song.
+
+        Parameters:
+        - song (Track or str): The track or song in format 'artists - name'.
+        - candidates (list): Search results from YTMusic.search.
+
+        Returns:
+        - tuple: (videoId, confidence) of the best result. VideoId is None when no result reaches the threshold.
+        """
+        source = MatchSource(song)
+        best_video_id, best_confidence = None, 0.0
+        for candidate in candidates:
+            if not candidate.get('videoId'):
+                continue
+            confidence = self.score(source, candidate)
+            if confidence > best_confidence:
+                best_video_id, best_confidence = candidate['videoId'], confidence
+                if confidence == 1.0:
+                    break  # e.g. the same ISRC, no other result can be better
+        if best_confidence < self.threshold:
+            return None, best_confidence
+        return best_video_id, best_confidence
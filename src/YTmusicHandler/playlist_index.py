@@ -0,0 +1,172 @@
+"""
+YT Music playlist index module
+
+Defines the PlaylistIndex class, an in-memory index of the user's YouTube Music library playlists by title and by
+playlist ID. The library is downloaded once and again only after config.yt_playlist_index_ttl seconds or when a
+refresh is forced, playlists created by the app are added to the index without downloading the library, so
+resolving a playlist title is a dictionary lookup instead of a full library fetch per export.
+
+The library listing of YT Music is eventually consistent: a playlist created moments ago may be missing from it. A
+refresh therefore keeps the playlists added to the index during the last ttl seconds even if the listing does not
+return them yet, otherwise the next export would not find the playlist and create it again.
+
+"""
+
+import threading
+import time
+
+from src.assets import config
+
+SYSTEM_PLAYLISTS = ('Liked Music', 'Episodes for Later')  # library playlists that songs are not exported to
+
+
+class PlaylistIndex:
+    """
+    Class that indexes YT Music library playlists by title and ID
+    """
+    def __init__(self, yt_music, ttl=None, clock=time.monotonic):
+        """
+        Initializes the PlaylistIndex class.
+
+        Parameters:
+        - yt_music: YTMusic object used for listing the library playlists.
+        - ttl (float, optional): Seconds after which the index is downloaded again. Defaults to
+          config.yt_playlist_index_ttl.
+        - clock (callable, optional): Function returning current time in seconds.
+        """
+        self.yt_music = yt_music
+        self.ttl = ttl if ttl is not None else config.yt_playlist_index_ttl
+        self.clock = clock
+        self.lock = threading.RLock()
+        self.by_title = {}  # title -> playlist IDs in library order, titles are not unique on YT Music
+        self.by_id = {}  # playlist ID -> title
+        self.added = {}  # playlist ID -> (title, time) of playlists added by add, kept by refresh for ttl seconds
+        self.loaded_at = None
+
+    def is_stale(self):
+        """
+        Returns True if the library was never downloaded or was downloaded more than ttl seconds ago.
+        """
+        return self.loaded_at is None or self.clock() - self.loaded_at > self.ttl
+
+    def refresh(self, force=False):
+        """
+        Downloads the library playlists again if the index is stale. Playlists added during the last ttl seconds
+        that the library listing does not return yet are kept in the index.
+
+        Parameters:
+        - force (bool, optional): Download even if the index is fresh.
+
+        Returns:
+        - bool: True if the library was downloaded.
+        """
+        with self.lock:
+            if not force and not self.is_stale():
+                return False
+            items = self.yt_music.get_library_playlists(limit=None)
+            self.by_title = {}
+            self.by_id = {}
+            for item in items:
+                if item['title'] in SYSTEM_PLAYLISTS:
+                    continue
+                self.insert(item['title'], item['playlistId'])
+            now = self.clock()
+            for playlist_id, (title, added_at) in list(self.added.items()):
+                if playlist_id in self.by_id or now - added_at > self.ttl:
+                    del self.added[playlist_id]  # listed by the library or too old to be still missing
+                else:
+                    self.insert(title, playlist_id)
+            self.loaded_at = now
+            return True
+
+    def insert(self, title, playlist_id):
+        """
+        Inserts a playlist to the dictionaries of the index, if it is not there yet.
+        """
+        if playlist_id in self.by_id:
+            return
+        self.by_id[playlist_id] = title
+        self.by_title.setdefault(title, []).append(playlist_id)
+
+    def add(self, title, playlist_id):
+        """
+        Adds a playlist to the index, e.g. after it was created.
+
+        Parameters:
+        - title (str): Title of the playlist.
+        - playlist_id (str): The ID of the playlist.
+        """
+        with self.lock:
+            if playlist_id not in self.by_id:
+                self.added[playlist_id] = (title, self.clock())
+            self.insert(title, playlist_id)
+
+    def remove(self, playlist_id):
+        """
+        Removes a playlist from the index, e.g. after it was deleted.
+
+        Parameters:
+        - playlist_id (str): The ID of the playlist.
+        """
+        with self.lock:
+            self.added.pop(playlist_id, None)
+            title = self.by_id.pop(playlist_id, None)
+            if title is None:
+                return
+            self.by_title[title].remove(playlist_id)
+            if not self.by_title[title]:
+                del self.by_title[title]
+
+    def get_ids(self, title):
+        """
+        Returns IDs of all playlists with the title, downloading the library first if the index is stale.
+
+        Parameters:
+        - title (str): Title of the playlist.
+
+        Returns:
+        - list: Playlist IDs in library order, empty if there is no such playlist.
+        """
+        with self.lock:
+            self.refresh()
+            return list(self.by_title.get(title, ()))
+
+    def get_id(self, title):
+        """
+        Returns the ID of the playlist with the title. If more playlists have the title, the first one in the library
+        is returned.
+
+        Parameters:
+        - title (str): Title of the playlist.
+
+        Returns:
+        - str or None: The playlist ID, None if there is no such playlist.
+        """
+        ids = self.get_ids(title)
+        return ids[0] if ids else None
+
+    def get_title(self, playlist_id):
+        """
+        Returns the title of the playlist with the ID, None if it is not in the library.
+        """
+        with self.lock:
+            self.refresh()
+            return self.by_id.get(playlist_id)
+
+    def titles(self):
+        """
+        Returns titles of the library playlists, each title once, in library order.
+        """
+        with self.lock:
+            self.refresh()
+            return list(self.by_title)
+
+    def as_dict(self):
+        """
+        Returns the first playlist ID of every title, without downloading the library.
+
+        Returns:
+        - dict: Playlist IDs by title.
+        """
+        with self.lock:
+            return {title: ids[0] for title, ids in self.by_title.items()}
@@ -0,0 +1,109 @@
+"""
+Playlist sync state module
+
+Defines the SyncState class, a persistent SQLite store of synced playlists. For every Spotify playlist it keeps
+the snapshot_id seen at the last sync, the YouTube Music playlist it is synced to and the tracks that were added
+there, so the next sync can skip unchanged playlists and export only the difference of the others.
+
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.assets import config
+
+
+class SyncState:
+    """
+    Class that remembers what was exported by previous playlist syncs
+    """
+    def __init__(self, path=None):
+        """
+        Initializes the SyncState class.
+
+        Parameters:
+        - path (str or Path, optional): Path to the SQLite database. Defaults to config.sync_state_file in assets.
+          Use ':memory:' for a state that is not persisted.
+        """
+        if path is None:
+            path = Path(__file__).resolve().parent.parent / 'assets' / config.sync_state_file
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS playlists ('
+                                    'playlist_key TEXT PRIMARY KEY, snapshot_id TEXT, '
+                                    'yt_playlist_id TEXT NOT NULL, updated REAL NOT NULL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS tracks ('
+                                    'playlist_key TEXT NOT NULL, track_key TEXT NOT NULL, video_id TEXT NOT NULL, '
+                                    'PRIMARY KEY (playlist_key, track_key))')
+
+    def get_playlist(self, playlist_key):
+        """
+        Returns the stored snapshot and YT Music playlist of a synced playlist.
+
+        Parameters:
+        - playlist_key (str): The key of the Spotify playlist, e.g. its ID.
+
+        Returns:
+        - tuple or None: (snapshot_id, yt_playlist_id), None if the playlist was never synced.
+        """
+        with self.lock:
+            return self.connection.execute('SELECT snapshot_id, yt_playlist_id FROM playlists '
+                                           'WHERE playlist_key = ?', (playlist_key,)).fetchone()
+
+    def get_tracks(self, playlist_key):
+        """
+        Returns the tracks added to the YT Music playlist by previous syncs.
+
+        Parameters:
+        - playlist_key (str): The key of the Spotify playlist.
+
+        Returns:
+        - dict: Mapping of track keys to videoIds.
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT track_key, video_id FROM tracks WHERE playlist_key = ?',
+                                           (playlist_key,))
+            return dict(rows.fetchall())
+
+    def update(self, playlist_key, snapshot_id, yt_playlist_id, added=None, removed=()):
+        """
+        Stores the result of a sync. Only the changed tracks are written.
+
+        Parameters:
+        - playlist_key (str): The key of the Spotify playlist.
+        - snapshot_id (str or None): The synced snapshot_id. None makes the next sync compute the difference again,
+          e.g. after some songs failed.
+        - yt_playlist_id (str): The ID of the YT Music playlist.
+        - added (dict, optional): Mapping of newly exported track keys to videoIds.
+        - removed (iterable, optional): Keys of tracks removed from the YT Music playlist.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO playlists (playlist_key, snapshot_id, yt_playlist_id, '
+                                    'updated) VALUES (?, ?, ?, ?)',
+                                    (playlist_key, snapshot_id, yt_playlist_id, time.time()))
+            self.connection.executemany('DELETE FROM tracks WHERE playlist_key = ? AND track_key = ?',
+                                        [(playlist_key, key) for key in removed])
+            self.connection.executemany('INSERT OR REPLACE INTO tracks (playlist_key, track_key, video_id) '
+                                        'VALUES (?, ?, ?)',
+                                        [(playlist_key, key, video_id) for key, video_id in (added or {}).items()])
+
+    def forget(self, playlist_key):
+        """
+        Removes the stored state of a playlist, so its next sync exports all tracks again.
+
+        Parameters:
+        - playlist_key (str): The key of the Spotify playlist.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM tracks WHERE playlist_key = ?', (playlist_key,))
+            self.connection.execute('DELETE FROM playlists WHERE playlist_key = ?', (playlist_key,))
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self.lock:
+            self.connection.close()
@@ -6,23 +6,54 @@ retrieve,update the user's playlists. Allow exporting music to those playlists.
 
 """
 
-from ytmusicapi import YTMusic
+from src.app.metrics import instrument
+from src.YTmusicHandler.export_engine import ExportEngine
+from src.YTmusicHandler.export_journal import ExportJournal
+from src.YTmusicHandler.export_pipeline import ExportPipeline
+from src.YTmusicHandler.export_planner import ExportPlanner
+from src.YTmusicHandler.match_cache import SongMatchCache
+from src.YTmusicHandler.playlist_index import PlaylistIndex
+from src.YTmusicHandler.sync_state import SyncState
 
 
 class YTMusicHandler:
     """
     Class that handler yt music api connection and retrieves data
     """
-    def __init__(self, auth):
+    def __init__(self, auth, yt_music=None, match_cache=None, sync_state=None, journal_dir=None):
         """
         Initializes the YTMusicHandler class.
 
         Sets up the YTMusic object by loading the authentication
         information from the 'oauth.json' file in the same directory
         as this script.
+
+        Parameters:
+        - auth: Path to the 'oauth.json' file or authentication headers.
+        - yt_music (optional): Already created YTMusic compatible object, used instead of creating a new one.
+        - match_cache (SongMatchCache, optional): Persistent cache of resolved songs checked before searching.
+        - sync_state (SyncState, optional): State of synced playlists used by sync_playlist. Created on first sync
+          if not given.
+        - journal_dir (str or Path, optional): Directory of export journals, e.g. export_journal.default_directory().
+          When given, interrupted exports to a playlist are resumed by the next run of the same export.
         """
-        self.yt_music = YTMusic(auth)
-        self.user_playlists_id = {}
+        if yt_music is None:
+            from ytmusicapi import YTMusic  # imported on first use, it takes long to load
+
+            yt_music = YTMusic(auth)
+        self.yt_music = yt_music
+        self.match_cache = match_cache
+        self.sync_state = sync_state
+        self.journal_dir = journal_dir
+        self.playlists = PlaylistIndex(self.yt_music)
+
+    @property
+    def user_playlists_id(self):
+        """
+        Playlist IDs by title of the indexed library playlists and playlists created by the handler. If more
+        playlists have the same title, the first one is given.
+        """
+        return self.playlists.as_dict()
 
     def test_request(self):
         """
@@ -36,6 +67,7 @@ class YTMusicHandler:
         playlist_id = self.yt_music.create_playlist("test playlist", "test description")
         return isinstance(playlist_id, str)
 
+    @instrument('yt.create_playlist')
     def create_playlist(self, title, description):
         """
         Creates a playlist on YouTube Music.
@@ -48,57 +80,65 @@ class YTMusicHandler:
         - The response from the YouTube Music API after creating the playlist.
         """
         response = self.yt_music.create_playlist(title, description)
+        if isinstance(response, str):
+            self.playlists.add(title, response)
         return response
 
-    def create_playlist_push_songs(self, title, description, songs):
+    @instrument('yt.create_playlist_push_songs')
+    def create_playlist_push_songs(self, title, description, songs, on_progress=None, cancel_event=None,
+                                   source=None):
         """
         Creates a playlist on YouTube Music and adds specified songs.
 
         Parameters:
         - title: Title of the playlist.
         - description: Description of the playlist.
-        - songs: List of song titles to add to the playlist.
+        - songs: List of tracks (Track) or song titles to add to the playlist.
+        - on_progress (optional): Called with the numbers of newly exported and failed songs, see export_songs.
+        - cancel_event (optional): threading.Event that stops the export when set.
+        - source (optional): Identifier of the exported Spotify playlist, e.g. its ID and snapshot_id, that the
+          journal of the export is keyed by, see open_journal.
 
         Returns:
         - A list of songs for which the addition to the playlist failed.
         """
-        print(f"Total songs to export: {len(songs)}")
-        if title not in self.user_playlists_id:
-            playlist_id = self.yt_music.create_playlist(title, description)
-            self.user_playlists_id[title] = playlist_id
-        else:
-            playlist_id = self.user_playlists_id[title]
+        playlist_id, journal = self.prepare_playlist(title, description, songs, source)
+        return self.export_songs(playlist_id, songs, on_progress, cancel_event, journal)
 
-        errors_list = []
-        for i, song in enumerate(songs):
-            try:
-                print(f'{i}: exporting {song}')
-                response = self.yt_music.search(song, filter='songs')
-                firstItem = response[0]['videoId']
-                status = self.yt_music.add_playlist_items(playlistId=playlist_id, videoIds=[firstItem])
-                if 'STATUS_SUCCEEDED' not in status['status']:
-                    errors_list.append(song)
-            except Exception as e:
-                errors_list.append(song)
-                print(f'Error: {e}')
-        return errors_list
+    def prepare_playlist(self, title, description, songs, source=None):
+        """
+        Returns the playlist songs are exported to by create_playlist_push_songs, creating it if needed, and the
+        journal of the export. An interrupted export continues in the playlist it created.
+
+        Returns:
+        - tuple: (playlist ID, ExportJournal or None).
+        """
+        journal = self.open_journal(f'new:{title}', songs, source)
+        if journal is not None and journal.resumed:
+            print(f'Resuming export to playlist {title}')
+            return journal.playlist_id, journal
+        playlist_id = self.user_playlists_id.get(title)
+        if playlist_id is None:
+            playlist_id = self.yt_music.create_playlist(title, description)
+            self.playlists.add(title, playlist_id)
+        if journal is not None:
+            journal.record_playlist(playlist_id)
+        return playlist_id, journal
 
-    def get_current_playlists(self):
+    @instrument('yt.get_current_playlists')
+    def get_current_playlists(self, force=False):
         """
         Retrieves and updates the user's current playlists from YouTube Music.
 
         This function is typically called to refresh the list of the user's playlists in the application.
-        It updates the user_playlists_id dictionary with the latest information from YouTube Music.
-        """
-        response = self.yt_music.get_library_playlists()
-        for item in response:
-            if item['title'] == 'Liked Music' or item['title'] == 'Episodes for Later':
-                continue
+        The library is downloaded only if the playlist index is older than config.yt_playlist_index_ttl.
 
-            playlist_name = item['title']
-            playlist_id = item['playlistId']
-            self.user_playlists_id[playlist_name] = playlist_id
+        Parameters:
+        - force (bool, optional): Download the library even if the index is fresh.
+        """
+        self.playlists.refresh(force)
 
+    @instrument('yt.get_playlist_id')
     def get_playlist_id(self, title):
         """
         Get the playlist ID associated with the given title.
@@ -107,42 +147,221 @@ class YTMusicHandler:
         - title: The title of the playlist.
 
         Returns:
-        - The playlist ID if the playlist is found, otherwise None.
+        - The playlist ID if the playlist is found, otherwise None. If more playlists have the title, the first one
+          in the library is returned.
         """
-        if title in self.user_playlists_id:
-            return self.user_playlists_id[title]
-
-        items = self.yt_music.get_library_playlists()
-
-        for item in items:
-            self.user_playlists_id[title] = item['playlistId']
-            if item['title'] == title:
-                return item['playlistId']
-        return None
+        return self.playlists.get_id(title)
 
-    def push_to_existing_playlist(self, playlist_title, songs):
+    @instrument('yt.push_to_existing_playlist')
+    def push_to_existing_playlist(self, playlist_title, songs, on_progress=None, cancel_event=None, source=None):
         """
         Add songs to an existing playlist on YouTube Music.
 
         Parameters:
         - playlist_title: The title of the existing playlist.
-        - songs: List of song titles to add to the playlist.
+        - songs: List of tracks (Track) or song titles to add to the playlist.
+        - on_progress (optional): Called with the numbers of newly exported and failed songs, see export_songs.
+        - cancel_event (optional): threading.Event that stops the export when set.
+        - source (optional): Identifier of the exported Spotify playlist, see create_playlist_push_songs.
 
         Returns:
         - A list of songs for which the addition to the playlist failed.
         """
         playlist_id = self.get_playlist_id(playlist_title)
-        errors_list = []
+        journal = self.open_journal(f'existing:{playlist_id}', songs, source) if playlist_id is not None else None
+        if journal is not None and not journal.resumed:
+            journal.record_playlist(playlist_id)
+        return self.export_songs(playlist_id, songs, on_progress, cancel_event, journal)
+
+    def open_journal(self, target, songs, source=None):
+        """
+        Opens the journal of an export, see ExportJournal.for_export. The journal is identified by the target, the
+        source and the songs. Songs that are streamed by a generator are not known in advance, so such an export is
+        journaled only if it has a source; otherwise different exports to one target would resume each other.
+
+        Parameters:
+        - target (str): The YT Music playlist, e.g. 'new:<title>' or 'existing:<playlist ID>'.
+        - songs (iterable): Songs of the export.
+        - source (optional): Identifier of the exported Spotify playlist, e.g. its ID and snapshot_id.
 
-        for i, song in enumerate(songs):
+        Returns:
+        - ExportJournal or None: The journal, None if journaling is disabled or the export cannot be identified.
+        """
+        sized = hasattr(songs, '__len__')
+        if self.journal_dir is None or not sized and source is None:
+            return None
+        if source is not None:
+            target = f'{target}:{source}'
+        return ExportJournal.for_export(target, songs if sized else (), self.journal_dir)
+
+    @instrument('yt.export_songs')
+    def export_songs(self, playlist_id, songs, on_progress=None, cancel_event=None, journal=None):
+        """
+        Searches songs concurrently and adds them to the playlist in batches.
+        Songs already stored in the match cache are not searched again. Songs streamed by a generator are exported
+        by ExportPipeline, which keeps retrieving, searching and adding them at the same time.
+
+        Parameters:
+        - playlist_id: The ID of the YT Music playlist.
+        - songs: List of tracks (Track) or song titles to add to the playlist.
+        - on_progress (optional): Called after each batch with keyword arguments 'done' and 'failed'.
+        - cancel_event (optional): threading.Event; when set, songs not exported yet are returned as failed.
+        - journal (ExportJournal, optional): Journal of the export. Songs it records as added are skipped; it is
+          removed when the export finishes and kept when it is cancelled or fails, so it can be resumed.
+
+        Returns:
+        - A list of songs for which the addition to the playlist failed.
+        """
+        engine = ExportEngine(self.yt_music, cache=self.match_cache, journal=journal)
+        try:
+            if hasattr(songs, '__len__'):
+                errors_list = engine.export(playlist_id, songs, on_progress, cancel_event)
+            else:
+                errors_list = ExportPipeline(engine).export(playlist_id, songs, on_progress, cancel_event)
+        finally:
+            if journal is not None:
+                journal.close()
+        if journal is not None and (cancel_event is None or not cancel_event.is_set()):
+            journal.finish()
+        return errors_list
+
+    @instrument('yt.export_playlists')
+    def export_playlists(self, playlists, on_progress=None, cancel_event=None):
+        """
+        Creates several playlists on YouTube Music and adds their songs. Songs appearing in more playlists are
+        searched only once, see ExportPlanner.
+
+        Parameters:
+        - playlists: List of (title, description, songs) tuples.
+        - on_progress (optional): Called after each playlist is filled with keyword arguments 'done' and 'failed'.
+        - cancel_event (optional): threading.Event; when set, songs not exported yet are returned as failed.
+
+        Returns:
+        - A list of songs for which the addition failed, one list per playlist in the given order.
+        """
+        targets = []
+        journals = []
+        errors = {}
+        for i, (title, description, songs) in enumerate(playlists):
             try:
-                print(f'{i}: exporting {song}')
-                response = self.yt_music.search(song, filter='songs')
-                firstItem = response[0]['videoId']
-                status = self.yt_music.add_playlist_items(playlistId=playlist_id, videoIds=[firstItem])
-                if 'STATUS_SUCCEEDED' not in status['status']:
-                    errors_list.append(song)
+                playlist_id, journal = self.prepare_playlist(title, description, songs)
+                targets.append((playlist_id, songs))
+                journals.append(journal)
             except Exception as e:
-                errors_list.append(song)
-                print(f'Error: {e}')
+                print(f'Creating playlist {title} failed: {e}')
+                errors[i] = list(songs)
+
+        planner = ExportPlanner(ExportEngine(self.yt_music, cache=self.match_cache))
+        try:
+            planned = iter(planner.export(targets, on_progress, cancel_event, journals))
+        finally:
+            for journal in journals:
+                if journal is not None:
+                    journal.close()
+        if cancel_event is None or not cancel_event.is_set():
+            for journal in journals:
+                if journal is not None:
+                    journal.finish()
+        return [errors[i] if i in errors else next(planned) for i in range(len(playlists))]
+
+    @instrument('yt.sync_playlist')
+    def sync_playlist(self, playlist_key, title, description, snapshot_id, songs, remove_deleted=False,
+                      on_progress=None, cancel_event=None):
+        """
+        Synchronizes a Spotify playlist with the YouTube Music playlist it was synced to before.
+
+        Nothing is searched or added if the Spotify snapshot_id has not changed since the last sync. Otherwise only
+        songs that were not exported yet are searched and added. The first sync creates the YT Music playlist, unless
+        the library already has a playlist with the title, e.g. because the sync state was lost. Then it syncs to that
+        playlist and songs already in it are not added again.
+
+        Parameters:
+        - playlist_key (str): The key of the Spotify playlist, e.g. its ID.
+        - title: Title of the YT Music playlist created on the first sync.
+        - description: Description of the YT Music playlist created on the first sync.
+        - snapshot_id (str): The current snapshot_id of the Spotify playlist.
+        - songs: List of tracks (Track) or song titles currently in the Spotify playlist.
+        - remove_deleted (bool, optional): Also remove songs deleted from the Spotify playlist from the YT Music one.
+        - on_progress (optional): Called with the numbers of newly exported and failed songs, see export_songs.
+        - cancel_event (optional): threading.Event that stops the export when set.
+
+        Returns:
+        - A list of songs for which the addition to the playlist failed.
+        """
+        if self.sync_state is None:
+            self.sync_state = SyncState()
+        stored = self.sync_state.get_playlist(playlist_key)
+        if stored is not None and snapshot_id is not None and stored[0] == snapshot_id:
+            print(f'Playlist {title} is up to date')
+            if on_progress is not None:
+                on_progress(done=len(songs), failed=0)
+            return []
+
+        present = ()
+        if stored is None:
+            playlist_id = self.playlists.get_id(title)
+            if playlist_id is None:
+                playlist_id = self.yt_music.create_playlist(title, description)
+                self.playlists.add(title, playlist_id)
+            else:
+                print(f'Playlist {title} was not synced before, syncing to the existing playlist with the title')
+                playlist = self.yt_music.get_playlist(playlist_id, limit=None)
+                present = [track.get('videoId') for track in playlist.get('tracks', [])]
+            synced = {}
+        else:
+            playlist_id = stored[1]
+            synced = self.sync_state.get_tracks(playlist_key)
+
+        keys = [SongMatchCache.normalize_key(song) for song in songs]
+        current = set(keys)
+        new_songs = [song for song, key in zip(songs, keys) if key not in synced]
+        deleted = {key: video_id for key, video_id in synced.items() if key not in current}
+        # a video still used by another song of the playlist must stay
+        kept_videos = {video_id for key, video_id in synced.items() if key in current}
+        shared = [key for key, video_id in deleted.items() if video_id in kept_videos]
+        print(f'Syncing {title}: {len(new_songs)} new, {len(deleted)} deleted songs')
+
+        if on_progress is not None:
+            on_progress(done=len(songs) - len(new_songs), failed=0)  # songs synced before count as exported
+        engine = ExportEngine(self.yt_music, cache=self.match_cache, present=present)
+        errors_list = engine.export(playlist_id, new_songs, on_progress, cancel_event) if new_songs else []
+        removed = []
+        if remove_deleted and deleted:
+            removed = shared + self.remove_songs(playlist_id, {key: video_id for key, video_id in deleted.items()
+                                                               if video_id not in kept_videos})
+
+        # after failures the snapshot is not stored, so the next sync retries the failed songs
+        self.sync_state.update(playlist_key, None if errors_list else snapshot_id, playlist_id,
+                               added=engine.exported, removed=removed)
         return errors_list
+
+    @instrument('yt.remove_songs')
+    def remove_songs(self, playlist_id, songs):
+        """
+        Removes songs from a YouTube Music playlist.
+
+        Parameters:
+        - playlist_id: The ID of the YT Music playlist.
+        - songs (dict): Mapping of song keys to videoIds of the songs to remove.
+
+        Returns:
+        - list: Keys of the removed songs. Songs that are no longer in the playlist are treated as removed.
+        """
+        if not songs:
+            return []
+        keys_by_video = {}
+        for key, video_id in songs.items():
+            keys_by_video.setdefault(video_id, []).append(key)
+        try:
+            playlist = self.yt_music.get_playlist(playlist_id, limit=None)
+            videos = [track for track in playlist.get('tracks', [])
+                      if track.get('videoId') in keys_by_video and track.get('setVideoId')]
+            if videos:
+                status = self.yt_music.remove_playlist_items(playlist_id, videos)
+                if 'STATUS_SUCCEEDED' not in status:
+                    print(f'Error: removing songs failed with {status}')
+                    return []
+        except Exception as e:
+            print(f'Error: {e}')
+            return []
+        return [key for keys in keys_by_video.values() for key in keys]
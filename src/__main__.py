@@ -1,46 +1,47 @@
 """
 Module that starts the application
+
+Without arguments it starts the GUI, 'python -m src export ...' runs the headless batch exporter.
 """
 
-from src.gui.app import App
-import threading
-from src.app.auxiliary_functions import find_files
-import time
-import os
+import sys
 
 
-def background_task(app):
+def run_gui():
     """
-    Background task to periodically check for the availability of the Spotify access token.
+    Creates the GUI application and runs the Tk main loop.
 
-    Parameters:
-    - app: An instance of the application class containing Spotify authentication and playlist update methods.
+    The window is shown before the app connects to Spotify and YT Music. Spotify playlists are loaded as soon as
+    the Flask callback hands the access token over to the token store.
     """
-    access_token_file, _ = find_files()
-
-    while True:
-        time.sleep(2)
-        print("Checking for spotify access token")
-        if os.path.getsize(access_token_file) > 0:
-            print("Spotify access token found. Getting playlists...")
-            app.spotifyLogin.is_token_available()
-            app.spotifyApi.access_token = app.spotifyLogin.access_token
-            app.update_playlists()  # Call the method in your App class to update playlists
-            break  # Exit the loop once the token is found and playlists are updated
-
+    # tkinter is imported only when the GUI is started, the headless export does not need it
+    from src.gui.app import App
 
-if __name__ == "__main__":
-    # Creates app instance and runs it
+    # Creates app instance, it is set up once the main loop has shown the window
     app_instance = App()
-    app_instance.run()
-
-    # Start a background thread to periodically check for Spotify access token
-    access_token_thread = threading.Thread(target=background_task, daemon=True, args=(app_instance,))
-    access_token_thread.start()
+    app_instance.after_idle(app_instance.run)
 
     # Start the main loop of the App
     app_instance.mainloop()
-    
 
 
+def main(argv=None):
+    """
+    Runs the command given on the command line.
 
+    Parameters:
+    - argv (list, optional): Command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+    - int: Exit code.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'export':
+        from src.app import batch_export
+        return batch_export.main(argv[1:])
+    run_gui()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,8 @@ from pathlib import Path
 
 import requests
 
+from src.app import http_client
+
 
 def find_files():
     """
@@ -151,24 +153,24 @@ def find_open_port(start_port, end_port):
     return None  # No open ports
 
 
-def send_request(url, headers, params=None):
+def send_request(url, headers, params=None, client=None):
     """
     Sends an HTTP GET request to the specified URL with optional headers and parameters.
 
+    The request goes through the shared pooled session, so connections are reused between requests.
+
     Parameters:
     - url (str): The URL to send the request to.
     - headers (dict): The headers to include in the request.
     - params (dict, optional): The parameters to include in the request. Defaults to None.
+    - client (HttpClient, optional): Client sending the request, e.g. one that refreshes the token on 401.
+      Defaults to the shared client.
 
     Returns:
     - requests.Response or None: The response object if the request is successful, otherwise None.
     """
-    timeout = 30
     try:
-        if params is None:
-            response = requests.get(url, headers=headers, timeout=timeout)
-        else:
-            response = requests.get(url, headers=headers, params=params, timeout=timeout)
+        response = (client or http_client.get_client()).get(url, headers=headers, params=params)
         response.raise_for_status()
         return response
     except requests.exceptions.RequestException as e:
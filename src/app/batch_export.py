@@ -0,0 +1,321 @@
+"""
+Headless batch export module
+
+Defines the BatchExporter class and the 'export' command of 'python -m src'. The command reads a manifest of
+Spotify playlist IDs, exports several playlists at once using SpotifyApi and YTMusicHandler directly and writes
+one JSON line per playlist to the report. It does not import the GUI, so it runs on servers without a display.
+
+Usage:
+    python -m src export playlists.json --report report.ndjson --workers 4 --spotify-token TOKEN
+
+The manifest is either a JSON list of playlist IDs (or objects with 'id' and optional 'title'), a JSON object with
+such list under 'playlists', or a text file with one playlist ID or URL per line.
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+from src.app.metrics import get_metrics
+from src.assets import config
+
+
+def parse_playlist_id(value):
+    """
+    Extracts the playlist ID from an ID, a Spotify URI or an open.spotify.com URL.
+
+    Parameters:
+    - value (str): The playlist reference.
+
+    Returns:
+    - str: The playlist ID.
+    """
+    value = value.strip()
+    if value.startswith('spotify:playlist:'):
+        return value.rsplit(':', 1)[1]
+    if '://' in value:
+        return urlparse(value).path.rstrip('/').rsplit('/', 1)[-1]
+    return value
+
+
+def load_manifest(path):
+    """
+    Loads the playlists to export from a manifest file.
+
+    Parameters:
+    - path (str or Path): Path to the JSON or text manifest.
+
+    Returns:
+    - list: Dicts with the playlist 'id' and 'title', the title is None if not given.
+    """
+    text = Path(path).read_text(encoding='utf-8')
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        entries = [line for line in text.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    if isinstance(entries, dict):
+        entries = entries.get('playlists', [])
+
+    playlists = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'id': entry}
+        playlists.append({'id': parse_playlist_id(entry['id']), 'title': entry.get('title')})
+    return playlists
+
+
+class BatchExporter:
+    """
+    Class that exports many Spotify playlists to YT Music concurrently and reports the results
+    """
+    def __init__(self, spotify_api, yt_music_handler, workers=None, sync=False, report=None):
+        """
+        Initializes the BatchExporter class.
+
+        Parameters:
+        - spotify_api (SpotifyApi): Client with a valid access token.
+        - yt_music_handler (YTMusicHandler): Handler used for exporting.
+        - workers (int, optional): Number of playlists exported at once. Defaults to config.cli_playlist_workers.
+        - sync (bool, optional): Sync playlists with YTMusicHandler.sync_playlist instead of creating new ones.
+        - report (file, optional): Text file the NDJSON report lines are written to as playlists finish.
+        """
+        self.spotify_api = spotify_api
+        self.yt_music_handler = yt_music_handler
+        self.workers = workers or config.cli_playlist_workers
+        self.sync = sync
+        self.report = report
+        self.report_lock = threading.Lock()
+
+    def fetch_playlist(self, entry, stream=False):
+        """
+        Retrieves the title, description and tracks of one playlist.
+
+        Parameters:
+        - entry (dict): Playlist from the manifest with 'id' and 'title'.
+        - stream (bool, optional): Return a generator retrieving the tracks page by page while they are exported,
+          see SpotifyApi.iter_playlist_items, instead of retrieving all of them first.
+
+        Returns:
+        - tuple: (report, description, tracks). The report is a dict with 'playlist_id', 'title', 'status', 'total',
+          'failed', 'seconds' and 'error'; if the status is 'error', description and tracks are None.
+        """
+        started = time.monotonic()
+        result = {'playlist_id': entry['id'], 'title': entry.get('title'), 'status': 'ok', 'total': 0,
+                  'failed': [], 'seconds': 0.0, 'error': None}
+        description, tracks = None, None
+        try:
+            playlist = self.spotify_api.get_playlist(entry['id'])
+            if playlist is None:
+                raise ValueError('playlist not found or not accessible')
+            result['title'] = entry.get('title') or playlist.get('name')
+            description = f'Exported {playlist.get("name")} playlist from Spotify'
+            if stream:
+                tracks = self.spotify_api.iter_playlist_items(playlist['tracks']['href'])
+                result['total'] = playlist['tracks'].get('total', 0)
+            else:
+                tracks = self.spotify_api.get_playlist_items(playlist['tracks']['href'])
+                result['total'] = len(tracks)
+            result['snapshot_id'] = playlist.get('snapshot_id')
+        except Exception as e:
+            self.fail(result, e)
+            tracks = None
+        result['seconds'] = time.monotonic() - started
+        return result, description, tracks
+
+    @staticmethod
+    def fail(result, error):
+        """
+        Marks the report of a playlist as failed.
+        """
+        print(f'Exporting playlist {result["playlist_id"]} failed: {error}')
+        result['status'] = 'error'
+        result['error'] = str(error)
+
+    def finish(self, result, errors, started=None):
+        """
+        Completes the report of a playlist with its failed songs and writes it.
+
+        Parameters:
+        - result (dict): The report from fetch_playlist.
+        - errors (list or None): Songs for which the export failed, None if the playlist was not exported.
+        - started (float, optional): time.monotonic() when exporting started, its duration is added to 'seconds'.
+
+        Returns:
+        - dict: The report.
+        """
+        result.pop('snapshot_id', None)
+        if errors is not None:
+            result['failed'] = [str(song) for song in errors]
+            if errors and result['status'] == 'ok':
+                result['status'] = 'partial'
+        if started is not None:
+            result['seconds'] += time.monotonic() - started
+        result['seconds'] = round(result['seconds'], 3)
+        self.write_report(result)
+        return result
+
+    def export_playlist(self, entry):
+        """
+        Exports one playlist. Without sync, its tracks are exported while the following pages are retrieved.
+
+        Parameters:
+        - entry (dict): Playlist from the manifest with 'id' and 'title'.
+
+        Returns:
+        - dict: The report of the playlist with 'playlist_id', 'title', 'status', 'total', 'failed', 'seconds'
+          and 'error'.
+        """
+        result, description, tracks = self.fetch_playlist(entry, stream=not self.sync)
+        if tracks is None:
+            return self.finish(result, None)
+        started = time.monotonic()
+        errors = None
+        try:
+            if self.sync:
+                errors = self.yt_music_handler.sync_playlist(entry['id'], result['title'], description,
+                                                             result['snapshot_id'], tracks)
+            else:
+                errors = self.yt_music_handler.create_playlist_push_songs(
+                    result['title'], description, tracks, source=f"{entry['id']}:{result['snapshot_id']}")
+        except Exception as e:
+            self.fail(result, e)
+        return self.finish(result, errors, started)
+
+    def export_planned(self, playlists):
+        """
+        Retrieves all playlists first and exports them together with YTMusicHandler.export_playlists, so songs
+        shared by several playlists are searched only once.
+
+        Parameters:
+        - playlists (list): Playlists from load_manifest.
+
+        Returns:
+        - list: Reports of the playlists in the manifest order. 'seconds' includes the shared export.
+        """
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(playlists))) as executor:
+            fetched = list(executor.map(self.fetch_playlist, playlists))
+        exported = [(result, description, tracks) for result, description, tracks in fetched if tracks is not None]
+        started = time.monotonic()
+        all_errors = [None] * len(exported)
+        try:
+            all_errors = self.yt_music_handler.export_playlists(
+                [(result['title'], description, tracks) for result, description, tracks in exported])
+        except Exception as e:
+            for result, _, _ in exported:
+                self.fail(result, e)
+        errors_by_result = {id(result): errors for (result, _, _), errors in zip(exported, all_errors)}
+        return [self.finish(result, errors_by_result.get(id(result)), started if tracks is not None else None)
+                for result, _, tracks in fetched]
+
+    def write_report(self, result):
+        """
+        Writes one report line. Safe to call from several threads.
+
+        Parameters:
+        - result (dict): The report of one playlist.
+        """
+        if self.report is None:
+            return
+        with self.report_lock:
+            self.report.write(json.dumps(result, ensure_ascii=False) + '\n')
+            self.report.flush()
+
+    def run(self, playlists):
+        """
+        Exports the playlists using a bounded pool of worker threads. Without sync, songs shared by several
+        playlists are searched only once, see export_planned, and a single playlist is streamed, see export_playlist.
+
+        Parameters:
+        - playlists (list): Playlists from load_manifest.
+
+        Returns:
+        - list: Reports of the playlists in the manifest order.
+        """
+        if not playlists:
+            return []
+        if not self.sync and len(playlists) > 1:
+            return self.export_planned(playlists)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(playlists))) as executor:
+            return list(executor.map(self.export_playlist, playlists))
+
+
+def parse_args(argv):
+    """
+    Parses arguments of the export command.
+
+    Parameters:
+    - argv (list): Command line arguments following 'export'.
+
+    Returns:
+    - argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog='python -m src export',
+                                     description='Export Spotify playlists to YT Music without the GUI.')
+    parser.add_argument('manifest', help='JSON or text file with Spotify playlist IDs')
+    parser.add_argument('--report', default='export_report.ndjson',
+                        help='NDJSON report file (default export_report.ndjson)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f'playlists exported at once (default {config.cli_playlist_workers})')
+    parser.add_argument('--sync', action='store_true',
+                        help='sync previously exported playlists instead of creating new ones')
+    parser.add_argument('--spotify-token', default=os.environ.get('SPOTIFY_ACCESS_TOKEN'),
+                        help='Spotify access token (default $SPOTIFY_ACCESS_TOKEN)')
+    parser.add_argument('--spotify-refresh-token', default=os.environ.get('SPOTIFY_REFRESH_TOKEN'),
+                        help='Spotify refresh token used when the access token expires '
+                             '(default $SPOTIFY_REFRESH_TOKEN)')
+    parser.add_argument('--metrics',
+                        help='write metrics of API calls to this file, JSON if it ends with .json, else Prometheus')
+    parser.add_argument('--yt-auth', default=str(Path(__file__).resolve().parent.parent / 'assets' / 'oauth.json'),
+                        help='YT Music oauth.json or headers file (default src/assets/oauth.json)')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    """
+    Runs the export command.
+
+    Parameters:
+    - argv (list): Command line arguments following 'export'.
+
+    Returns:
+    - int: Exit code, 0 if all playlists were exported without failed songs.
+    """
+    # imported here so that 'python -m src export --help' stays fast
+    from src.SpotifyHandler.spotify_api import SpotifyApi
+    from src.SpotifyHandler.spotify_login import SpotifyLogin
+    from src.YTmusicHandler.export_journal import default_directory
+    from src.YTmusicHandler.match_cache import SongMatchCache
+    from src.YTmusicHandler.sync_state import SyncState
+    from src.YTmusicHandler.yt_music import YTMusicHandler
+
+    args = parse_args(argv)
+    if args.metrics:
+        get_metrics().enabled = True
+    login = SpotifyLogin()
+    if args.spotify_token or args.spotify_refresh_token:
+        login.token_store.set(args.spotify_token, args.spotify_refresh_token)
+    if not login.is_token_available():
+        print('Spotify access token is missing, use --spotify-token or --spotify-refresh-token', file=sys.stderr)
+        return 2
+
+    spotify = SpotifyApi(token_manager=login.token_manager)
+    spotify.access_token = login.access_token
+    yt_music_handler = YTMusicHandler(args.yt_auth, match_cache=SongMatchCache(), sync_state=SyncState(),
+                                      journal_dir=default_directory())
+    playlists = load_manifest(args.manifest)
+
+    with open(args.report, 'w', encoding='utf-8') as report:
+        results = BatchExporter(spotify, yt_music_handler, args.workers, args.sync, report).run(playlists)
+    if args.metrics:
+        get_metrics().write(args.metrics)
+
+    print(f'Exported {sum(result["status"] == "ok" for result in results)}/{len(results)} playlists, '
+          f'report written to {args.report}')
+    return 0 if all(result['status'] == 'ok' for result in results) else 1
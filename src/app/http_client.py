@@ -0,0 +1,146 @@
+"""
+HTTP client module
+
+Defines the HttpClient class, a thin layer over one shared requests.Session. The session keeps connections alive
+and pools them, so paging through the Spotify API does not pay a new TCP and TLS handshake for every request.
+Each client adds its own default headers (usually authorization) and default timeout to the shared session. A client
+with a token manager authorizes requests with its current token and repeats a request rejected with 401 once after
+refreshing the token.
+
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.app.metrics import endpoint_name, get_metrics
+from src.app.request_scheduler import get_scheduler
+from src.app.shared import shared_instance
+from src.assets import config
+
+@shared_instance
+def get_session():
+    """
+    Returns the shared session with connection pooling, creating it on first use.
+
+    Returns:
+    - requests.Session: The shared session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=config.http_pool_connections, pool_maxsize=config.http_pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+@shared_instance
+def get_client():
+    """
+    Returns the shared Spotify API client without default headers, using the shared request scheduler.
+
+    Returns:
+    - HttpClient: The shared client.
+    """
+    return HttpClient(scheduler=get_scheduler())
+
+
+class HttpClient:
+    """
+    Class that sends requests through the shared pooled session with default headers and timeout
+    """
+    def __init__(self, default_headers=None, timeout=None, session=None, scheduler=None, token_manager=None):
+        """
+        Initializes the HttpClient class.
+
+        Parameters:
+        - default_headers (dict, optional): Headers sent with every request, overridden by request headers.
+        - timeout (int, optional): Timeout in seconds for every request. Defaults to config.http_timeout.
+        - session (requests.Session, optional): Session used instead of the shared one.
+        - scheduler (RequestScheduler, optional): Scheduler that limits the request rate and retries failures.
+        - token_manager (TokenManager, optional): Source of the bearer token, overrides the Authorization header.
+        """
+        self.default_headers = dict(default_headers or {})
+        self.timeout = timeout or config.http_timeout
+        self.session = session
+        self.scheduler = scheduler
+        self.token_manager = token_manager
+
+    def request(self, method, url, headers=None, **kwargs):
+        """
+        Sends an HTTP request with the default headers and timeout.
+
+        Parameters:
+        - method (str): HTTP method, e.g. 'GET' or 'POST'.
+        - url (str): The URL to send the request to.
+        - headers (dict, optional): Headers added to the default headers.
+        - kwargs: Other arguments passed to requests.Session.request.
+
+        Returns:
+        - requests.Response: The response object.
+        """
+        merged_headers = {**self.default_headers, **(headers or {})}
+        kwargs.setdefault('timeout', self.timeout)
+        token = None
+        if self.token_manager is not None:
+            token = self.token_manager.get_token()
+            if token is not None:
+                merged_headers['Authorization'] = 'Bearer ' + token
+        response = self.send(method, url, merged_headers, kwargs)
+        if response.status_code == 401 and token is not None:
+            new_token = self.token_manager.refresh(token)
+            if new_token is not None and new_token != token:
+                merged_headers = {**merged_headers, 'Authorization': 'Bearer ' + new_token}
+                response = self.send(method, url, merged_headers, kwargs)
+        return response
+
+    def send(self, method, url, headers, kwargs):
+        """
+        Sends one request through the session, using the scheduler if there is one. Every attempt is recorded in the
+        shared metrics when they are enabled.
+
+        Returns:
+        - requests.Response: The response object.
+        """
+        session = self.session or get_session()
+        metrics = get_metrics()
+
+        def send_once():
+            if not metrics.enabled:
+                return session.request(method, url, headers=headers, **kwargs)
+            operation = endpoint_name(method, url)
+            with metrics.timer(operation):
+                response = session.request(method, url, headers=headers, **kwargs)
+            metrics.count('responses', f'{operation} {response.status_code}')
+            metrics.count('bytes_received', operation, len(response.content or b''))
+            return response
+
+        if self.scheduler is None:
+            return send_once()
+        return self.scheduler.execute(send_once, endpoint_name(method, url, host=True) if metrics.enabled else None)
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """
+        Sends an HTTP GET request.
+
+        Parameters:
+        - url (str): The URL to send the request to.
+        - headers (dict, optional): Headers added to the default headers.
+        - params (dict, optional): The parameters to include in the request.
+
+        Returns:
+        - requests.Response: The response object.
+        """
+        return self.request('GET', url, headers=headers, params=params, **kwargs)
+
+    def post(self, url, headers=None, data=None, **kwargs):
+        """
+        Sends an HTTP POST request.
+
+        Parameters:
+        - url (str): The URL to send the request to.
+        - headers (dict, optional): Headers added to the default headers.
+        - data (dict, optional): The form data to include in the request.
+
+        Returns:
+        - requests.Response: The response object.
+        """
+        return self.request('POST', url, headers=headers, data=data, **kwargs)
@@ -0,0 +1,275 @@
+"""
+Metrics module
+
+Defines the Metrics class, a small thread-safe registry of latency histograms and counters, and the shared
+registry used by the HTTP client, SpotifyApi, YTMusicHandler and the export engine. Latencies are recorded per
+operation (e.g. 'GET /v1/playlists/{id}/tracks' or 'ytmusic.search'), counters count retries, cache hits and misses
+and received bytes. The registry can be written as a Prometheus text file or a JSON summary. When it is disabled
+(config.metrics_enabled) recording returns right away, so the instrumentation costs almost nothing.
+
+"""
+
+import functools
+import json
+import re
+import threading
+import time
+
+from src.app.shared import shared_instance
+from src.assets import config
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # upper bounds of histogram buckets in seconds
+
+@shared_instance
+def get_metrics():
+    """
+    Returns the shared metrics registry, creating it on first use.
+
+    Returns:
+    - Metrics: The shared registry, enabled according to config.metrics_enabled.
+    """
+    return Metrics(enabled=config.metrics_enabled)
+
+
+def endpoint_name(method, url, host=False):
+    """
+    Creates the operation name of an HTTP request, with IDs in the path replaced by '{id}'.
+
+    Parameters:
+    - method (str): HTTP method.
+    - url (str): The URL of the request.
+    - host (bool, optional): Whether the host is kept before the path. Defaults to False.
+
+    Returns:
+    - str: E.g. 'GET /v1/playlists/{id}/tracks', or 'GET api.spotify.com/v1/playlists/{id}/tracks' with host.
+    """
+    match = re.match(r'^[a-z]+://([^/?]+)', url)
+    path = url[match.end():] if match else url
+    path = re.sub(r'/(playlists|tracks|albums|artists|users)/[^/?]+', r'/\1/{id}', path.split('?', 1)[0])
+    if host and match:
+        path = match.group(1) + path
+    return f'{method} {path}'
+
+
+def escape(value):
+    """
+    Escapes a Prometheus label value.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def instrument(operation):
+    """
+    Decorator recording the duration of every call of the function in the shared registry.
+
+    Parameters:
+    - operation (str): Name of the operation, e.g. 'spotify.get_all_playlists'.
+
+    Returns:
+    - callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = function(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                metrics.observe(operation, time.perf_counter() - started, failed)
+        return wrapper
+    return decorator
+
+
+class Metrics:
+    """
+    Class that collects latency histograms and counters
+    """
+    def __init__(self, enabled=True, buckets=BUCKETS):
+        """
+        Initializes the Metrics class.
+
+        Parameters:
+        - enabled (bool, optional): Whether values are recorded.
+        - buckets (tuple, optional): Upper bounds of the histogram buckets in seconds.
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}  # operation -> {'buckets': [...], 'sum': float, 'count': int, 'errors': int}
+        self.counters = {}  # (name, label) -> value
+
+    def observe(self, operation, seconds, failed=False):
+        """
+        Records the duration of one operation.
+
+        Parameters:
+        - operation (str): Name of the operation.
+        - seconds (float): The duration.
+        - failed (bool, optional): Whether the operation failed.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0, 'errors': 0}
+                self.histograms[operation] = histogram
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+            histogram['errors'] += failed
+
+    def count(self, name, label='', value=1):
+        """
+        Increases a counter.
+
+        Parameters:
+        - name (str): Name of the counter, e.g. 'retries', 'cache_hits' or 'bytes_received'.
+        - label (str, optional): Label of the counter, e.g. the operation or status code.
+        - value (int, optional): The increase.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + value
+
+    def timer(self, operation):
+        """
+        Returns a context manager recording the duration of its block.
+
+        Parameters:
+        - operation (str): Name of the operation.
+
+        Returns:
+        - context manager: Records the duration when the block exits, a failure if it raises.
+        """
+        return OperationTimer(self, operation)
+
+    def reset(self):
+        """
+        Removes all recorded values.
+        """
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """
+        Returns the recorded values as a JSON serializable dict.
+
+        Returns:
+        - dict: 'operations' with count, errors, total, mean and approximate p50/p95 seconds per operation, and
+          'counters' with values by counter name and label.
+        """
+        with self.lock:
+            histograms = {operation: dict(histogram, buckets=list(histogram['buckets']))
+                          for operation, histogram in self.histograms.items()}
+            counters = dict(self.counters)
+        operations = {}
+        for operation, histogram in sorted(histograms.items()):
+            operations[operation] = {
+                'count': histogram['count'],
+                'errors': histogram['errors'],
+                'total_seconds': histogram['sum'],
+                'mean_seconds': histogram['sum'] / histogram['count'] if histogram['count'] else 0.0,
+                'p50_seconds': self.quantile(histogram, 0.5),
+                'p95_seconds': self.quantile(histogram, 0.95),
+            }
+        counter_values = {}
+        for (name, label), value in sorted(counters.items()):
+            counter_values.setdefault(name, {})[label] = value
+        return {'operations': operations, 'counters': counter_values}
+
+    def quantile(self, histogram, q):
+        """
+        Estimates a quantile of a histogram as the upper bound of the bucket it falls into.
+
+        Returns:
+        - float or None: The bound in seconds, None if the quantile is above the largest bound or nothing was recorded.
+        """
+        if not histogram['count']:
+            return None
+        rank = q * histogram['count']
+        cumulative = 0
+        for bound, count in zip(self.buckets, histogram['buckets']):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return None
+
+    def to_prometheus(self):
+        """
+        Formats the recorded values in the Prometheus text exposition format.
+
+        Returns:
+        - str: The metrics text.
+        """
+        with self.lock:
+            histograms = {operation: dict(histogram, buckets=list(histogram['buckets']))
+                          for operation, histogram in self.histograms.items()}
+            counters = dict(self.counters)
+        lines = ['# HELP senyafy_operation_duration_seconds Duration of API calls and export steps.',
+                 '# TYPE senyafy_operation_duration_seconds histogram']
+        for operation, histogram in sorted(histograms.items()):
+            label = f'operation="{escape(operation)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                cumulative += count
+                lines.append(f'senyafy_operation_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'senyafy_operation_duration_seconds_bucket{{{label},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'senyafy_operation_duration_seconds_sum{{{label}}} {histogram["sum"]}')
+            lines.append(f'senyafy_operation_duration_seconds_count{{{label}}} {histogram["count"]}')
+        lines.append('# TYPE senyafy_operation_errors_total counter')
+        for operation, histogram in sorted(histograms.items()):
+            lines.append(f'senyafy_operation_errors_total{{operation="{escape(operation)}"}} {histogram["errors"]}')
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE senyafy_{name}_total counter')
+            for (counter, label), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f'senyafy_{name}_total{{label="{escape(label)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Writes the metrics to a file, as JSON summary if the path ends with '.json', otherwise in Prometheus format.
+
+        Parameters:
+        - path (str or Path): The output file.
+        """
+        path = str(path)
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                json.dump(self.summary(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+        print(f'Metrics written to {path}')
+
+
+class OperationTimer:
+    """
+    Context manager returned by Metrics.timer
+    """
+    __slots__ = ('metrics', 'operation', 'started')
+
+    def __init__(self, metrics, operation):
+        self.metrics = metrics
+        self.operation = operation
+        self.started = None
+
+    def __enter__(self):
+        if self.metrics.enabled:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.started is not None:
+            self.metrics.observe(self.operation, time.perf_counter() - self.started, exc_type is not None)
@@ -0,0 +1,193 @@
+"""
+Request scheduler module
+
+Defines the TokenBucket and RequestScheduler classes. The scheduler is shared by all Spotify API calls: every
+request first takes a token from the bucket, which keeps the whole app within one global request budget. Responses
+with 429 or 5xx status and connection errors are retried with jittered exponential backoff, and the 'Retry-After'
+header of a 429 response pauses the bucket for every thread, not only for the one that got it.
+
+"""
+
+import random
+import threading
+import time
+
+import requests
+
+from src.app.metrics import get_metrics
+from src.app.shared import shared_instance
+from src.assets import config
+
+@shared_instance
+def get_scheduler():
+    """
+    Returns the scheduler shared by all Spotify API calls, creating it on first use.
+
+    Returns:
+    - RequestScheduler: The shared scheduler.
+    """
+    return RequestScheduler()
+
+
+class TokenBucket:
+    """
+    Class that limits the rate of requests, allowing short bursts up to its capacity
+    """
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        """
+        Initializes the TokenBucket class.
+
+        Parameters:
+        - rate (float): Number of tokens added per second.
+        - capacity (int): Maximum number of stored tokens.
+        - clock (callable, optional): Function returning current time in seconds.
+        - sleep (callable, optional): Function used for waiting.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens for the given number of seconds.
+
+        The bucket is emptied and starts refilling only after the pause, so requests do not resume in a burst.
+
+        Parameters:
+        - seconds (float): How long to pause.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.updated = self.paused_until
+            self.tokens = 0
+
+    def acquire(self):
+        """
+        Takes one token, waiting until it is available.
+        """
+        while True:
+            with self.lock:
+                now = self.clock()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class RequestScheduler:
+    """
+    Class that sends requests within the request budget and retries transient failures
+    """
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, bucket=None, max_retries=None, backoff_base=None, backoff_cap=None, sleep=time.sleep):
+        """
+        Initializes the RequestScheduler class.
+
+        Parameters:
+        - bucket (TokenBucket, optional): Bucket limiting the request rate. Defaults to a bucket with
+          config.spotify_requests_per_second and config.spotify_request_burst.
+        - max_retries (int, optional): Number of retries of one request. Defaults to config.spotify_max_retries.
+        - backoff_base (float, optional): First backoff in seconds. Defaults to config.spotify_backoff_base.
+        - backoff_cap (float, optional): Maximum backoff in seconds. Defaults to config.spotify_backoff_cap.
+        - sleep (callable, optional): Function used for waiting.
+        """
+        if bucket is None:
+            bucket = TokenBucket(config.spotify_requests_per_second, config.spotify_request_burst, sleep=sleep)
+        self.bucket = bucket
+        self.max_retries = max_retries if max_retries is not None else config.spotify_max_retries
+        self.backoff_base = backoff_base if backoff_base is not None else config.spotify_backoff_base
+        self.backoff_cap = backoff_cap if backoff_cap is not None else config.spotify_backoff_cap
+        self.sleep = sleep
+
+    def backoff(self, attempt):
+        """
+        Computes the delay before the next attempt using exponential backoff with full jitter.
+
+        Parameters:
+        - attempt (int): Number of the failed attempt, starting from 0.
+
+        Returns:
+        - float: Delay in seconds.
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response):
+        """
+        Reads the 'Retry-After' header of the response.
+
+        Parameters:
+        - response (requests.Response): The response object.
+
+        Returns:
+        - float or None: Seconds to wait, None if the header is missing or invalid.
+        """
+        value = response.headers.get('Retry-After')
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def retry_label(endpoint, reason):
+        """
+        Creates the label of a retry counter.
+
+        Parameters:
+        - endpoint (str or None): Name of the endpoint, e.g. 'GET api.spotify.com/v1/playlists/{id}/tracks'.
+        - reason: Status code or name of the exception that caused the retry.
+
+        Returns:
+        - str: E.g. 'GET api.spotify.com/v1/playlists/{id}/tracks 429', only the reason without an endpoint.
+        """
+        return f'{endpoint} {reason}' if endpoint else str(reason)
+
+    def execute(self, send, endpoint=None):
+        """
+        Sends the request within the request budget and retries it on transient failures.
+
+        Parameters:
+        - send (callable): Function without arguments that sends the request and returns the response.
+        - endpoint (str, optional): Name of the endpoint the retries are counted for, see metrics.endpoint_name.
+
+        Returns:
+        - requests.Response: The first successful response, or the last response when all retries failed.
+
+        Raises:
+        - requests.exceptions.ConnectionError or requests.exceptions.Timeout: When the last attempt failed with it.
+        """
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                get_metrics().count('retries', self.retry_label(endpoint, type(e).__name__))
+                print(f'Request failed: {e}. Retrying in {delay:.1f} s')
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                if response.status_code == 429:
+                    self.bucket.pause(delay)
+                get_metrics().count('retries', self.retry_label(endpoint, response.status_code))
+                print(f'Request returned {response.status_code}. Retrying in {delay:.1f} s')
+            self.sleep(delay)
+            attempt += 1
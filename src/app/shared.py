@@ -0,0 +1,57 @@
+"""
+Shared instance module
+
+Defines the shared_instance decorator, which turns a factory function without parameters into a getter of one
+instance shared by the whole app, e.g. the metrics registry, the request scheduler or the pooled HTTP session.
+The instance is created on first use, under a lock, so threads starting at the same time get the same one.
+
+"""
+
+import functools
+import threading
+
+
+class SharedInstance:
+    """
+    Class that creates an instance with its factory on first call and returns the same instance afterwards
+    """
+    def __init__(self, factory):
+        """
+        Initializes the SharedInstance class.
+
+        Parameters:
+        - factory (callable): Function without parameters that creates the instance.
+        """
+        functools.update_wrapper(self, factory)
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.instance = None
+
+    def __call__(self):
+        """
+        Returns the shared instance, creating it on first call.
+        """
+        with self.lock:
+            if self.instance is None:
+                self.instance = self.factory()
+            return self.instance
+
+    def reset(self):
+        """
+        Forgets the shared instance, the next call creates a new one.
+        """
+        with self.lock:
+            self.instance = None
+
+
+def shared_instance(factory):
+    """
+    Decorator that makes a factory function return one shared instance.
+
+    Parameters:
+    - factory (callable): Function without parameters that creates the instance.
+
+    Returns:
+    - SharedInstance: The getter. Its 'instance' attribute can be replaced, e.g. by tests.
+    """
+    return SharedInstance(factory)
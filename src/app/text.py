@@ -0,0 +1,24 @@
+"""
+Text module
+
+Defines the normalization of titles and artist names shared by the Spotify library mirror and the YT Music track
+matcher, so a track is looked up locally and matched on YT Music by the same normalized text.
+
+"""
+
+import re
+
+
+def normalize(text):
+    """
+    Normalizes text for comparison.
+
+    Parameters:
+    - text (str or None): The text.
+
+    Returns:
+    - str: Lowercase text without punctuation and with collapsed whitespace.
+    """
+    if not text:
+        return ''
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
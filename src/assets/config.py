@@ -14,4 +14,48 @@ spotify_auth_url = 'https://accounts.spotify.com/authorize'
 spotify_user_info_url = 'https://api.spotify.com/v1/me'
 spotify_playlist_info_url = 'https://api.spotify.com/v1/playlists/'
 spotify_user_playlists_info_url = 'https://api.spotify.com/v1/me/playlists'
-spotify_token_url = 'https://accounts.spotify.com/api/token'
\ No newline at end of file
+spotify_token_url = 'https://accounts.spotify.com/api/token'
+
+yt_search_workers = 8  # number of concurrent YT Music searches during export
+yt_add_batch_size = 100  # number of videoIds pushed to a YT Music playlist in one request
+export_pipeline_queue_size = 200  # songs waiting between the fetch, resolve and add stages of a streamed export
+
+match_cache_file = 'match_cache.sqlite3'  # SQLite file in assets with songs resolved to YT Music videoIds
+match_cache_ttl = 30 * 24 * 60 * 60  # seconds after which cached song match expires
+match_cache_max_entries = 100000  # least recently used songs are removed above this limit
+
+spotify_page_workers = 4  # number of concurrently fetched pages of Spotify playlist tracks
+
+http_timeout = 30  # seconds to wait for HTTP response
+http_pool_connections = 10  # number of hosts with pooled keep-alive connections
+http_pool_maxsize = 32  # number of kept-alive connections per host
+
+spotify_requests_per_second = 10  # global budget of Spotify API requests
+spotify_request_burst = 20  # number of Spotify API requests allowed at once before the budget applies
+spotify_max_retries = 5  # retries of Spotify API request after 429, 5xx response or connection error
+spotify_backoff_base = 0.5  # seconds, first retry delay which doubles with each retry
+spotify_backoff_cap = 30  # seconds, maximum retry delay
+
+spotify_async_concurrency = 8  # number of Spotify API requests in flight in AsyncSpotifyApi
+
+spotify_prefetch_workers = 2  # number of playlists loaded at once in background after login
+
+match_threshold = 0.6  # minimal confidence (0-1) of YT Music search result to be exported
+match_duration_tolerance = 5  # seconds of duration difference still considered the same recording
+
+yt_playlist_index_ttl = 300  # seconds after which the YT Music library playlists are listed again
+
+sync_state_file = 'sync_state.sqlite3'  # database in assets remembering synced playlists
+library_mirror_file = 'library.sqlite3'  # database in assets mirroring Spotify playlists and their tracks
+
+export_journal_dir = 'journals'  # directory in assets with journals of unfinished exports, see export_journal.py
+export_journal_fsync_every = 100  # journal records written between syncs of the journal file to disk
+
+cli_playlist_workers = 4  # number of playlists exported at once by 'python -m src export'
+
+token_store_file = None  # e.g. 'spotify_token.enc' to keep Spotify tokens encrypted in assets between runs
+token_store_key_env = 'SENYAFY_TOKEN_KEY'  # environment variable with the Fernet key of the token file
+token_refresh_margin = 60  # seconds before expiry when the Spotify access token is refreshed
+
+metrics_enabled = False  # record latencies and counters of API calls, see src/app/metrics.py
+metrics_file = 'metrics.prom'  # file the metrics are written to after an export, '.json' for a JSON summary
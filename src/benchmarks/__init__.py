@@ -0,0 +1,3 @@
+"""
+Offline benchmarks of the Spotify client and the YT Music export, see src.benchmarks.runner
+"""
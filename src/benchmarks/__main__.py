@@ -0,0 +1,8 @@
+"""
+Module that runs the offline benchmarks, see src.benchmarks.runner
+"""
+
+from src.benchmarks.runner import main
+
+if __name__ == "__main__":
+    main()
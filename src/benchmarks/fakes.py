@@ -0,0 +1,258 @@
+"""
+Local stand-ins for the Spotify Web API and YouTube Music
+
+Defines the FakeSpotifyServer class, an HTTP server on localhost that serves paginated playlists and tracks in the
+format of the Spotify Web API with configurable latency and injected 429 responses, and the FakeYTMusic class, an
+object with the YTMusic methods used by the exporter with configurable search and add latency. Together they let
+the whole export run offline.
+
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+
+class FakeSpotifyServer:
+    """
+    Class that serves a generated Spotify library over HTTP on localhost
+    """
+    def __init__(self, playlists=10, tracks_per_playlist=20, playlist_sizes=None, latency=0.0, throttle_every=0):
+        """
+        Initializes the FakeSpotifyServer class.
+
+        Parameters:
+        - playlists (int, optional): Number of playlists in the library, their IDs are 'pl0', 'pl1', ...
+        - tracks_per_playlist (int, optional): Number of tracks of every playlist.
+        - playlist_sizes (dict, optional): Number of tracks of specific playlists by playlist ID.
+        - latency (float, optional): Seconds every response is delayed.
+        - throttle_every (int, optional): Every n-th request is answered with 429 and 'Retry-After: 0', 0 disables it.
+        """
+        self.playlists = playlists
+        self.tracks_per_playlist = tracks_per_playlist
+        self.playlist_sizes = dict(playlist_sizes or {})
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        """
+        URL of the server, e.g. 'http://127.0.0.1:12345'.
+        """
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """
+        Starts the server in a background thread on a free port.
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Request handler delegating to the FakeSpotifyServer
+            """
+            def do_GET(self):
+                status, body, headers = fake.handle(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def playlist_size(self, playlist_id):
+        """
+        Returns the number of tracks of the playlist.
+        """
+        return self.playlist_sizes.get(playlist_id, self.tracks_per_playlist)
+
+    def handle(self, path):
+        """
+        Answers one GET request.
+
+        Parameters:
+        - path (str): The request path with query.
+
+        Returns:
+        - tuple: (status code, JSON body, extra headers).
+        """
+        with self.lock:
+            self.requests += 1
+            throttle = self.throttle_every and self.requests % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            return 429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}}, {'Retry-After': '0'}
+
+        url = urlparse(path)
+        query = dict(parse_qsl(url.query))
+        parts = url.path.strip('/').split('/')
+        if parts == ['v1', 'me']:
+            return 200, {'id': 'benchmark_user', 'display_name': 'Benchmark'}, {}
+        if parts == ['v1', 'me', 'playlists']:
+            return 200, self.page(url.path, query, self.playlists, 50, self.playlist_item), {}
+        if len(parts) == 3 and parts[:2] == ['v1', 'playlists']:
+            return 200, self.playlist_item(int(parts[2][2:])), {}
+        if len(parts) == 4 and parts[:2] == ['v1', 'playlists'] and parts[3] == 'tracks':
+            playlist_id = parts[2]
+            return 200, self.page(url.path, query, self.playlist_size(playlist_id), 100,
+                                  lambda i: {'track': self.track_item(playlist_id, i)}), {}
+        return 404, {'error': {'status': 404, 'message': 'Not found'}}, {}
+
+    def page(self, path, query, total, default_limit, make_item):
+        """
+        Creates one page of a paginated response.
+        """
+        limit = int(query.get('limit', default_limit))
+        offset = int(query.get('offset', 0))
+        next_url = None
+        if offset + limit < total:
+            next_url = f'{self.base_url}{path}?{urlencode({"offset": offset + limit, "limit": limit})}'
+        items = [make_item(i) for i in range(offset, min(total, offset + limit))]
+        return {'href': f'{self.base_url}{path}', 'items': items, 'limit': limit, 'offset': offset, 'total': total,
+                'next': next_url, 'previous': None}
+
+    def playlist_item(self, index):
+        """
+        Creates the simplified playlist object of the index-th playlist.
+        """
+        playlist_id = f'pl{index}'
+        return {'id': playlist_id, 'name': f'Playlist {index}', 'snapshot_id': f'snapshot_{playlist_id}',
+                'images': [],
+                'tracks': {'href': f'{self.base_url}/v1/playlists/{playlist_id}/tracks',
+                           'total': self.playlist_size(playlist_id)}}
+
+    @staticmethod
+    def track_item(playlist_id, index):
+        """
+        Creates the track object of the index-th track of the playlist.
+        """
+        return {'id': f'{playlist_id}t{index}', 'name': f'Song {index}',
+                'artists': [{'name': f'Artist {index % 97}'}], 'album': {'name': f'Album {index % 31}'},
+                'duration_ms': 150000 + index % 120 * 1000, 'external_ids': {'isrc': f'XX{index:010d}'}}
+
+
+class FakeYTMusic:
+    """
+    Class with the YTMusic methods used by YTMusicHandler, answering after a configurable latency
+    """
+    def __init__(self, search_latency=0.0, add_latency=0.0, results=5):
+        """
+        Initializes the FakeYTMusic class.
+
+        Parameters:
+        - search_latency (float, optional): Seconds every search takes.
+        - add_latency (float, optional): Seconds every add_playlist_items call takes.
+        - results (int, optional): Number of results of every search. The first one is the matching song.
+        """
+        self.search_latency = search_latency
+        self.add_latency = add_latency
+        self.results = results
+        self.searches = 0
+        self.added = 0
+        self.first_added = None  # time.perf_counter() when the first add_playlist_items call returned
+        self.playlists = {}
+        self.details = {}  # playlist ID -> (title, description) of playlists created by create_playlist
+        self.lock = threading.Lock()
+
+    def search(self, query, filter=None):  # pylint: disable=redefined-builtin
+        """
+        Returns song results for the 'artists - name' query. Only songs are found, as with filter 'songs'.
+        """
+        if filter not in (None, 'songs'):
+            return []
+        with self.lock:
+            self.searches += 1
+        if self.search_latency:
+            time.sleep(self.search_latency)
+        artists, _, title = query.rpartition(' - ')
+        found = [{'videoId': f'v_{abs(hash(query))}', 'title': title,
+                  'artists': [{'name': artist} for artist in artists.split(',') if artist]}]
+        for i in range(1, self.results):
+            found.append({'videoId': f'v_{abs(hash(query))}_{i}', 'title': f'{title} (Live {i})',
+                          'artists': [{'name': f'Cover Band {i}'}]})
+        return found
+
+    def create_playlist(self, title, description):
+        """
+        Creates an empty playlist and returns its ID.
+        """
+        with self.lock:
+            playlist_id = f'yt_{len(self.playlists)}'
+            self.playlists[playlist_id] = []
+            self.details[playlist_id] = (title, description)
+        return playlist_id
+
+    def add_playlist_items(self, playlistId, videoIds):
+        """
+        Adds videos to the playlist.
+        """
+        if self.add_latency:
+            time.sleep(self.add_latency)
+        with self.lock:
+            self.playlists.setdefault(playlistId, []).extend(videoIds)
+            self.added += len(videoIds)
+            if self.first_added is None:
+                self.first_added = time.perf_counter()
+        return {'status': 'STATUS_SUCCEEDED'}
+
+    def get_library_playlists(self, limit=25):
+        """
+        Returns at most limit created playlists, all of them if limit is None.
+        """
+        with self.lock:
+            return [{'title': self.details.get(playlist_id, (playlist_id,))[0], 'playlistId': playlist_id}
+                    for playlist_id in self.playlists][:limit]
+
+    def get_playlist(self, playlistId, limit=100):
+        """
+        Returns the playlist with at most limit of its tracks, all of them if limit is None.
+        """
+        with self.lock:
+            videos = self.playlists.get(playlistId, [])[:limit]
+        return {'id': playlistId, 'tracks': [{'videoId': video_id, 'setVideoId': f'set_{i}'}
+                                             for i, video_id in enumerate(videos)]}
+
+    def remove_playlist_items(self, playlistId, videos):
+        """
+        Removes videos from the playlist.
+        """
+        removed = {video['videoId'] for video in videos}
+        with self.lock:
+            self.playlists[playlistId] = [video_id for video_id in self.playlists.get(playlistId, [])
+                                          if video_id not in removed]
+        return 'STATUS_SUCCEEDED'
@@ -0,0 +1,344 @@
+"""
+Benchmark runner module
+
+Runs offline benchmark scenarios of the Spotify client and the YT Music export against the local stand-ins from
+src.benchmarks.fakes and records the timings as JSON, so regressions in get_all_playlists, get_playlist_items and
+the export loops can be tracked between commits.
+
+Usage:
+    python -m src.benchmarks --output benchmark_results.json --compare previous_results.json
+
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from src.app import http_client, request_scheduler
+from src.app.batch_export import BatchExporter
+from src.app.request_scheduler import RequestScheduler, TokenBucket
+from src.assets import config
+from src.benchmarks.fakes import FakeSpotifyServer, FakeYTMusic
+from src.SpotifyHandler.spotify_api import SpotifyApi
+from src.SpotifyHandler.track import Track, TrackList
+from src.YTmusicHandler.export_engine import ExportEngine
+from src.YTmusicHandler.export_pipeline import ExportPipeline
+from src.YTmusicHandler.match_cache import SongMatchCache
+from src.YTmusicHandler.yt_music import YTMusicHandler
+
+SPOTIFY_LATENCY = 0.002  # seconds per fake Spotify response
+SEARCH_LATENCY = 0.002  # seconds per fake YT Music search
+ADD_LATENCY = 0.01  # seconds per fake YT Music add request
+IMPORT_TIME_LIMIT = 1.0  # seconds a fresh interpreter may take to import a module that loads before the window shows
+
+
+@contextlib.contextmanager
+def offline_spotify(server, rate=1000):
+    """
+    Points the Spotify API URLs at the fake server and replaces the shared request scheduler.
+
+    Parameters:
+    - server (FakeSpotifyServer): The started server.
+    - rate (float, optional): Requests per second allowed by the scheduler, high enough not to limit benchmarks.
+
+    Yields:
+    - SpotifyApi: Client with a dummy access token.
+    """
+    base_url = server.base_url
+    scheduler = RequestScheduler(TokenBucket(rate, rate), backoff_base=0.01, backoff_cap=0.1)
+    with patch.multiple(config, spotify_user_info_url=f'{base_url}/v1/me',
+                        spotify_playlist_info_url=f'{base_url}/v1/playlists/',
+                        spotify_user_playlists_info_url=f'{base_url}/v1/me/playlists'), \
+            patch.object(request_scheduler.get_scheduler, 'instance', scheduler), \
+            patch.object(http_client.get_client, 'instance', None):
+        spotify = SpotifyApi()
+        spotify.access_token = 'benchmark_token'
+        yield spotify
+
+
+def generate_tracks(count, prefix='bench'):
+    """
+    Generates tracks like the ones served by FakeSpotifyServer.
+
+    Parameters:
+    - count (int): Number of tracks.
+    - prefix (str, optional): Prefix of the track IDs.
+
+    Returns:
+    - TrackList: The tracks.
+    """
+    return TrackList(Track.from_api(FakeSpotifyServer.track_item(prefix, i)) for i in range(count))
+
+
+def measure(name, run, items, repeat=3, setup=None, **params):
+    """
+    Measures a scenario several times. Output printed by the measured code is suppressed.
+
+    Parameters:
+    - name (str): Name of the scenario.
+    - run (callable): Measured function accepting the value returned by setup.
+    - items (int): Number of processed items (tracks or playlists) in one run.
+    - repeat (int, optional): Number of runs.
+    - setup (callable, optional): Function called before every run, its time is not measured.
+    - params: Parameters of the scenario recorded in the result.
+
+    Returns:
+    - dict: The result with 'name', 'params', 'repeat', 'items', 'min', 'mean', 'max' and 'items_per_second'.
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            state = setup() if setup is not None else None
+            started = time.perf_counter()
+            run(state)
+            timings.append(time.perf_counter() - started)
+    result = {'name': name, 'params': params, 'repeat': repeat, 'items': items, 'min': min(timings),
+              'mean': statistics.mean(timings), 'max': max(timings),
+              'items_per_second': items / min(timings) if min(timings) > 0 else None}
+    print(f"{name} {params}: min {result['min']:.3f} s, mean {result['mean']:.3f} s, "
+          f"{result['items_per_second'] or 0:.0f} items/s")
+    return result
+
+
+def bench_get_playlist_items(sizes, repeat, throttle_every=0):
+    """
+    Benchmarks SpotifyApi.get_playlist_items with playlists of the given sizes.
+    """
+    name = 'get_playlist_items_throttled' if throttle_every else 'get_playlist_items'
+    sizes_by_id = {f'pl{i}': size for i, size in enumerate(sizes)}
+    server = FakeSpotifyServer(playlists=len(sizes), playlist_sizes=sizes_by_id, latency=SPOTIFY_LATENCY,
+                               throttle_every=throttle_every)
+    results = []
+    with server, offline_spotify(server) as spotify:
+        for playlist_id, size in sizes_by_id.items():
+            href = f'{server.base_url}/v1/playlists/{playlist_id}/tracks'
+            results.append(measure(name, lambda _, href=href: spotify.get_playlist_items(href), size, repeat,
+                                   tracks=size, throttle_every=throttle_every))
+    return results
+
+
+def bench_get_all_playlists(playlists, repeat):
+    """
+    Benchmarks SpotifyApi.get_all_playlists with a library of the given size.
+    """
+    server = FakeSpotifyServer(playlists=playlists, latency=SPOTIFY_LATENCY)
+    with server, offline_spotify(server) as spotify:
+        return [measure('get_all_playlists', lambda _: spotify.get_all_playlists(), playlists, repeat,
+                        playlists=playlists)]
+
+
+def bench_export(sizes, repeat):
+    """
+    Benchmarks ExportEngine.export with cold and warm match cache.
+    """
+    results = []
+    for size in sizes:
+        tracks = generate_tracks(size)
+
+        def cold_setup():
+            return ExportEngine(FakeYTMusic(SEARCH_LATENCY, ADD_LATENCY), cache=SongMatchCache(':memory:'))
+
+        def warm_setup(cold_setup=cold_setup, tracks=tracks):
+            engine = cold_setup()
+            engine.export('warmup', tracks)
+            return engine
+
+        def run(engine, tracks=tracks):
+            engine.export('benchmark', tracks)
+
+        results.append(measure('export', run, size, repeat, cold_setup, tracks=size, cache='cold'))
+        results.append(measure('export', run, size, repeat, warm_setup, tracks=size, cache='warm'))
+    return results
+
+
+def bench_batch_export(playlists, tracks_per_playlist, repeat):
+    """
+    Benchmarks the headless BatchExporter on a whole library, from Spotify requests to YT Music adds.
+    """
+    server = FakeSpotifyServer(playlists=playlists, tracks_per_playlist=tracks_per_playlist,
+                               latency=SPOTIFY_LATENCY)
+    manifest = [{'id': f'pl{i}', 'title': None} for i in range(playlists)]
+
+    def setup():
+        return YTMusicHandler(None, yt_music=FakeYTMusic(SEARCH_LATENCY, ADD_LATENCY),
+                              match_cache=SongMatchCache(':memory:'))
+
+    with server, offline_spotify(server) as spotify:
+        return [measure('batch_export', lambda handler: BatchExporter(spotify, handler).run(manifest),
+                        playlists * tracks_per_playlist, repeat, setup, playlists=playlists,
+                        tracks_per_playlist=tracks_per_playlist)]
+
+
+def import_in_subprocess(code, eager, _):
+    """
+    Runs the code in a fresh interpreter and adds the names it prints to the eager set.
+    """
+    eager.update(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                                text=True).stdout.split())
+
+
+def bench_import_time(modules, repeat, limit=IMPORT_TIME_LIMIT):
+    """
+    Benchmarks starting a fresh interpreter and importing a module, e.g. the GUI module that has to load before the
+    window shows. Modules that must be loaded lazily are reported as 'eager' if the import loads them, and the
+    fastest import is compared with the limit, recorded in the result as 'limit'.
+    """
+    lazy = ('ytmusicapi', 'flask', 'requests')
+    code = 'import sys, {module}; print(*[name for name in {lazy} if name in sys.modules])'
+    results = []
+    for module in modules:
+        eager = set()
+        run = functools.partial(import_in_subprocess, code.format(module=module, lazy=lazy), eager)
+        result = measure('import', run, 1, repeat, module=module)
+        result['eager'] = sorted(eager)
+        result['limit'] = limit
+        if result['min'] > limit:
+            print(f"import {module} took {result['min']:.3f} s, over the limit of {limit:.3f} s")
+        results.append(result)
+    return results
+
+
+def bench_time_to_first_add(size, repeat):
+    """
+    Benchmarks the time from starting the headless export of one playlist until its first songs are added, with
+    tracks retrieved all at once and streamed page by page.
+    """
+    server = FakeSpotifyServer(playlists=1, playlist_sizes={'pl0': size}, latency=SPOTIFY_LATENCY * 10)
+    results = []
+    with server, offline_spotify(server) as spotify:
+        for stream in (False, True):
+            first_add = []
+            for _ in range(repeat):
+                yt_music = FakeYTMusic(SEARCH_LATENCY, ADD_LATENCY)
+                handler = YTMusicHandler(None, yt_music=yt_music, match_cache=SongMatchCache(':memory:'))
+                exporter = BatchExporter(spotify, handler)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    started = time.perf_counter()
+                    result, description, tracks = exporter.fetch_playlist({'id': 'pl0', 'title': None}, stream)
+                    handler.create_playlist_push_songs(result['title'], description, tracks)
+                first_add.append(yt_music.first_added - started)
+            result = {'name': 'time_to_first_add', 'params': {'tracks': size, 'stream': stream}, 'repeat': repeat,
+                      'items': 1, 'min': min(first_add), 'mean': statistics.mean(first_add), 'max': max(first_add),
+                      'items_per_second': None}
+            print(f"time_to_first_add {result['params']}: min {result['min']:.3f} s, mean {result['mean']:.3f} s")
+            results.append(result)
+    return results
+
+
+def bench_streamed_export(size, repeat):
+    """
+    Benchmarks the export of one playlist streamed from Spotify page by page, exported batch by batch with
+    ExportEngine.export and in concurrent stages with ExportPipeline.
+    """
+    server = FakeSpotifyServer(playlists=1, playlist_sizes={'pl0': size}, latency=SPOTIFY_LATENCY * 10)
+    results = []
+    with server, offline_spotify(server) as spotify:
+        href = f'{server.base_url}/v1/playlists/pl0/tracks'
+        for exporter in ('engine', 'pipeline'):
+            def run(engine, exporter=exporter):
+                songs = spotify.iter_playlist_items(href)
+                if exporter == 'engine':
+                    engine.export('benchmark', songs)
+                else:
+                    ExportPipeline(engine).export('benchmark', songs)
+
+            results.append(measure('streamed_export', run, size, repeat,
+                                   lambda: ExportEngine(FakeYTMusic(SEARCH_LATENCY, ADD_LATENCY),
+                                                        cache=SongMatchCache(':memory:')),
+                                   tracks=size, exporter=exporter))
+    return results
+
+
+def run_benchmarks(quick=False, repeat=3):
+    """
+    Runs all benchmark scenarios.
+
+    Parameters:
+    - quick (bool, optional): Skip the largest scenarios.
+    - repeat (int, optional): Number of runs of every scenario.
+
+    Returns:
+    - list: Results of the scenarios, see measure.
+    """
+    sizes = [10, 1000] if quick else [10, 1000, 10000]
+    results = []
+    results += bench_get_playlist_items(sizes, repeat)
+    results += bench_get_playlist_items([1000], repeat, throttle_every=5)
+    results += bench_get_all_playlists(100 if quick else 500, repeat)
+    results += bench_export(sizes, repeat)
+    results += bench_batch_export(50 if quick else 500, 20, repeat if quick else 1)
+    results += bench_time_to_first_add(1000 if quick else 10000, repeat)
+    results += bench_streamed_export(1000 if quick else 10000, repeat)
+    results += bench_import_time(['src.gui.app', 'src.app.batch_export'], repeat)
+    return results
+
+
+def result_key(result):
+    """
+    Returns the key identifying a scenario across runs.
+    """
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline):
+    """
+    Prints the change of the minimal time of every scenario against a baseline.
+
+    Parameters:
+    - results (list): Current results.
+    - baseline (list): Results of a previous run.
+    """
+    previous = {result_key(result): result for result in baseline}
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None or not old['min']:
+            continue
+        change = (result['min'] - old['min']) / old['min'] * 100
+        print(f"{result['name']} {result['params']}: {old['min']:.3f} s -> {result['min']:.3f} s ({change:+.1f} %)")
+
+
+def over_limit(results):
+    """
+    Returns the results whose minimal time exceeds their 'limit'.
+    """
+    return [result for result in results if result.get('limit') is not None and result['min'] > result['limit']]
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks and writes the results as JSON. Exits with status 1 if a scenario exceeds its limit.
+
+    Parameters:
+    - argv (list, optional): Command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='python -m src.benchmarks', description='Run offline benchmarks.')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file the results are written to')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every scenario')
+    parser.add_argument('--quick', action='store_true', help='skip the 10k-track and 500-playlist scenarios')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick, args.repeat)
+    report = {'created': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(),
+              'quick': args.quick, 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f)['results'])
+
+    failed = over_limit(results)
+    if failed:
+        parser.exit(1, 'Over the limit: ' + ', '.join(f"{result['name']} {result['params']}" for result in failed)
+                    + '\n')
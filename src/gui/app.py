@@ -6,163 +6,39 @@ and export of songs between Spotify and YouTube Music. It includes functions for
 and updating playlists and songs, as well as handling user interactions for exporting songs.
 
 Classes:
-    - MessageWindow: Tkinter top level window with specified message in constructor
-    - YoutubePlaylistChooser: Tkinter top level window with YT Music user playlists
-    - ScrollableRadiobuttonFrame: Frame with responsive radiobutton list and functions to get checked, add, remove items
-    - ScrollableCheckBoxFrame: Frame with responsive checked box list and functions to get checked, add, remove items
     - App: main application that controls everything, updates UI.
 
+The windows and frames it is built from are defined in src.gui.widgets and src.gui.virtual_list.
+
 Note: Adjustments and modifications may be needed based on specific implementations and requirements.
 PS: I am very bad at planning and creating GUI. GUI logic and layout was taken as inspiration and modified to suit my
 purposes. https://github.com/TomSchimansky/CustomTkinter/tree/master/examples
 """
 
+import functools
 import os
+import queue
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import customtkinter
-import ytmusicapi
-from PIL import Image
 import json
 
-import src.app.auxiliary_functions as af
-from src.SpotifyHandler import spotify_login, my_flask, spotify_api
-from src.YTmusicHandler import yt_music
+from src.app import metrics
+from src.gui import icons
+from src.gui.virtual_list import VirtualCheckBoxFrame
+from src.gui.widgets import MessageWindow, ReportWindow, YoutubePlaylistChooser, ScrollableRadiobuttonFrame
 import src.assets.config as config
 
+# The handlers, requests and ytmusicapi are imported where they are first used, so the window shows without them
+# pylint: disable=import-outside-toplevel
+
 customtkinter.set_default_color_theme("green")  # Themes: "blue" (standard), "green", "dark-blue"
 customtkinter.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
 
 
-class MessageWindow(customtkinter.CTkToplevel):
-    """
-    Class that displays window with specified text
-    """
-
-    def __init__(self, master, text, **kwargs):
-        super().__init__(master, **kwargs)
-        self.geometry("400x300")
-
-        self.label = customtkinter.CTkLabel(self, text=text)
-        self.label.pack(padx=20, pady=20)
-
-
-class ReportWindow(customtkinter.CTkToplevel):
-    """
-    Class that displays window with specified text
-    """
-
-    def __init__(self, master, **kwargs):
-        super().__init__(master, **kwargs)
-        self.geometry("400x300")
-
-        self.textbox = customtkinter.CTkTextbox(self, width=400, height=300)
-        self.textbox.grid(row=1, column=1, sticky="nsew")
-
-
-class YoutubePlaylistChooser(customtkinter.CTkToplevel):
-    """
-    Class that displays playlists and list and lets to choose from it.
-    """
-
-    def __init__(self, master, item_list, button_command, **kwargs):
-        super().__init__(master, **kwargs)
-        self.export_command = button_command
-        self.geometry("400x300")
-        self.title("YT Music playlists")
-        self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(0, weight=1)
-        self.radiobutton_variable = customtkinter.StringVar()
-        self.scrollable_checkbox_frame = ScrollableRadiobuttonFrame(self, item_list=item_list,
-                                                                    label_text="Yours Youtube Playlists",
-                                                                    command=self.radiobutton_frame_event
-                                                                    )
-        self.button1 = customtkinter.CTkButton(self, text="Export to chosen playlist",
-                                               command=self.export_command)
-        # self.button1.configure(command=self.export_command)
-        self.scrollable_checkbox_frame.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="nsew")
-        self.button1.grid(row=2, column=0, padx=10, pady=10, sticky="ew", columnspan=2)
-
-    def get_checked_item(self):
-        return self.scrollable_checkbox_frame.get_checked_item()
-
-    def export_to_chosen_playlist(self):
-        print(f'Exporting to: {self.scrollable_checkbox_frame.get_checked_item()}')
-
-    def radiobutton_frame_event(self):
-        print(f"New YTMusic playlist chosen: {self.scrollable_checkbox_frame.get_checked_item()}")
-
-
-class ScrollableRadiobuttonFrame(customtkinter.CTkScrollableFrame):
-    """
-    Frame with responsive radiobutton list and functions to get checked, add, remove items
-    """
-
-    def __init__(self, master, item_list, command=None, **kwargs):
-        super().__init__(master, **kwargs)
-
-        self.command = command
-        self.radiobutton_variable = customtkinter.StringVar()
-        self.radiobutton_list = []
-        for i, item in enumerate(item_list):
-            self.add_item(item)
-
-    def add_item(self, item):
-        radiobutton = customtkinter.CTkRadioButton(self, text=item, value=item, variable=self.radiobutton_variable)
-        if self.command is not None:
-            radiobutton.configure(command=self.command)
-        radiobutton.grid(row=len(self.radiobutton_list), column=0, pady=(0, 10), sticky='w')
-        self.radiobutton_list.append(radiobutton)
-
-    def remove_item(self, item):
-        for radiobutton in self.radiobutton_list:
-            if item == radiobutton.cget("text"):
-                radiobutton.destroy()
-                self.radiobutton_list.remove(radiobutton)
-                return
-
-    def get_checked_item(self):
-        return self.radiobutton_variable.get()
-
-
-class ScrollableCheckBoxFrame(customtkinter.CTkScrollableFrame):
-    """
-    Frame with responsive checked box list and functions to get checked, add, remove items
-    """
-
-    def __init__(self, master, item_list, command=None, **kwargs):
-        super().__init__(master, **kwargs)
-
-        self.command = command
-        self.checkbox_list = []
-        for i, item in enumerate(item_list):
-            self.add_item(item)
-
-    def add_item(self, item):
-        checkbox = customtkinter.CTkCheckBox(self, text=item)
-        if self.command is not None:
-            checkbox.configure(command=self.command)
-        checkbox.grid(row=len(self.checkbox_list), column=0, pady=(0, 10), sticky='w')
-        self.checkbox_list.append(checkbox)
-
-    def remove_item(self, item):
-        for checkbox in self.checkbox_list:
-            if item == checkbox.cget("text"):
-                checkbox.destroy()
-                self.checkbox_list.remove(checkbox)
-                return
-
-    def remove_all(self):
-        for checkbox in self.checkbox_list:
-            checkbox.destroy()
-            self.checkbox_list.remove(checkbox)
-
-    def get_checked_items(self):
-        return [checkbox.cget("text") for checkbox in self.checkbox_list if checkbox.get() == 1]
-
-
 # https://github.com/TomSchimansky/CustomTkinter/blob/master/examples/image_example.py
 class App(customtkinter.CTk):
     """
@@ -179,27 +55,9 @@ class App(customtkinter.CTk):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
 
-        current_file = Path(__file__).resolve()
-        path = None
-        for parent in current_file.parents:
-            if parent.name == 'src':
-                path = parent
-                break
-        path = path / 'gui'
-
         # ------------------ USED IMAGES ------------------
-        self.home_logo_image = customtkinter.CTkImage(light_image=Image.open(path / 'black_text_logo.png'),
-                                                      dark_image=Image.open(path / 'white_text_logo.png'),
-                                                      size=(400, 200))
-        self.spotify_icon_image = customtkinter.CTkImage(Image.open(path / 'spotify-logo.png'), size=(20, 20))
-        self.yt_icon_image = customtkinter.CTkImage(Image.open(path / 'youtube.png'), size=(20, 20))
-        self.questionmark_image = customtkinter.CTkImage(Image.open(path / 'questionmark_green.png'), size=(20, 20))
-        self.connection_image = customtkinter.CTkImage(Image.open(path / 'connection.png'), size=(20, 20))
-        self.secret_icon_image = customtkinter.CTkImage(Image.open(path / 'egg.png'), size=(20, 20))
-        self.home_image = customtkinter.CTkImage(light_image=Image.open(path / 'home_green2.png'),
-                                                 dark_image=Image.open(path / 'home_green2.png'), size=(20, 20))
-        self.share_image = customtkinter.CTkImage(light_image=Image.open(path / 'share_green2edited.png'),
-                                                  dark_image=Image.open(path / 'share_green2edited.png'), size=(20, 20))
+        # icons are decoded and put to the widgets by show_icons once the window is shown
+        self.icons = icons.IconStore()
         # --------------------------------------------------
 
         # ---------------- create navigation frame ----------------------
@@ -218,7 +76,7 @@ class App(customtkinter.CTk):
                                                    text="Home",
                                                    fg_color="transparent", text_color=("gray10", "gray90"),
                                                    hover_color=("gray70", "gray30"),
-                                                   image=self.home_image, anchor="w", command=self.home_button_event,
+                                                   anchor="w", command=self.home_button_event,
                                                    font=("Futura", 16)
                                                    )
         self.home_button.grid(row=1, column=0, sticky="ew")
@@ -227,7 +85,7 @@ class App(customtkinter.CTk):
                                                      border_spacing=10, text="Export Music",
                                                      fg_color="transparent", text_color=("gray10", "gray90"),
                                                      hover_color=("gray70", "gray30"),
-                                                     image=self.share_image, anchor="w",
+                                                     anchor="w",
                                                      command=self.frame_2_button_event,
                                                      font=("Futura", 16)
                                                      )
@@ -237,7 +95,7 @@ class App(customtkinter.CTk):
                                                         border_spacing=10, text="About app",
                                                         fg_color="transparent", text_color=("gray10", "gray90"),
                                                         hover_color=("gray70", "gray30"),
-                                                        image=self.questionmark_image, anchor="w",
+                                                        anchor="w",
                                                         command=self.frame_3_button_event)
         self.about_app_button.grid(row=3, column=0, sticky="ew")
 
@@ -251,12 +109,12 @@ class App(customtkinter.CTk):
         self.home_frame = customtkinter.CTkFrame(self, corner_radius=0, fg_color="transparent")
         self.home_frame.grid_columnconfigure(0, weight=1)
 
-        self.home_frame_large_image_label = customtkinter.CTkLabel(self.home_frame, text="",
-                                                                   image=self.home_logo_image)
+        self.home_frame_large_image_label = customtkinter.CTkLabel(self.home_frame, text="", width=400,
+                                                                   height=200)
         self.home_frame_large_image_label.grid(row=0, column=0, padx=20, pady=10)
 
         self.home_spotify_login_button = customtkinter.CTkButton(self.home_frame, text="Spotify Login",
-                                                                 image=self.spotify_icon_image, compound="left",
+                                                                 compound="left",
                                                                  anchor="w",
                                                                  font=("Open Sans", 15),
                                                                  text_color=("#212121", "#FAFAFA"),
@@ -264,21 +122,21 @@ class App(customtkinter.CTk):
                                                                  )
         self.home_spotify_login_button.grid(row=1, column=0, padx=20, pady=10)
         self.home_yt_login_button = customtkinter.CTkButton(self.home_frame, text="Youtube Login",
-                                                            image=self.yt_icon_image, compound="left", anchor="w",
+                                                            compound="left", anchor="w",
                                                             font=("Open Sans", 14),
                                                             text_color=("#212121", "#FAFAFA"),
                                                             command=self.yt_login_button_pressed
                                                             )
         self.home_yt_login_button.grid(row=2, column=0, padx=20, pady=10)
         self.home_about_button = customtkinter.CTkButton(self.home_frame, text="Connection",
-                                                         image=self.connection_image, compound="left", anchor="w",
+                                                         compound="left", anchor="w",
                                                          font=("Open Sans", 15),
                                                          text_color=("#212121", "#FAFAFA"),
                                                          command=self.make_test_request
                                                          )
         self.home_about_button.grid(row=3, column=0, padx=20, pady=10)
         self.home_easter_egg_button = customtkinter.CTkButton(self.home_frame, text="Easter egg",
-                                                              image=self.secret_icon_image, compound="left", anchor="w",
+                                                              compound="left", anchor="w",
                                                               font=("Open Sans", 15),
                                                               text_color=("#212121", "#FAFAFA"),
                                                               command=self.easter_egg
@@ -293,27 +151,41 @@ class App(customtkinter.CTk):
 
         self.spotify_playlists_frame = ScrollableRadiobuttonFrame(self.export_frame, width=300,
                                                                   command=self.radiobutton_frame_event,
+                                                                  hover_command=self.playlist_hover_event,
                                                                   item_list=[],
                                                                   label_text="Yours Spotify Playlists",
+                                                                  multi_select=True,
                                                                   )
+        self.select_all_checkbox = customtkinter.CTkCheckBox(self.export_frame, text="Select all playlists",
+                                                             command=self.select_all_event)
 
-        self.spotify_songs_frame = ScrollableCheckBoxFrame(self.export_frame, width=300, height=200,
-                                                           command=self.checkbox_frame_event,
-                                                           item_list=[],
-                                                           label_text="Playlist Songs", )
+        self.spotify_songs_frame = VirtualCheckBoxFrame(self.export_frame, width=300, height=200,
+                                                        command=self.checkbox_frame_event,
+                                                        item_list=[],
+                                                        label_text="Playlist Songs", )
 
         self.spotify_playlists_frame.grid(row=0, column=0, padx=15, pady=15, sticky="new")
         self.spotify_songs_frame.grid(row=1, column=0, padx=15, pady=15, sticky="new")
+        self.select_all_checkbox.grid(row=2, column=0, padx=15, sticky="w")
         self.option_menu_export_frame = customtkinter.CTkOptionMenu(self.export_frame,
                                                                     values=["Export Current Playlist",
                                                                             "Export Chosen Songs to new Playlist",
-                                                                            "Export Chosen Songs to existing Playlist"
+                                                                            "Export Chosen Songs to existing Playlist",
+                                                                            "Sync Current Playlist",
+                                                                            "Export Selected Playlists"
                                                                             ],
                                                                     variable=customtkinter.StringVar(
                                                                         value="Export Options"),
                                                                     command=self.exportmenu_callback
                                                                     )
         self.option_menu_export_frame.grid(row=3, column=0, pady=10)
+
+        # progress of running export, shown only while export job runs
+        self.export_progress_bar = customtkinter.CTkProgressBar(self.export_frame)
+        self.export_progress_bar.set(0)
+        self.export_progress_label = customtkinter.CTkLabel(self.export_frame, text="")
+        self.export_cancel_button = customtkinter.CTkButton(self.export_frame, text="Cancel export",
+                                                            command=self.cancel_export)
         # -----------------------------------------------------------
 
         # create third frame
@@ -333,36 +205,63 @@ class App(customtkinter.CTk):
         self.chosen_songs = []  # chosen songs in current spotify playlist
         self.current_playlist = None  # current chosen spotify playlist in frame
         self.yt_connected = False  # bool to know if yt music api is successfully connected
+        self.prefetcher = None  # loads tracks of all spotify playlists in background
+        self.export_job = None  # export running in background thread
+        self.ui_queue = queue.Queue()  # callables from background threads that must run on the Tk thread
+
+        self.after(100, self.process_ui_queue)
+
+    def call_in_main_thread(self, function, *args):
+        """
+        Schedules function to run on the Tk thread. Safe to call from any thread.
+
+        Parameters:
+        - function (callable): Function to run.
+        - args: Arguments of the function.
+        """
+        self.ui_queue.put((function, args))
+
+    def process_ui_queue(self):
+        """
+        Runs callables scheduled by background threads and plans its next run.
+        """
+        try:
+            while True:
+                function, args = self.ui_queue.get_nowait()
+                function(*args)
+        except queue.Empty:
+            pass
+        self.after(100, self.process_ui_queue)
 
     def initialize(self):
         """
         Initializes the necessary components for the application.
 
         This function performs the following tasks:
-        1. Clears the contents of the access and refresh token files.
-        2. Sets up Spotify API credentials and authentication parameters.
-        3. Initializes a SpotifyLogin instance for user authentication.
-        4. Initializes a SpotifyApi instance for making API requests.
+        1. Sets up Spotify API credentials and authentication parameters.
+        2. Initializes a SpotifyLogin instance for user authentication.
+        3. Initializes a SpotifyApi instance for making API requests and shows the playlists of the local library
+           mirror right away.
+        4. Subscribes to the token store, so playlists are loaded as soon as the Spotify token arrives.
 
         Note: This function is typically called at the start of the application to ensure a clean and
         well-configured state for handling Spotify authentication and API interactions.
         """
 
-        access_token_path, refresh_token_path = af.find_files()
-
-        with open(access_token_path, "w") as f:
-            f.truncate(0)
-
-        with open(refresh_token_path, "w") as f:
-            f.truncate(0)
-
         # client_id = config.spotify_client_id
         # redirect_uri = config.spotify_redirect_uri
         # client_secret = config.spotify_client_secret
         # port = config.port
 
+        # the handlers and requests are loaded here, after the main loop has shown the window
+        from src.SpotifyHandler import spotify_login, spotify_api, library_mirror
+
         self.spotifyLogin = spotify_login.SpotifyLogin()
-        self.spotifyApi = spotify_api.SpotifyApi()
+        self.spotifyApi = spotify_api.SpotifyApi(token_manager=self.spotifyLogin.token_manager,
+                                                 mirror=library_mirror.LibraryMirror())
+        self.spotifyApi.load_from_mirror()
+        self.show_spotify_playlists(prefetch=False)
+        self.spotifyLogin.token_store.subscribe(self.spotify_token_received)
 
     def make_test_request(self):
         """
@@ -410,7 +309,7 @@ class App(customtkinter.CTk):
         3. Initiates the YouTube Music OAuth process by calling ytmusicapi.setup_oauth with open_browser=True.
         4. Saves the OAuth response data to the 'oauth.json' file.
         5. Creates an instance of YTMusicHandler using the 'oauth.json' file.
-        6. Sets self.yt_connected to True if the YTMusicHandler instance is successfully created.
+        6. Hands it over to the Tk thread, which sets self.ytMusic and self.yt_connected, see yt_connected_event.
         7. Prints a confirmation message indicating that the OAuth JSON has been saved.
         """
         current_folder = Path(__file__).resolve().parent.parent
@@ -419,14 +318,26 @@ class App(customtkinter.CTk):
             os.remove(oauth_json_path)
         except Exception:
             raise
+        import ytmusicapi  # loaded on first use, it is not needed to show the window
+        from src.YTmusicHandler import yt_music, match_cache, sync_state, export_journal
+
         ret = ytmusicapi.setup_oauth(open_browser=True)
         with open(oauth_json_path, 'w') as json_file:
             json.dump(ret, json_file, indent=4)
-        self.ytMusic = yt_music.YTMusicHandler(oauth_json_path)
-        if self.ytMusic is not None:
-            self.yt_connected = True
+        handler = yt_music.YTMusicHandler(oauth_json_path, match_cache=match_cache.SongMatchCache(),
+                                          sync_state=sync_state.SyncState(),
+                                          journal_dir=export_journal.default_directory())
+        self.call_in_main_thread(self.yt_connected_event, handler)
         print("oauth json saved in src/assets")
 
+    def yt_connected_event(self, handler):
+        """
+        Starts using the authenticated YT Music handler. Runs on the Tk thread, the handler may be created in the
+        thread of connect_services.
+        """
+        self.ytMusic = handler
+        self.yt_connected = True
+
     def init_spotify_terminal(self):
         """
         Initiates the Spotify authentication process through the terminal.
@@ -437,6 +348,8 @@ class App(customtkinter.CTk):
 
         Note: This function is typically used to start the authentication process for Spotify in a terminal.
         """
+        import src.app.auxiliary_functions as af
+
         url = self.spotifyLogin.get_authorization_url()
         af.open_browser(url)
 
@@ -449,6 +362,8 @@ class App(customtkinter.CTk):
         2. Runs the Flask application, allowing it to handle requests related to Spotify functionalities.
 
         """
+        from src.SpotifyHandler import my_flask  # Flask is loaded in the server thread, after the window is shown
+
         my_flask_obj = my_flask.MyFlask(self.spotifyLogin)
         my_flask_obj.run()
 
@@ -492,6 +407,8 @@ class App(customtkinter.CTk):
         """
         Select about app frame
         """
+        import src.app.auxiliary_functions as af
+
         af.open_browser('https://gitlab.fit.cvut.cz/BI-PYT/b231/pogodars/-/blob/semestral/README.md?ref_type=heads')
         self.select_frame_by_name("frame_3")
 
@@ -509,18 +426,76 @@ class App(customtkinter.CTk):
         This function is triggered when a user selects a different Spotify playlist, and it ensures that the
         application has the necessary playlist information for further interactions.
         """
+        from src.SpotifyHandler import spotify_api
+
         print(f"Spotify playlist chosen: {self.spotify_playlists_frame.get_checked_item()}")
-        print(f'Getting items for {self.spotify_playlists_frame.get_checked_item()}...')
         name = self.spotify_playlists_frame.get_checked_item()
         if name in self.spotifyApi.spotify_playlist_songs:
             self.current_playlist = name
+        elif self.prefetcher is not None and not self.prefetcher.has_failed(name):
+            # songs frame is updated by playlist_loaded_event once the prefetcher loads the playlist
+            print(f'Getting items for {name} in background...')
+            self.prefetcher.prioritize(name)
+            return
         else:
+            # no prefetcher, or loading in background failed: load in foreground and report a failure
+            print(f'Getting items for {name}...')
             p_id = self.spotifyApi.spotify_playlists[name]['tracks_api']
-            self.spotifyApi.spotify_playlist_songs[name] = self.spotifyApi.get_playlist_items(p_id['href'])
+            try:
+                self.spotifyApi.store_playlist_songs(name, self.spotifyApi.get_playlist_items(p_id['href']))
+            except spotify_api.SpotifyApiError as e:
+                self.message_window = MessageWindow(master=self, text=f'Loading {name} failed: {e}')
+                return
             self.current_playlist = name
 
         self.update_songs_frame()
 
+    def select_all_event(self):
+        """
+        Checks or unchecks all Spotify playlists for the bulk export.
+        """
+        self.spotify_playlists_frame.select_all(self.select_all_checkbox.get() == 1)
+
+    def playlist_hover_event(self, name):
+        """
+        Moves the hovered Spotify playlist to the front of the prefetch queue.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.prioritize(name)
+
+    def playlist_loaded_event(self, name):
+        """
+        Shows songs of the playlist loaded in background if it is the chosen playlist. Runs on the Tk thread.
+        """
+        if name == self.spotify_playlists_frame.get_checked_item() and name != self.current_playlist:
+            self.current_playlist = name
+            self.update_songs_frame()
+
+    def playlist_failed_event(self, name, error):
+        """
+        Reports that loading the playlist in background failed if it is the chosen playlist. Runs on the Tk thread.
+
+        Clicking the playlist again loads it in the foreground, see radiobutton_frame_event.
+        """
+        if name == self.spotify_playlists_frame.get_checked_item() and name != self.current_playlist:
+            self.message_window = MessageWindow(master=self, text=f'Loading {name} failed: {error}')
+
+    def start_prefetching(self):
+        """
+        Starts loading tracks of all Spotify playlists in background threads.
+
+        Loaded and failed playlists are handed back to the Tk thread through call_in_main_thread.
+        """
+        from src.SpotifyHandler import playlist_prefetcher
+
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        self.prefetcher = playlist_prefetcher.PlaylistPrefetcher(
+            self.spotifyApi, on_loaded=lambda name: self.call_in_main_thread(self.playlist_loaded_event, name),
+            on_failed=lambda name, error: self.call_in_main_thread(self.playlist_failed_event, name, error))
+        self.prefetcher.enqueue(list(self.spotifyApi.spotify_playlists))
+        self.prefetcher.start()
+
     def open_yt_playlist_chooser(self):
         """
         Opens a window for choosing YouTube playlists and exporting songs to the chosen playlist.
@@ -550,9 +525,9 @@ class App(customtkinter.CTk):
         """
         if self.yt_playlists_chooser_window.winfo_exists:
             playlist_name = self.yt_playlists_chooser_window.get_checked_item()
-            error = self.ytMusic.push_to_existing_playlist(playlist_name,
-                                                           self.spotify_songs_frame.get_checked_items())
-            self.report_export(error)
+            songs = self.spotify_songs_frame.get_checked_items()
+            self.start_export(functools.partial(self.ytMusic.push_to_existing_playlist, playlist_name, songs),
+                              len(songs))
 
     def exportmenu_callback(self, choice):
         """
@@ -571,34 +546,175 @@ class App(customtkinter.CTk):
             description = f'Exported songs from Spotify'
             print("Playlist name: ", text)
             if text is not None:
-                errors = self.ytMusic.create_playlist_push_songs(text, description,
-                                                                 self.spotify_songs_frame.get_checked_items())
-                self.report_export(errors)
+                songs = self.spotify_songs_frame.get_checked_items()
+                self.start_export(functools.partial(self.ytMusic.create_playlist_push_songs, text, description, songs),
+                                  len(songs))
         if choice == 'Export Chosen Songs to existing Playlist':
             self.open_yt_playlist_chooser()
             self.yt_playlists_chooser_window.focus()
         if choice == 'Export Current Playlist':
             description = f'Exported {self.current_playlist} playlist from Spotify'
-            errors = self.ytMusic.create_playlist_push_songs(self.current_playlist,
-                                                             description,
-                                                             self.spotifyApi.spotify_playlist_songs[
-                                                                 self.current_playlist]
-                                                             )
-            self.report_export(errors)
+            songs = self.spotifyApi.spotify_playlist_songs[self.current_playlist]
+            self.start_export(functools.partial(self.ytMusic.create_playlist_push_songs, self.current_playlist,
+                                                description, songs),
+                              len(songs))
             print("Export to new playlist")
+        if choice == 'Sync Current Playlist':
+            playlist = self.spotifyApi.spotify_playlists[self.current_playlist]
+            description = f'Synced {self.current_playlist} playlist from Spotify'
+            songs = self.spotifyApi.spotify_playlist_songs[self.current_playlist]
+            self.start_export(functools.partial(self.ytMusic.sync_playlist,
+                                                playlist.get('id') or self.current_playlist, self.current_playlist,
+                                                description, playlist.get('snapshot_id'), songs,
+                                                remove_deleted=True),
+                              len(songs))
+        if choice == 'Export Selected Playlists':
+            self.export_selected_playlists()
+
+    def export_selected_playlists(self):
+        """
+        Exports every Spotify playlist checked in the playlists frame to its own new YT Music playlist as one export
+        job with one progress bar.
+
+        The number of songs of playlists that are not loaded yet is taken from Spotify, their tracks are loaded by
+        the job.
+        """
+        names = self.spotify_playlists_frame.get_selected_items()
+        if not names:
+            self.message_window = MessageWindow(master=self, text='Check the playlists to export first')
+            return
+        loaded = self.spotifyApi.spotify_playlist_songs
+        total = sum(len(loaded[name]) if name in loaded else
+                    self.spotifyApi.spotify_playlists[name]['tracks_api'].get('total') or 0 for name in names)
+        print(f"Export of {len(names)} playlists")
+        self.start_export(functools.partial(self.export_playlists, names), total)
+
+    def export_playlists(self, names, on_progress=None, cancel_event=None):
+        """
+        Loads tracks of the playlists that are not loaded yet and exports the playlists together. Runs in the export
+        job thread.
+
+        Songs shared by more playlists are searched only once and all playlists use one pool of search workers and
+        the match cache, see YTMusicHandler.export_playlists.
 
-    def report_export(self, errors):
+        Parameters:
+        - names (list): Names of the Spotify playlists.
+        - on_progress (callable, optional): Called after each playlist is filled, see ExportJob.update.
+        - cancel_event (threading.Event, optional): When set, songs not exported yet are returned as failed.
+
+        Returns:
+        - list: Failed songs prefixed with the name of their playlist. A playlist whose tracks could not be loaded
+          is reported by one item with the error, the other playlists are exported.
+        """
+        from src.SpotifyHandler import spotify_api
+
+        failed_loads = {}  # playlist name -> SpotifyApiError of playlists that could not be loaded
+
+        def load(name):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            href = self.spotifyApi.spotify_playlists[name]['tracks_api']['href']
+            try:
+                self.spotifyApi.store_playlist_songs(name, self.spotifyApi.get_playlist_items(href))
+            except spotify_api.SpotifyApiError as e:
+                print(f'Loading {name} failed: {e}')
+                failed_loads[name] = e
+                if on_progress is not None:
+                    on_progress(failed=self.spotifyApi.spotify_playlists[name]['tracks_api'].get('total') or 0)
+
+        songs = self.spotifyApi.spotify_playlist_songs
+        missing = [name for name in names if name not in songs]
+        if missing:
+            print(f'Getting items for {len(missing)} playlists...')
+            with ThreadPoolExecutor(max_workers=config.spotify_prefetch_workers) as executor:
+                list(executor.map(load, missing))
+        errors = [f'{name}: loading the playlist failed: {failed_loads[name]}' for name in names
+                  if name in failed_loads]
+        loaded = [name for name in names if name in songs]
+        if cancel_event is not None and cancel_event.is_set():
+            return errors + [f'{name}: {song}' for name in loaded for song in songs[name]]
+        playlists = [(name, f'Exported {name} playlist from Spotify', songs[name]) for name in loaded]
+        export_errors = self.ytMusic.export_playlists(playlists, on_progress, cancel_event)
+        return errors + [f'{name}: {song}' for name, playlist_errors in zip(loaded, export_errors)
+                         for song in playlist_errors]
+
+    def start_export(self, export, total):
+        """
+        Runs the export as a background job and shows its progress in the export frame.
+
+        Only one export runs at a time. After the job finishes its result is passed to report_export.
+
+        Parameters:
+        - export (callable): Export function accepting 'on_progress' and 'cancel_event' keyword arguments.
+        - total (int): Number of songs to export.
+        """
+        from src.YTmusicHandler import export_job
+
+        if self.export_job is not None and self.export_job.is_running():
+            self.message_window = MessageWindow(master=self, text='Another export is running. Please wait')
+            return
+        self.export_job = export_job.ExportJob(export, total)
+        self.export_progress_bar.set(0)
+        self.export_progress_label.configure(text=f"Exporting {total} songs...")
+        self.export_progress_bar.grid(row=4, column=0, padx=15, sticky="ew")
+        self.export_progress_label.grid(row=5, column=0, padx=15)
+        self.export_cancel_button.grid(row=6, column=0, pady=(0, 10))
+        self.export_job.start()
+        self.after(250, self.update_export_progress)
+
+    def update_export_progress(self):
+        """
+        Updates the progress bar and label with the state of the running export job.
+
+        Reschedules itself while the job runs, then hides the progress widgets and reports the result.
+        """
+        job = self.export_job
+        progress = job.snapshot()
+        self.export_progress_bar.set(progress['fraction'])
+        eta = f"{progress['eta']:.0f} s" if progress['eta'] is not None else "-"
+        self.export_progress_label.configure(
+            text=f"Exported {progress['done']}/{progress['total']}, failed {progress['failed']} | "
+                 f"{progress['throughput']:.1f} songs/s | ETA {eta}")
+        if progress['running']:
+            self.after(250, self.update_export_progress)
+            return
+
+        self.export_progress_bar.grid_forget()
+        self.export_progress_label.grid_forget()
+        self.export_cancel_button.grid_forget()
+        if metrics.get_metrics().enabled:
+            metrics.get_metrics().write(config.metrics_file)
+        if job.error is not None:
+            self.message_window = MessageWindow(master=self, text=f'Export failed: {job.error}')
+        else:
+            self.report_export(job.result, job.cancelled)
+
+    def cancel_export(self):
+        """
+        Cancels the running export job. Songs that were not exported are reported as failed.
+        """
+        if self.export_job is not None and self.export_job.is_running():
+            print("Cancelling export...")
+            self.export_job.cancel()
+
+    def report_export(self, errors, cancelled=False):
         """
         Reports the result of the song export operation.
 
         This function is typically called after an attempt to export songs to a YouTube playlist.
         It communicates the outcome of the export operation to the user, allowing user to identify which songs were
         failed to export
+
+        Parameters:
+        - errors (list): Songs that failed to export.
+        - cancelled (bool, optional): Whether the export was cancelled, the errors then include songs not exported.
         """
         if len(errors) == 0:
-            self.message_window = MessageWindow(master=self, text='All songs exported!')
+            self.message_window = MessageWindow(master=self,
+                                                text='Export cancelled' if cancelled else 'All songs exported!')
         else:
-            result_list = ["Failed songs to export:"] + errors
+            heading = "Export cancelled, songs not exported:" if cancelled else "Failed songs to export:"
+            result_list = [heading] + [str(song) for song in errors]
             result_string = '\n'.join(result_list)
             # self.message_window = MessageWindow(master=self, text=result_string)
             self.report_window = ReportWindow(master=self)
@@ -606,15 +722,17 @@ class App(customtkinter.CTk):
 
     def checkbox_frame_event(self):
         """
-        Prints chosen songs in current Spotify playlist in console
+        Prints number of chosen songs in current Spotify playlist in console
         """
-        print(f"Chosen songs modified: {self.spotify_songs_frame.get_checked_items()}")
+        print(f"Chosen songs modified: {len(self.spotify_songs_frame.get_checked_items())} songs chosen")
 
     @staticmethod
     def easter_egg():
         """
         Just easter egg function
         """
+        import src.app.auxiliary_functions as af
+
         af.open_browser('https://www.youtube.com/watch?v=dQw4w9WgXcQ&ab_channel=RickAstley')
 
     def yt_login_button_pressed(self):
@@ -632,7 +750,7 @@ class App(customtkinter.CTk):
             return
         try:
             self.init_yt_oauth_terminal()
-        except Exception as e:
+        except (OSError, ValueError, KeyError) as e:  # requests errors are OSErrors, bad responses ValueErrors
             print(f'Error {e}. Please try again!')
 
     def spotify_login_button_pressed(self):
@@ -658,9 +776,37 @@ class App(customtkinter.CTk):
         if it has been used by other application
 
         This function is the entry point for running the SenyaFy Music Converter application.
-        It sets up the necessary components, starts the Flask web server, and initiates the authentication processes.
+        It sets up the necessary components on the Tk thread and starts the Flask web server and the authentication
+        processes in a background thread, so the window stays responsive while they wait for the network or the user.
         """
         self.initialize()
+        threading.Thread(target=self.connect_services, daemon=True).start()
+        self.after_idle(self.show_icons)
+
+    def show_icons(self):
+        """
+        Decodes the icons and shows them in the widgets. Called once the window is shown, so decoding the icons
+        does not delay its first frame.
+        """
+        widget_icons = (
+            (self.home_frame_large_image_label, 'black_text_logo.png', (400, 200), 'white_text_logo.png'),
+            (self.home_button, 'home_green2.png', (20, 20), None),
+            (self.export_button, 'share_green2edited.png', (20, 20), None),
+            (self.about_app_button, 'questionmark_green.png', (20, 20), None),
+            (self.home_spotify_login_button, 'spotify-logo.png', (20, 20), None),
+            (self.home_yt_login_button, 'youtube.png', (20, 20), None),
+            (self.home_about_button, 'connection.png', (20, 20), None),
+            (self.home_easter_egg_button, 'egg.png', (20, 20), None),
+        )
+        for widget, name, size, dark_name in widget_icons:
+            widget.configure(image=self.icons.get(name, size, dark_name))
+
+    def connect_services(self):
+        """
+        Waits for the redirect port, starts the Flask web server and authenticates to Spotify and YT Music.
+        Runs in a background thread started by run.
+        """
+        import src.app.auxiliary_functions as af
 
         while af.find_open_port(config.port, config.port) is None:
             time.sleep(2)
@@ -670,17 +816,19 @@ class App(customtkinter.CTk):
         flask_thread.daemon = True
         flask_thread.start()
         print("------SenyaFy Music converter------")
-        af.clear_files()
         try:
             print("------Spotify authentication------")
-            print("Please confirm in your browser")
-            self.init_spotify_terminal()
-        except Exception as e:
+            if self.spotifyLogin.is_token_available():
+                print("Using stored Spotify access token")
+            else:
+                print("Please confirm in your browser")
+                self.init_spotify_terminal()
+        except (OSError, ValueError) as e:
             print(f'Error: {e}')
         try:
             print("------YT Music authentication------")
             self.init_yt_oauth_terminal()
-        except Exception as e:
+        except (OSError, ValueError, KeyError) as e:
             print(f'YTMusic auth Error, please connect manually: {e}')
 
     def update_playlists(self, spot=True, yt=True):
@@ -691,12 +839,57 @@ class App(customtkinter.CTk):
         It updates both Spotify and YouTube Music playlists based on the provided flags.
         """
         if self.spotifyApi is not None and spot:
-            self.spotifyApi.get_all_playlists()
-            for playlist in self.spotifyApi.spotify_playlists:
-                self.spotify_playlists_frame.add_item(playlist)
+            self.spotifyApi.refresh_library()
+            self.show_spotify_playlists()
         if self.ytMusic is not None and yt:
             self.ytMusic.get_current_playlists()
 
+    def spotify_token_received(self, access_token):
+        """
+        Called by the token store when the user logs in to Spotify, usually in the Flask callback thread. Refreshes
+        of the access token by the token manager do not call it, so the library is not reloaded every hour.
+
+        Playlists are loaded in a new background thread, so the callback answers the browser right away, and shown
+        on the Tk thread.
+
+        Parameters:
+        - access_token (str): The Spotify access token.
+        """
+        print("Spotify access token received. Getting playlists...")
+        self.spotifyLogin.access_token = access_token
+        self.spotifyApi.access_token = access_token
+        threading.Thread(target=self.load_spotify_playlists, daemon=True).start()
+
+    def load_spotify_playlists(self):
+        """
+        Reconciles the library mirror with Spotify in a background thread and hands the playlists over to the Tk
+        thread. Tracks of playlists whose snapshot did not change are kept from the mirror.
+        """
+        self.spotifyApi.refresh_library()
+        self.call_in_main_thread(self.show_spotify_playlists)
+
+    def show_spotify_playlists(self, prefetch=True):
+        """
+        Shows retrieved Spotify playlists in the playlists frame and starts prefetching their tracks.
+
+        Parameters:
+        - prefetch (bool, optional): Whether tracks of playlists that are not loaded are prefetched.
+        """
+        playlists = self.spotifyApi.spotify_playlists
+        shown = {radiobutton.cget("text") for radiobutton in self.spotify_playlists_frame.radiobutton_list}
+        for playlist in shown - set(playlists):
+            self.spotify_playlists_frame.remove_item(playlist)
+        for playlist in playlists:
+            if playlist not in shown:
+                self.spotify_playlists_frame.add_item(playlist)
+        if not prefetch:
+            return
+        self.start_prefetching()
+        if self.current_playlist is not None and self.current_playlist not in self.spotifyApi.spotify_playlist_songs:
+            # the playlist changed on Spotify, playlist_loaded_event shows it again once it is reloaded
+            self.prefetcher.prioritize(self.current_playlist)
+            self.current_playlist = None
+
     def update_songs_frame(self):
         """
         Updates the frame displaying Spotify playlist songs in the application.
@@ -704,16 +897,11 @@ class App(customtkinter.CTk):
         This function is typically called when the user selects a different Spotify playlist.
         It updates the frame displaying the songs for the current playlist with the latest information.
 
-        PS: After testing it was better to destroy frame altogether and create a new one, because after only updating
-        songs some deleted text overlapped over new one, like it was pixelghosting
+        The songs frame is virtualized, so its row widgets are only refilled with the new songs instead of
+        creating one widget per song, and only the tracks of the shown rows are created from the TrackList.
         """
-        self.spotify_songs_frame.destroy()
         songs = self.spotifyApi.spotify_playlist_songs[self.current_playlist]
-        self.spotify_songs_frame = ScrollableCheckBoxFrame(self.export_frame, width=300, height=200,
-                                                           command=self.checkbox_frame_event,
-                                                           item_list=songs,
-                                                           label_text="Playlist Songs", )
-        self.spotify_songs_frame.grid(row=1, column=0, padx=15, pady=15, sticky="new")
+        self.spotify_songs_frame.set_items(songs)
 
 
 """
@@ -0,0 +1,73 @@
+"""
+GUI icons module
+
+Defines the IconStore class, which loads the PNG icons of the GUI. Every file is decoded only once, even if it is used
+by more images or for both appearance modes, and it is shrunk right after decoding to the largest size it is shown
+in, so customtkinter rescales small images instead of the 512 px originals whenever the window scaling changes.
+
+"""
+
+from pathlib import Path
+
+import customtkinter
+from PIL import Image
+
+ICON_DIRECTORY = Path(__file__).resolve().parent
+MAX_SCALING = 2  # icons are kept in twice their logical size, so they stay sharp on HiDPI screens
+
+
+class IconStore:
+    """
+    Class that decodes GUI icons once and caches them pre-sized
+    """
+    def __init__(self, directory=ICON_DIRECTORY, max_scaling=MAX_SCALING):
+        """
+        Initializes the IconStore class.
+
+        Parameters:
+        - directory (str or Path, optional): Directory with the icon files. Defaults to src/gui.
+        - max_scaling (float, optional): Largest window scaling the icons are kept sharp for.
+        """
+        self.directory = Path(directory)
+        self.max_scaling = max_scaling
+        self.decoded = {}  # (file name, size) -> PIL image
+        self.images = {}  # (light file name, dark file name, size) -> CTkImage
+
+    def decode(self, name, size):
+        """
+        Returns the decoded icon shrunk to fit size times max_scaling.
+
+        Parameters:
+        - name (str): File name of the icon.
+        - size (tuple): Logical (width, height) the icon is shown in.
+
+        Returns:
+        - PIL.Image.Image: The decoded icon.
+        """
+        key = (name, size)
+        if key not in self.decoded:
+            with Image.open(self.directory / name) as image:
+                image = image.convert('RGBA')
+            image.thumbnail((int(size[0] * self.max_scaling), int(size[1] * self.max_scaling)),
+                            Image.Resampling.LANCZOS)
+            self.decoded[key] = image
+        return self.decoded[key]
+
+    def get(self, name, size=(20, 20), dark_name=None):
+        """
+        Returns the CTkImage of an icon, created on first use.
+
+        Parameters:
+        - name (str): File name of the icon, used in light mode and in dark mode if dark_name is not given.
+        - size (tuple, optional): Logical (width, height) of the image.
+        - dark_name (str, optional): File name of the icon used in dark mode.
+
+        Returns:
+        - customtkinter.CTkImage: The image.
+        """
+        dark_name = dark_name or name
+        key = (name, dark_name, size)
+        if key not in self.images:
+            self.images[key] = customtkinter.CTkImage(light_image=self.decode(name, size),
+                                                      dark_image=self.decode(dark_name, size), size=size)
+        return self.images[key]
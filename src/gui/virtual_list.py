@@ -0,0 +1,257 @@
+"""
+GUI virtual list module
+
+Defines the VirtualCheckBoxFrame widget, which shows playlist songs as a checked box list, and the CheckedItemList
+it keeps its items in. Only the checkboxes of the visible rows are created and reused while scrolling, so showing a
+playlist with thousands of songs creates as many widgets as showing one with ten.
+
+Classes:
+    - CheckedItemList: Items with compact checked state used by VirtualCheckBoxFrame
+    - VirtualCheckBoxFrame: Checked box list that creates widgets only for visible rows, used for playlist songs
+"""
+
+import customtkinter
+
+
+class CheckedItemList:
+    """
+    Items with their checked state kept in a compact bytearray, one byte per item
+
+    A sequence of items, e.g. a TrackList, is kept as it is and indexed only for the rows that are shown, so its
+    items are not created up front. It is copied to a list only when an item is added or removed.
+    """
+
+    def __init__(self, item_list=()):
+        """
+        Initializes the CheckedItemList class.
+
+        Parameters:
+        - item_list (iterable, optional): The items, all unchecked.
+        """
+        self.items = []
+        self.owned = True  # False while items belong to the caller and must not be changed
+        self.checked = bytearray()
+        self.set_items(item_list)
+
+    def __len__(self):
+        return len(self.items)
+
+    def set_items(self, item_list):
+        """
+        Replaces the items, all unchecked. A sequence is kept without copying, other iterables are read to a list.
+
+        Parameters:
+        - item_list (iterable): The new items.
+        """
+        if hasattr(item_list, '__getitem__') and hasattr(item_list, '__len__'):
+            self.items = item_list
+            self.owned = False
+        else:
+            self.items = list(item_list)
+            self.owned = True
+        self.checked = bytearray(len(self.items))
+
+    def own_items(self):
+        """
+        Copies items that belong to the caller to a list, before the list is changed.
+        """
+        if not self.owned:
+            self.items = list(self.items)
+            self.owned = True
+
+    def add_item(self, item):
+        """
+        Appends an unchecked item.
+
+        Parameters:
+        - item: The item.
+        """
+        self.own_items()
+        self.items.append(item)
+        self.checked.append(0)
+
+    def remove_item(self, item):
+        """
+        Removes the first item equal to item, if there is one.
+
+        Parameters:
+        - item: The item.
+        """
+        for index, current in enumerate(self.items):
+            if current == item:
+                self.own_items()
+                del self.items[index]
+                del self.checked[index]
+                return
+
+    def toggle(self, index):
+        """
+        Checks the item at the index if it is unchecked and unchecks it otherwise.
+        """
+        self.checked[index] ^= 1
+
+    def is_checked(self, index):
+        """
+        Returns True if the item at the index is checked.
+        """
+        return self.checked[index] == 1
+
+    def get_checked_items(self):
+        """
+        Returns the checked items, indexing only their positions.
+
+        Returns:
+        - list: The checked items in list order.
+        """
+        return [self.items[index] for index, checked in enumerate(self.checked) if checked]
+
+
+class VirtualCheckBoxFrame(customtkinter.CTkFrame):
+    """
+    Frame with virtualized checked box list and functions to get checked, add, remove items
+
+    Only checkboxes for the visible rows are created. Scrolling reuses them for other items, so rendering costs the
+    same regardless of the number of items.
+    """
+    ROW_HEIGHT = 30
+
+    def __init__(self, master, item_list, command=None, height=200, label_text=None, **kwargs):
+        """
+        Initializes the VirtualCheckBoxFrame class.
+
+        Parameters:
+        - master: The parent widget.
+        - item_list (iterable): The items, see CheckedItemList.
+        - command (callable, optional): Called without arguments when a checkbox is toggled.
+        - height (int, optional): Height of the list in pixels, it determines the number of rows created.
+        - label_text (str, optional): Text of the label above the list.
+        """
+        super().__init__(master, **kwargs)
+
+        self.command = command
+        self.model = CheckedItemList(item_list)
+        self.first = 0  # index of item shown in first row
+        self.visible_rows = max(1, height // self.ROW_HEIGHT)
+
+        self.grid_columnconfigure(0, weight=1)
+        if label_text is not None:
+            self.label = customtkinter.CTkLabel(self, text=label_text, corner_radius=6,
+                                                fg_color=("gray78", "gray28"))
+            self.label.grid(row=0, column=0, columnspan=2, padx=6, pady=6, sticky="ew")
+        self.scrollbar = customtkinter.CTkScrollbar(self, command=self.scrollbar_event, height=height)
+        self.scrollbar.grid(row=1, column=1, rowspan=self.visible_rows, sticky="ns")
+        self.row_checkboxes = []
+        for row in range(self.visible_rows):
+            checkbox = customtkinter.CTkCheckBox(self, text="", command=lambda row=row: self.checkbox_event(row))
+            for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+                checkbox.bind(sequence, self.mousewheel_event)
+            self.row_checkboxes.append(checkbox)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.bind(sequence, self.mousewheel_event)
+        self.render()
+
+    def render(self):
+        """
+        Shows items from 'self.first' in the row checkboxes and updates the scrollbar.
+        """
+        count = len(self.model)
+        for row, checkbox in enumerate(self.row_checkboxes):
+            index = self.first + row
+            if index >= count:
+                checkbox.grid_remove()
+                continue
+            checkbox.configure(text=str(self.model.items[index]))
+            if self.model.is_checked(index):
+                checkbox.select()
+            else:
+                checkbox.deselect()
+            checkbox.grid(row=row + 1, column=0, padx=6, pady=(0, 6), sticky='w')
+        if count <= self.visible_rows:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first / count, (self.first + self.visible_rows) / count)
+
+    def scroll_to(self, first):
+        """
+        Shows items starting from the given index.
+        """
+        first = max(0, min(int(first), len(self.model) - self.visible_rows))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def scrollbar_event(self, action, value, unit=None):
+        """
+        Scrolls the list as requested by the scrollbar.
+
+        Parameters:
+        - action (str): 'moveto' or 'scroll'.
+        - value (str): Fraction of the list for 'moveto', number of units for 'scroll'.
+        - unit (str, optional): 'units' or 'pages' for 'scroll'.
+        """
+        if action == 'moveto':
+            self.scroll_to(float(value) * len(self.model))
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll_to(self.first + int(value) * step)
+
+    def mousewheel_event(self, event):
+        """
+        Scrolls the list by three rows in the direction of the mouse wheel.
+        """
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+
+    def checkbox_event(self, row):
+        """
+        Toggles the item shown in the row and calls the command.
+
+        Parameters:
+        - row (int): Index of the row checkbox.
+        """
+        self.model.toggle(self.first + row)
+        if self.command is not None:
+            self.command()
+
+    def set_items(self, item_list):
+        """
+        Replaces the items, all unchecked, and scrolls to the top.
+
+        Parameters:
+        - item_list (iterable): The new items, see CheckedItemList.set_items.
+        """
+        self.model.set_items(item_list)
+        self.first = 0
+        self.render()
+
+    def add_item(self, item):
+        """
+        Appends an unchecked item.
+        """
+        self.model.add_item(item)
+        self.render()
+
+    def remove_item(self, item):
+        """
+        Removes the item and keeps the shown rows filled.
+        """
+        self.model.remove_item(item)
+        self.first = max(0, min(self.first, len(self.model) - self.visible_rows))
+        self.render()
+
+    def remove_all(self):
+        """
+        Removes all items.
+        """
+        self.set_items([])
+
+    def get_checked_items(self):
+        """
+        Returns the checked items.
+
+        Returns:
+        - list: The checked items in list order.
+        """
+        return self.model.get_checked_items()
@@ -0,0 +1,222 @@
+"""
+GUI widgets module
+
+Defines the windows and scrollable frames the main application window is built from.
+
+Classes:
+    - MessageWindow: Tkinter top level window with specified message in constructor
+    - ReportWindow: Tkinter top level window with a textbox for the export report
+    - YoutubePlaylistChooser: Tkinter top level window with YT Music user playlists
+    - ScrollableRadiobuttonFrame: Frame with responsive radiobutton list and functions to get checked, add, remove items
+      and optional checkboxes selecting more items at once
+    - ScrollableCheckBoxFrame: Frame with responsive checked box list and functions to get checked, add, remove items
+
+The layout follows the CustomTkinter examples: https://github.com/TomSchimansky/CustomTkinter/tree/master/examples
+"""
+
+import customtkinter
+
+
+class MessageWindow(customtkinter.CTkToplevel):
+    """
+    Class that displays window with specified text
+    """
+
+    def __init__(self, master, text, **kwargs):
+        super().__init__(master, **kwargs)
+        self.geometry("400x300")
+
+        self.label = customtkinter.CTkLabel(self, text=text)
+        self.label.pack(padx=20, pady=20)
+
+
+class ReportWindow(customtkinter.CTkToplevel):
+    """
+    Class that displays window with specified text
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.geometry("400x300")
+
+        self.textbox = customtkinter.CTkTextbox(self, width=400, height=300)
+        self.textbox.grid(row=1, column=1, sticky="nsew")
+
+
+class YoutubePlaylistChooser(customtkinter.CTkToplevel):
+    """
+    Class that displays playlists and list and lets to choose from it.
+    """
+
+    def __init__(self, master, item_list, button_command, **kwargs):
+        super().__init__(master, **kwargs)
+        self.export_command = button_command
+        self.geometry("400x300")
+        self.title("YT Music playlists")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.radiobutton_variable = customtkinter.StringVar()
+        self.scrollable_checkbox_frame = ScrollableRadiobuttonFrame(self, item_list=item_list,
+                                                                    label_text="Yours Youtube Playlists",
+                                                                    command=self.radiobutton_frame_event
+                                                                    )
+        self.button1 = customtkinter.CTkButton(self, text="Export to chosen playlist",
+                                               command=self.export_command)
+        # self.button1.configure(command=self.export_command)
+        self.scrollable_checkbox_frame.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="nsew")
+        self.button1.grid(row=2, column=0, padx=10, pady=10, sticky="ew", columnspan=2)
+
+    def get_checked_item(self):
+        """
+        Returns the chosen YT Music playlist, an empty string if none is chosen.
+        """
+        return self.scrollable_checkbox_frame.get_checked_item()
+
+    def export_to_chosen_playlist(self):
+        """
+        Prints the chosen YT Music playlist.
+        """
+        print(f'Exporting to: {self.scrollable_checkbox_frame.get_checked_item()}')
+
+    def radiobutton_frame_event(self):
+        """
+        Prints the YT Music playlist that has been chosen.
+        """
+        print(f"New YTMusic playlist chosen: {self.scrollable_checkbox_frame.get_checked_item()}")
+
+
+class ScrollableRadiobuttonFrame(customtkinter.CTkScrollableFrame):
+    """
+    Frame with responsive radiobutton list and functions to get checked, add, remove items
+    """
+
+    def __init__(self, master, item_list, command=None, hover_command=None, multi_select=False, **kwargs):
+        super().__init__(master, **kwargs)
+
+        self.command = command
+        self.hover_command = hover_command
+        self.multi_select = multi_select  # every item gets a checkbox selecting it for bulk actions
+        self.radiobutton_variable = customtkinter.StringVar()
+        self.radiobutton_list = []
+        self.checkbox_list = []  # checkboxes of items in the same order as radiobutton_list, if multi_select
+        self.next_row = 0
+        for item in item_list:
+            self.add_item(item)
+
+    def add_item(self, item):
+        """
+        Appends a radiobutton for the item, with a checkbox if multi_select.
+
+        Parameters:
+        - item (str): Text of the item.
+        """
+        radiobutton = customtkinter.CTkRadioButton(self, text=item, value=item, variable=self.radiobutton_variable)
+        if self.command is not None:
+            radiobutton.configure(command=self.command)
+        if self.hover_command is not None:
+            radiobutton.bind('<Enter>', lambda event: self.hover_command(item))
+        if self.multi_select:
+            checkbox = customtkinter.CTkCheckBox(self, text="", width=24)
+            checkbox.grid(row=self.next_row, column=0, pady=(0, 10), sticky='w')
+            self.checkbox_list.append(checkbox)
+        radiobutton.grid(row=self.next_row, column=1 if self.multi_select else 0, pady=(0, 10), sticky='w')
+        self.radiobutton_list.append(radiobutton)
+        self.next_row += 1
+
+    def remove_item(self, item):
+        """
+        Removes the radiobutton of the item and its checkbox.
+
+        Parameters:
+        - item (str): Text of the item.
+        """
+        for i, radiobutton in enumerate(self.radiobutton_list):
+            if item == radiobutton.cget("text"):
+                radiobutton.destroy()
+                self.radiobutton_list.remove(radiobutton)
+                if self.multi_select:
+                    self.checkbox_list.pop(i).destroy()
+                return
+
+    def get_checked_item(self):
+        """
+        Returns the text of the checked radiobutton, an empty string if none is checked.
+        """
+        return self.radiobutton_variable.get()
+
+    def get_selected_items(self):
+        """
+        Returns the items whose checkboxes are checked, used for bulk actions.
+
+        Returns:
+        - list: Texts of the selected items in list order, empty without multi_select.
+        """
+        return [radiobutton.cget("text") for radiobutton, checkbox in zip(self.radiobutton_list, self.checkbox_list)
+                if checkbox.get() == 1]
+
+    def select_all(self, selected=True):
+        """
+        Checks or unchecks the checkboxes of all items.
+
+        Parameters:
+        - selected (bool, optional): Whether the items are checked. Defaults to True.
+        """
+        for checkbox in self.checkbox_list:
+            if selected:
+                checkbox.select()
+            else:
+                checkbox.deselect()
+
+
+class ScrollableCheckBoxFrame(customtkinter.CTkScrollableFrame):
+    """
+    Frame with responsive checked box list and functions to get checked, add, remove items
+    """
+
+    def __init__(self, master, item_list, command=None, **kwargs):
+        super().__init__(master, **kwargs)
+
+        self.command = command
+        self.checkbox_list = []
+        for item in item_list:
+            self.add_item(item)
+
+    def add_item(self, item):
+        """
+        Appends an unchecked checkbox for the item.
+
+        Parameters:
+        - item (str): Text of the item.
+        """
+        checkbox = customtkinter.CTkCheckBox(self, text=item)
+        if self.command is not None:
+            checkbox.configure(command=self.command)
+        checkbox.grid(row=len(self.checkbox_list), column=0, pady=(0, 10), sticky='w')
+        self.checkbox_list.append(checkbox)
+
+    def remove_item(self, item):
+        """
+        Removes the checkbox of the item.
+
+        Parameters:
+        - item (str): Text of the item.
+        """
+        for checkbox in self.checkbox_list:
+            if item == checkbox.cget("text"):
+                checkbox.destroy()
+                self.checkbox_list.remove(checkbox)
+                return
+
+    def remove_all(self):
+        """
+        Removes the checkboxes of all items.
+        """
+        for checkbox in self.checkbox_list:
+            checkbox.destroy()
+            self.checkbox_list.remove(checkbox)
+
+    def get_checked_items(self):
+        """
+        Returns the texts of the checked checkboxes.
+        """
+        return [checkbox.cget("text") for checkbox in self.checkbox_list if checkbox.get() == 1]
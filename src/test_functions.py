@@ -1,15 +1,49 @@
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+import requests
 
 from pylint.reporters import CollectingReporter
 import src.assets.config as config_variables
 from src.SpotifyHandler.spotify_login import SpotifyLogin
-from src.SpotifyHandler.spotify_api import SpotifyApi
+from src.SpotifyHandler.spotify_api import SpotifyApi, SpotifyApiError
+from src.SpotifyHandler.async_spotify_api import AsyncSpotifyApi
+from src.SpotifyHandler.playlist_prefetcher import PlaylistPrefetcher
+from src.SpotifyHandler.track import Track, TrackList
+from src.SpotifyHandler.token_store import TokenStore
+from src.SpotifyHandler.token_manager import TokenManager
+from src.SpotifyHandler.library_mirror import LibraryMirror
 from src.app.auxiliary_functions import send_request, error_in_json
-from unittest.mock import MagicMock
+from src.app.http_client import HttpClient, get_session
+from src.app.request_scheduler import RequestScheduler, TokenBucket
+from src.app import metrics
+from src.app.metrics import Metrics
+from src.app.shared import shared_instance
+from unittest.mock import MagicMock, patch
 from pylint.lint import Run
 import inspect
 from src.YTmusicHandler.yt_music import YTMusicHandler
+from src.gui.app import App
+from src.gui.icons import IconStore
+from src.gui.virtual_list import CheckedItemList
+from src.YTmusicHandler.match_cache import SongMatchCache
+from src.YTmusicHandler.export_job import ExportJob
+from src.YTmusicHandler.matcher import TrackMatcher
+from src.YTmusicHandler.sync_state import SyncState
+from src.YTmusicHandler.playlist_index import PlaylistIndex
+from src.YTmusicHandler.export_journal import ExportJournal
+from src.YTmusicHandler.export_engine import ExportEngine
+from src.YTmusicHandler.export_pipeline import ExportPipeline
+from src.app.batch_export import BatchExporter, load_manifest
+from src.benchmarks.fakes import FakeSpotifyServer
+from src.benchmarks.runner import offline_spotify, bench_export, bench_import_time
 from pathlib import Path
+from urllib.parse import urlparse, parse_qsl
 
 
 @pytest.fixture
@@ -59,6 +93,111 @@ def test_get_auth_header(spotify_api_instance):
     assert auth_header["Authorization"] == f"Bearer {spotify_api_instance.access_token}"
 
 
+def test_access_token_sets_default_auth_header(spotify_api_instance):
+    spotify_api_instance.access_token = "some_access_token"
+    assert spotify_api_instance.http.default_headers == {"Authorization": "Bearer some_access_token"}
+
+    spotify_api_instance.access_token = None
+    assert spotify_api_instance.http.default_headers == {}
+
+
+def test_http_client_merges_default_headers():
+    session = MagicMock()
+    client = HttpClient(default_headers={"Authorization": "Bearer token"}, timeout=5, session=session)
+
+    client.get("url", headers={"Accept": "application/json"}, params={"limit": 50})
+
+    session.request.assert_called_once_with("GET", "url", headers={"Authorization": "Bearer token",
+                                                                   "Accept": "application/json"},
+                                            params={"limit": 50}, timeout=5)
+
+
+def test_http_client_shares_pooled_session():
+    assert HttpClient().session is None
+    assert get_session() is get_session()
+    assert get_session().get_adapter("https://api.spotify.com")._pool_maxsize == config_variables.http_pool_maxsize
+
+
+def test_shared_instance_is_created_once_for_concurrent_threads():
+    created = []
+
+    @shared_instance
+    def get_instance():
+        time.sleep(0.01)
+        created.append(object())
+        return created[-1]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        instances = list(executor.map(lambda _: get_instance(), range(8)))
+
+    assert len(created) == 1
+    assert all(instance is created[0] for instance in instances)
+    get_instance.reset()
+    assert get_instance() is created[1]
+
+
+def scheduled_responses(*status_codes, retry_after=None):
+    responses_list = []
+    for status_code in status_codes:
+        response = MagicMock()
+        response.status_code = status_code
+        response.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+        responses_list.append(response)
+    return MagicMock(side_effect=responses_list)
+
+
+def test_request_scheduler_honors_retry_after():
+    sleeps = []
+    bucket = TokenBucket(rate=100, capacity=100, sleep=sleeps.append)
+    scheduler = RequestScheduler(bucket=bucket, max_retries=3, sleep=sleeps.append)
+    send = scheduled_responses(429, 200, retry_after='2')
+
+    response = scheduler.execute(send)
+
+    assert response.status_code == 200
+    assert send.call_count == 2
+    assert sleeps[0] == 2.0
+
+
+def test_request_scheduler_backoff_on_server_errors():
+    sleeps = []
+    scheduler = RequestScheduler(bucket=TokenBucket(rate=100, capacity=100), max_retries=2, backoff_base=1,
+                                 backoff_cap=3, sleep=sleeps.append)
+
+    response = scheduler.execute(scheduled_responses(503, 502, 500))
+
+    assert response.status_code == 500
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_request_scheduler_retries_connection_errors():
+    scheduler = RequestScheduler(bucket=TokenBucket(rate=100, capacity=100), max_retries=1, sleep=lambda s: None)
+    send = MagicMock(side_effect=[requests.exceptions.ConnectionError("reset"), MagicMock(status_code=200)])
+
+    assert scheduler.execute(send).status_code == 200
+    with pytest.raises(requests.exceptions.ConnectionError):
+        scheduler.execute(MagicMock(side_effect=requests.exceptions.ConnectionError("reset")))
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+
+    assert now[0] == pytest.approx(1.0)
+    bucket.pause(5)
+    bucket.acquire()
+    assert now[0] == pytest.approx(6.5)
+
+
 @pytest.fixture
 def mock_response():
     mock = MagicMock()
@@ -70,7 +209,7 @@ def mock_response():
 def test_make_test_request_successful(mock_response, spotify_api_instance, monkeypatch):
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers: mock_response
+        lambda url, headers, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.make_test_request()
@@ -88,7 +227,7 @@ def test_make_test_request_request_error(mock_response, spotify_api_instance, mo
     mock_response.status_code = 500  # Simulating an error response
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers: mock_response
+        lambda url, headers, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.make_test_request()
@@ -100,7 +239,7 @@ def test_make_test_request_json_error(mock_response, spotify_api_instance, monke
     mock_response.json.side_effect = ValueError("Invalid JSON")
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers: mock_response
+        lambda url, headers, client: mock_response
     )
 
     result = spotify_api_instance.make_test_request()
@@ -113,7 +252,7 @@ def test_get_playlist_successful(mock_response, spotify_api_instance, monkeypatc
     url = f"{config_variables.spotify_playlist_info_url}{playlist_id}"
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers: mock_response
+        lambda url, headers, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.get_playlist(playlist_id)
@@ -136,7 +275,7 @@ def test_get_playlist_request_error(mock_response, spotify_api_instance, monkeyp
     mock_response.status_code = 500  # Simulating an error response
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers: mock_response
+        lambda url, headers, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.get_playlist(playlist_id)
@@ -150,7 +289,7 @@ def test_get_playlist_json_error(mock_response, spotify_api_instance, monkeypatc
     mock_response.json.side_effect = ValueError("Invalid JSON")
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers: mock_response
+        lambda url, headers, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.get_playlist(playlist_id)
@@ -162,7 +301,7 @@ def test_get_user_playlists_successful(mock_response, spotify_api_instance, monk
     url = config_variables.spotify_user_playlists_info_url
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers, params: mock_response
+        lambda url, headers, params, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.get_user_playlists()
@@ -183,7 +322,7 @@ def test_get_user_playlists_request_error(mock_response, spotify_api_instance, m
     mock_response.status_code = 500  # Simulating an error response
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers, params: mock_response
+        lambda url, headers, params, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.get_user_playlists()
@@ -196,7 +335,7 @@ def test_get_user_playlists_json_error(mock_response, spotify_api_instance, monk
     mock_response.json.side_effect = ValueError("Invalid JSON")
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.send_request",
-        lambda url, headers, params: mock_response
+        lambda url, headers, params, client: mock_response
     )
     spotify_api_instance.access_token = 'some_access_token'
     result = spotify_api_instance.get_user_playlists()
@@ -280,17 +419,252 @@ def test_get_playlist_items_request_error(mock_response, spotify_api_instance, m
     timeout = 30
 
     monkeypatch.setattr(
-        "src.SpotifyHandler.spotify_api.requests.get",
-        lambda url, headers, timeout=timeout: mock_response
+        spotify_api_instance.http,
+        "get",
+        lambda url, headers=None, timeout=timeout: mock_response
     )
     monkeypatch.setattr(
         "src.SpotifyHandler.spotify_api.SpotifyApi.get_auth_header",
         lambda self: headers
     )
     spotify_api_instance.access_token = 'some_access_token'
-    result = spotify_api_instance.get_playlist_items(playlist_url)
 
-    assert result == {'error': 'Error message'}
+    with pytest.raises(SpotifyApiError, match='Error message'):
+        spotify_api_instance.get_playlist_items(playlist_url)
+
+
+def fake_playlist_pages(total, limit):
+    def get(url, headers=None, params=None):
+        query = dict(parse_qsl(urlparse(url).query))
+        offset = int(query.get('offset', 0))
+        page = MagicMock()
+        page.json.return_value = {
+            'items': [{'track': {'artists': [{'name': 'Artist'}], 'name': f'Track {i}'}}
+                      for i in range(offset, min(offset + limit, total))],
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'next': f'playlist_url?offset={offset + limit}&limit={limit}' if offset + limit < total else None
+        }
+        return page
+    return get
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_get_playlist_items_pages_in_order(spotify_api_instance, monkeypatch, workers):
+    monkeypatch.setattr(spotify_api_instance.http, "get", fake_playlist_pages(total=250, limit=100))
+    spotify_api_instance.access_token = 'some_access_token'
+
+    result = spotify_api_instance.get_playlist_items("playlist_url", workers=workers)
+
+    assert result.labels() == [f'Artist - Track {i}' for i in range(250)]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_get_playlist_items_retries_failed_page_and_raises(spotify_api_instance, workers):
+    pages = fake_playlist_pages(total=250, limit=100)
+    failures = {'offset=100': 2}
+
+    def request(method, url, headers=None, **kwargs):
+        failing = next((key for key in failures if key in url), None)
+        if failing is not None and failures[failing] > 0:
+            failures[failing] -= 1
+            return MagicMock(status_code=503, headers={}, json=lambda: {'error': {'status': 503,
+                                                                                 'message': 'Unavailable'}})
+        return pages(url)
+
+    session = MagicMock()
+    session.request.side_effect = request
+    spotify_api_instance.http = HttpClient(session=session, scheduler=RequestScheduler(
+        TokenBucket(1000, 1000), max_retries=2, sleep=lambda seconds: None))
+    spotify_api_instance.access_token = 'some_access_token'
+
+    result = spotify_api_instance.get_playlist_items("playlist_url", workers=workers)
+
+    assert result.labels() == [f'Artist - Track {i}' for i in range(250)]
+
+    failures['offset=200'] = 3
+    with pytest.raises(SpotifyApiError) as error:
+        spotify_api_instance.get_playlist_items("playlist_url", workers=workers)
+    assert error.value.status == 503
+    failures['offset=200'] = 3
+    with pytest.raises(SpotifyApiError):
+        list(spotify_api_instance.iter_playlist_items("playlist_url", workers=workers))
+
+
+def test_get_all_playlists_raises_on_failed_page(spotify_api_instance, monkeypatch):
+    spotify_api_instance.spotify_playlists = {'Old': {}}
+    monkeypatch.setattr(spotify_api_instance, "get_user_playlists", lambda: {
+        'items': [{'name': 'Playlist 0', 'images': None, 'tracks': None}], 'next': 'next_url', 'previous': None})
+    monkeypatch.setattr(spotify_api_instance, "get_page", lambda url, headers=None: {'error': {'status': 429}})
+
+    with pytest.raises(SpotifyApiError):
+        spotify_api_instance.get_all_playlists()
+    assert spotify_api_instance.refresh_library() == []
+    assert spotify_api_instance.spotify_playlists == {'Old': {}}
+
+
+def test_iter_playlist_items_close_does_not_wait_for_pages(spotify_api_instance, monkeypatch):
+    pages = fake_playlist_pages(total=500, limit=100)
+    release = threading.Event()
+
+    def get(url, headers=None, params=None):
+        if 'offset' in url:
+            release.wait(5)
+        return pages(url)
+
+    monkeypatch.setattr(spotify_api_instance.http, "get", get)
+    spotify_api_instance.access_token = 'some_access_token'
+    tracks = spotify_api_instance.iter_playlist_items("playlist_url", workers=2)
+
+    assert next(tracks).title == 'Track 0'
+    started = time.monotonic()
+    tracks.close()
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+def test_async_get_all_playlist_items(spotify_api_instance, monkeypatch):
+    monkeypatch.setattr(spotify_api_instance.http, "get", fake_playlist_pages(total=120, limit=50))
+    async_api = AsyncSpotifyApi(spotify_api_instance, max_concurrency=3)
+    async_api.access_token = 'some_access_token'
+    spotify_api_instance.spotify_playlists = {
+        'Playlist 1': {'images': None, 'tracks_api': {'href': 'playlist_url'}},
+        'Playlist 2': {'images': None, 'tracks_api': {'href': 'playlist_url'}}
+    }
+
+    asyncio.run(async_api.get_all_playlist_items())
+
+    assert spotify_api_instance.access_token == 'some_access_token'
+    assert async_api.spotify_playlist_songs['Playlist 1'].labels() == [f'Artist - Track {i}' for i in range(120)]
+    assert async_api.spotify_playlist_songs['Playlist 2'] == spotify_api_instance.get_playlist_items('playlist_url')
+
+
+def test_async_get_all_playlists(spotify_api_instance, monkeypatch):
+    def get_user_playlists():
+        return {'items': [{'name': 'Playlist 0', 'images': None, 'tracks': None}],
+                'total': 3, 'limit': 1, 'offset': 0, 'next': 'next_url', 'previous': None}
+
+    def get_page(url, headers=None):
+        offset = int(dict(parse_qsl(urlparse(url).query))['offset'])
+        return {'items': [{'name': f'Playlist {offset}', 'images': None, 'tracks': None}],
+                'next': None, 'previous': None}
+
+    monkeypatch.setattr(spotify_api_instance, "get_user_playlists", get_user_playlists)
+    monkeypatch.setattr(spotify_api_instance, "get_page", get_page)
+
+    asyncio.run(AsyncSpotifyApi(spotify_api_instance).get_all_playlists())
+
+    assert list(spotify_api_instance.spotify_playlists) == ['Playlist 0', 'Playlist 1', 'Playlist 2']
+
+
+def test_async_get_all_playlists_matches_sync(spotify_api_instance, monkeypatch):
+    pages = {offset: {'items': [{'name': f'Playlist {offset}', 'images': None, 'tracks': {'href': f'href_{offset}'},
+                                 'id': f'id_{offset}', 'snapshot_id': f'snap_{offset}'}],
+                      'total': 3, 'limit': 1, 'offset': offset, 'previous': None,
+                      'next': f'url?offset={offset + 1}&limit=1' if offset < 2 else None}
+             for offset in range(3)}
+    monkeypatch.setattr(spotify_api_instance, "get_user_playlists", lambda: pages[0])
+    monkeypatch.setattr(spotify_api_instance, "get_page", lambda url, headers=None: pages[
+        int(dict(parse_qsl(urlparse(url).query))['offset'])])
+
+    spotify_api_instance.get_all_playlists()
+    sync_playlists = spotify_api_instance.spotify_playlists
+    spotify_api_instance.spotify_playlists = {}
+    asyncio.run(AsyncSpotifyApi(spotify_api_instance).get_all_playlists())
+
+    assert spotify_api_instance.spotify_playlists == sync_playlists
+    assert sync_playlists['Playlist 2'] == {'images': None, 'tracks_api': {'href': 'href_2'}, 'id': 'id_2',
+                                            'snapshot_id': 'snap_2'}
+
+
+def test_playlist_prefetcher_loads_prioritized_playlist_first(spotify_api_instance):
+    names = ['Playlist 1', 'Playlist 2', 'Playlist 3']
+    spotify_api_instance.spotify_playlists = {name: {'images': None, 'tracks_api': {'href': name}} for name in names}
+    spotify_api_instance.spotify_playlist_songs['Playlist 2'] = ['Artist - Cached']
+    fetched = []
+    loaded = []
+
+    def get_playlist_items(url):
+        fetched.append(url)
+        return [f'Artist - {url}']
+
+    spotify_api_instance.get_playlist_items = get_playlist_items
+    prefetcher = PlaylistPrefetcher(spotify_api_instance, on_loaded=loaded.append, workers=1)
+    prefetcher.enqueue(names)
+    prefetcher.prioritize('Playlist 3')
+    prefetcher.start()
+    prefetcher.join()
+    prefetcher.stop()
+
+    assert fetched == ['Playlist 3', 'Playlist 1']
+    assert loaded == ['Playlist 3', 'Playlist 1']
+    assert spotify_api_instance.spotify_playlist_songs == {'Playlist 1': ['Artist - Playlist 1'],
+                                                           'Playlist 2': ['Artist - Cached'],
+                                                           'Playlist 3': ['Artist - Playlist 3']}
+
+
+def test_playlist_prefetcher_reports_failure_and_gui_loads_in_foreground(spotify_api_instance):
+    spotify_api_instance.spotify_playlists = {'Broken': {'images': None, 'tracks_api': {'href': 'broken'}}}
+    failures = []
+    loaded = []
+
+    def get_playlist_items(url):
+        raise SpotifyApiError(url, {'status': 500, 'message': 'Server error'})
+
+    spotify_api_instance.get_playlist_items = get_playlist_items
+    prefetcher = PlaylistPrefetcher(spotify_api_instance, on_loaded=loaded.append, workers=1,
+                                    on_failed=lambda name, error: failures.append((name, error.status)))
+    prefetcher.enqueue(['Broken'])
+    prefetcher.start()
+    prefetcher.join()
+    prefetcher.stop()
+
+    assert failures == [('Broken', 500)] and loaded == []
+    assert prefetcher.has_failed('Broken')
+
+    app = MagicMock(spotifyApi=spotify_api_instance, prefetcher=prefetcher, current_playlist=None)
+    app.spotify_playlists_frame.get_checked_item.return_value = 'Broken'
+    spotify_api_instance.get_playlist_items = lambda url: ["Artist - Song"]
+    App.radiobutton_frame_event(app)
+
+    assert spotify_api_instance.spotify_playlist_songs['Broken'] == ["Artist - Song"]
+    assert app.current_playlist == 'Broken'
+    app.update_songs_frame.assert_called_once()
+
+
+def test_playlist_prefetcher_drops_playlist_loaded_after_stop(spotify_api_instance):
+    spotify_api_instance.spotify_playlists = {'Slow': {'images': None, 'tracks_api': {'href': 'slow'}}}
+    started = threading.Event()
+    release = threading.Event()
+    loaded = []
+
+    def get_playlist_items(url):
+        started.set()
+        release.wait(5)
+        return ["Artist - Song"]
+
+    spotify_api_instance.get_playlist_items = get_playlist_items
+    prefetcher = PlaylistPrefetcher(spotify_api_instance, on_loaded=loaded.append, workers=1)
+    prefetcher.enqueue(['Slow'])
+    prefetcher.start()
+    assert started.wait(5)
+    prefetcher.stop()
+    spotify_api_instance.spotify_playlists = {}  # library refreshed while the playlist was loading
+    release.set()
+    prefetcher.join()
+
+    assert loaded == []
+    assert 'Slow' not in spotify_api_instance.spotify_playlist_songs
+
+
+def test_get_page_urls():
+    first_page = {'total': 250, 'limit': 100, 'offset': 0}
+
+    result = SpotifyApi.get_page_urls("https://api.spotify.com/v1/playlists/id/tracks?market=CZ", first_page)
+
+    assert result == ["https://api.spotify.com/v1/playlists/id/tracks?market=CZ&offset=100&limit=100",
+                      "https://api.spotify.com/v1/playlists/id/tracks?market=CZ&offset=200&limit=100"]
 
 
 def test_get_tracks_successful():
@@ -302,7 +676,28 @@ def test_get_tracks_successful():
     result = SpotifyApi.get_tracks(response)
 
     # Check if the result has the correct structure and values
-    assert result == ['Artist 1 - Track 1', 'Artist 2 - Track 2']
+    assert isinstance(result, TrackList)
+    assert [str(track) for track in result] == ['Artist 1 - Track 1', 'Artist 2 - Track 2']
+
+
+def test_get_tracks_keeps_track_details():
+    response = [
+        {'track': {'id': 'track_id', 'name': 'Track 1', 'duration_ms': 201000,
+                   'artists': [{'name': 'Artist 1'}, {'name': 'Artist 2'}], 'album': {'name': 'Album'},
+                   'external_ids': {'isrc': 'USRC17607839'}}},
+        {'track': None},
+        {'track': {'id': None, 'name': 'Local file', 'artists': [], 'album': None}}
+    ]
+
+    result = SpotifyApi.get_tracks(response)
+
+    assert len(result) == 2
+    assert result[0] == Track('Track 1', ('Artist 1', 'Artist 2'), 'Album', 201000, 'USRC17607839', 'track_id')
+    assert result[0].key == 'spotify:track_id'
+    assert result[1].duration_ms is None
+    assert result[1].key == '- local file'
+    assert result[-1:] == [result[1]]
+    assert list(TrackList(result)) == list(result)
 
 
 def test_get_tracks_empty_response():
@@ -325,11 +720,46 @@ def test_get_tracks_error_response():
     assert result == 401
 
 
+def test_checked_item_list():
+    items = CheckedItemList([f"Song {i}" for i in range(5000)])
+    items.toggle(1)
+    items.toggle(4999)
+    items.toggle(2)
+    items.toggle(2)
+    items.add_item("Song 5000")
+    items.toggle(5000)
+    items.remove_item("Song 0")
+
+    assert len(items) == 5000
+    assert len(items.checked) == 5000
+    assert items.get_checked_items() == ["Song 1", "Song 4999", "Song 5000"]
+
+    items.set_items(["Song A"])
+    assert items.get_checked_items() == []
+
+
+def test_checked_item_list_indexes_track_list_lazily():
+    tracks = TrackList([Track(f"Song {i}", ("Artist",)) for i in range(1000)])
+    accessed = []
+    get_track = TrackList.__getitem__
+
+    with patch.object(TrackList, '__getitem__', lambda self, index: accessed.append(index) or get_track(self, index)):
+        items = CheckedItemList(tracks)
+        items.toggle(500)
+        checked = items.get_checked_items()
+        accessed_before_add = list(accessed)
+        items.add_item(Track("Added", ("Artist",)))
+
+    assert accessed_before_add == [500]
+    assert checked == [Track("Song 500", ("Artist",))]
+    assert len(tracks) == 1000
+    assert len(items) == 1001
+
+
 @pytest.fixture
 def yt_music_handler():
     yt_music_mock = MagicMock()
-    handler = YTMusicHandler(auth=None)
-    handler.yt_music = yt_music_mock
+    handler = YTMusicHandler(auth=None, yt_music=yt_music_mock)
     return handler, yt_music_mock
 
 
@@ -356,7 +786,7 @@ def test_yt_create_playlist(yt_music_handler):
 def test_yt_create_playlist_push_songs(yt_music_handler):
     handler, yt_music_mock = yt_music_handler
     yt_music_mock.create_playlist.return_value = "existing_playlist_id"
-    yt_music_mock.search.return_value = [{'videoId': 'song_video_id'}]
+    yt_music_mock.search.return_value = [{'videoId': 'song_video_id', 'title': 'Song'}]
     yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
 
     songs = ["Song 1", "Song 2", "Song 3"]
@@ -367,6 +797,228 @@ def test_yt_create_playlist_push_songs(yt_music_handler):
     yt_music_mock.add_playlist_items.assert_called_with(playlistId='existing_playlist_id', videoIds=['song_video_id'])
 
 
+def test_yt_create_playlist_push_songs_batched(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+    yt_music_mock.create_playlist.return_value = "new_playlist_id"
+    yt_music_mock.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+
+    songs = [f"Song {i}" for i in range(10)]
+    errors_list = handler.create_playlist_push_songs("New Playlist", "Playlist Description", songs)
+
+    assert errors_list == []
+    yt_music_mock.add_playlist_items.assert_called_once_with(playlistId='new_playlist_id',
+                                                             videoIds=[f'id_{song}' for song in songs])
+
+
+def test_yt_export_songs_reports_failed_songs_in_order(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+
+    def search(song, filter):
+        return [] if song in ("Song 1", "Song 3") else [{'videoId': f'id_{song}', 'title': song}]
+
+    def add_playlist_items(playlistId, videoIds):
+        return {'status': 'STATUS_FAILED' if 'id_Song 2' in videoIds else 'STATUS_SUCCEEDED'}
+
+    yt_music_mock.search.side_effect = search
+    yt_music_mock.add_playlist_items.side_effect = add_playlist_items
+
+    errors_list = handler.export_songs("playlist_id", ["Song 0", "Song 1", "Song 2", "Song 3", "Song 4"])
+
+    assert errors_list == ["Song 1", "Song 2", "Song 3"]
+
+
+def test_yt_export_songs_reports_progress_and_cancels(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+    yt_music_mock.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    cancel_event = threading.Event()
+    progress = []
+
+    def on_progress(done, failed):
+        progress.append((done, failed))
+        cancel_event.set()
+
+    songs = [f"Song {i}" for i in range(250)]
+    with patch.object(config_variables, 'yt_add_batch_size', 100):
+        errors_list = handler.export_songs("playlist_id", songs, on_progress, cancel_event)
+
+    assert progress == [(100, 0)]
+    assert errors_list == songs[100:]
+
+
+def test_track_matcher_prefers_matching_version():
+    matcher = TrackMatcher(threshold=0.6, duration_tolerance=5)
+    track = Track("Song", artists=("Artist",), album="Album", duration_ms=200000)
+    candidates = [
+        {'videoId': 'live_id', 'title': 'Song (Live)', 'artists': [{'name': 'Artist'}],
+         'album': {'name': 'Live Album'}, 'duration_seconds': 260},
+        {'videoId': 'cover_id', 'title': 'Song', 'artists': [{'name': 'Other Band'}], 'duration_seconds': 230},
+        {'videoId': 'studio_id', 'title': 'Song', 'artists': [{'name': 'Artist'}],
+         'album': {'name': 'Album'}, 'duration_seconds': 202},
+    ]
+
+    video_id, confidence = matcher.best_match(track, candidates)
+
+    assert video_id == 'studio_id'
+    assert confidence == 1.0
+
+
+def test_track_matcher_decides_by_isrc():
+    matcher = TrackMatcher(threshold=0.6, duration_tolerance=5)
+    track = Track("Song", artists=("Artist",), duration_ms=200000, isrc="USRC17607839")
+    candidates = [
+        {'videoId': 'other_recording', 'title': 'Song', 'artists': [{'name': 'Artist'}], 'duration_seconds': 200,
+         'isrc': 'GBAYE0601498'},
+        {'videoId': 'no_isrc', 'title': 'Song', 'artists': [{'name': 'Artist'}], 'duration_seconds': 230},
+        {'videoId': 'same_recording', 'title': 'Song (Official Video)', 'artists': [{'name': 'Artist VEVO'}],
+         'isrc': 'US-RC1-76-07839'},
+    ]
+
+    assert matcher.best_match(track, candidates) == ('same_recording', 1.0)
+    video_id, confidence = matcher.best_match(track, candidates[:2])
+    assert video_id == 'no_isrc'
+    assert 0.6 <= confidence < 1.0
+
+
+def test_track_matcher_rejects_low_confidence():
+    matcher = TrackMatcher(threshold=0.6, duration_tolerance=5)
+    candidates = [{'videoId': 'other_id', 'title': 'Completely Different', 'artists': [{'name': 'Nobody'}]}]
+
+    video_id, confidence = matcher.best_match("Artist - Song", candidates)
+
+    assert video_id is None
+    assert confidence < 0.6
+
+
+def test_export_job_progress():
+    now = [0.0]
+    release = threading.Event()
+
+    def export(on_progress, cancel_event):
+        on_progress(done=3, failed=1)
+        release.wait(5)
+        return ["Failed song"]
+
+    job = ExportJob(export, total=10, clock=lambda: now[0])
+    job.start()
+    while job.snapshot()['done'] == 0:
+        time.sleep(0.01)
+    now[0] = 2.0
+
+    progress = job.snapshot()
+    assert progress['running'] is True
+    assert progress['fraction'] == 0.4
+    assert progress['throughput'] == 2.0
+    assert progress['eta'] == 3.0
+
+    job.cancel()
+    release.set()
+    job.thread.join()
+    assert job.is_running() is False
+    assert job.cancelled is True
+    assert job.result == ["Failed song"]
+
+
+def test_match_cache_put_get(tmp_path):
+    cache = SongMatchCache(tmp_path / 'cache.sqlite3', ttl=60, max_entries=10)
+    cache.put(SongMatchCache.normalize_key("Artist  - Song"), 'video_id')
+
+    assert cache.get("artist - song") == 'video_id'
+    assert cache.get_many(["artist - song", "missing"]) == {"artist - song": 'video_id'}
+
+
+def test_match_cache_ttl_and_eviction(tmp_path):
+    cache = SongMatchCache(tmp_path / 'cache.sqlite3', ttl=60, max_entries=2)
+    cache.put_many({'a': 'id_a', 'b': 'id_b'})
+    cache.get('a')  # 'b' becomes least recently used
+    cache.put('c', 'id_c')
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+
+    cache.ttl = -1
+    assert cache.get('a') is None
+
+
+def test_yt_export_songs_uses_match_cache(yt_music_handler, tmp_path):
+    handler, yt_music_mock = yt_music_handler
+    handler.match_cache = SongMatchCache(tmp_path / 'cache.sqlite3')
+    handler.match_cache.put('song 1', 'cached_id')
+    yt_music_mock.search.return_value = [{'videoId': 'searched_id', 'title': 'Song 2'}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+
+    errors_list = handler.export_songs("playlist_id", ["Song 1", "Song 2", "Song 2"])
+
+    assert errors_list == []
+    yt_music_mock.search.assert_called_once_with("Song 2", filter='songs')
+    yt_music_mock.add_playlist_items.assert_called_once_with(playlistId='playlist_id',
+                                                             videoIds=['cached_id', 'searched_id'])
+    assert handler.match_cache.get('song 2') == 'searched_id'
+
+
+def test_yt_sync_playlist_exports_only_changes(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+    handler.sync_state = SyncState(':memory:')
+    yt_music_mock.create_playlist.return_value = "synced_id"
+    yt_music_mock.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    yt_music_mock.get_playlist.return_value = {'tracks': [{'videoId': 'id_Song 1', 'setVideoId': 'set_1'},
+                                                          {'videoId': 'id_Song 2', 'setVideoId': 'set_2'}]}
+    yt_music_mock.remove_playlist_items.return_value = 'STATUS_SUCCEEDED'
+
+    assert handler.sync_playlist("spotify_id", "Playlist", "Description", "snap_1", ["Song 1", "Song 2"]) == []
+    yt_music_mock.create_playlist.assert_called_once_with("Playlist", "Description")
+
+    yt_music_mock.search.reset_mock()
+    assert handler.sync_playlist("spotify_id", "Playlist", "Description", "snap_1", ["Song 1", "Song 2"]) == []
+    yt_music_mock.search.assert_not_called()
+
+    errors_list = handler.sync_playlist("spotify_id", "Playlist", "Description", "snap_2", ["Song 2", "Song 3"],
+                                        remove_deleted=True)
+
+    assert errors_list == []
+    yt_music_mock.create_playlist.assert_called_once()
+    yt_music_mock.search.assert_called_once_with("Song 3", filter='songs')
+    yt_music_mock.add_playlist_items.assert_called_with(playlistId='synced_id', videoIds=['id_Song 3'])
+    yt_music_mock.remove_playlist_items.assert_called_once_with('synced_id', [{'videoId': 'id_Song 1',
+                                                                               'setVideoId': 'set_1'}])
+    assert handler.sync_state.get_playlist("spotify_id") == ("snap_2", "synced_id")
+    assert handler.sync_state.get_tracks("spotify_id") == {'song 2': 'id_Song 2', 'song 3': 'id_Song 3'}
+
+
+def test_yt_sync_playlist_retries_failed_songs(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+    handler.sync_state = SyncState(':memory:')
+    yt_music_mock.create_playlist.return_value = "synced_id"
+    yt_music_mock.search.side_effect = lambda song, filter: [] if song == "Song 2" else [{'videoId': f'id_{song}',
+                                                                                         'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+
+    assert handler.sync_playlist("spotify_id", "Playlist", "", "snap_1", ["Song 1", "Song 2"]) == ["Song 2"]
+    assert handler.sync_state.get_playlist("spotify_id") == (None, "synced_id")
+
+    yt_music_mock.search.reset_mock()
+    assert handler.sync_playlist("spotify_id", "Playlist", "", "snap_1", ["Song 1", "Song 2"]) == ["Song 2"]
+    yt_music_mock.search.assert_called_once_with("Song 2", filter='songs')
+
+
+def test_yt_sync_playlist_without_state_reuses_playlist_with_title(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+    handler.sync_state = SyncState(':memory:')  # e.g. the state database was deleted
+    yt_music_mock.get_library_playlists.return_value = [{'title': 'Playlist', 'playlistId': 'existing_id'}]
+    yt_music_mock.get_playlist.return_value = {'tracks': [{'videoId': 'id_Song 1', 'setVideoId': 'set_1'}]}
+    yt_music_mock.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+
+    assert handler.sync_playlist("spotify_id", "Playlist", "Description", "snap_1", ["Song 1", "Song 2"]) == []
+
+    yt_music_mock.create_playlist.assert_not_called()
+    yt_music_mock.add_playlist_items.assert_called_once_with(playlistId='existing_id', videoIds=['id_Song 2'])
+    assert handler.sync_state.get_playlist("spotify_id") == ("snap_1", "existing_id")
+    assert handler.sync_state.get_tracks("spotify_id") == {'song 1': 'id_Song 1', 'song 2': 'id_Song 2'}
+
+
 def test_yt_get_current_playlists(yt_music_handler):
     handler, yt_music_mock = yt_music_handler
     yt_music_mock.get_library_playlists.return_value = [
@@ -385,7 +1037,7 @@ def test_yt_push_to_existing_playlist(yt_music_handler):
     yt_music_mock.get_library_playlists.return_value = [
         {'title': 'Existing Playlist', 'playlistId': 'existing_id'}
     ]
-    yt_music_mock.search.return_value = [{'videoId': 'song_video_id'}]
+    yt_music_mock.search.return_value = [{'videoId': 'song_video_id', 'title': 'Song'}]
     yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
 
     songs = ["Song 1", "Song 2", "Song 3"]
@@ -409,6 +1061,64 @@ def test_yt_get_playlist_id(yt_music_handler):
     yt_music_mock.get_library_playlists.assert_called_once()
 
 
+def test_yt_get_playlist_id_of_missing_playlist_keeps_index(yt_music_handler):
+    handler, yt_music_mock = yt_music_handler
+    yt_music_mock.get_library_playlists.return_value = [
+        {'title': 'Playlist 1', 'playlistId': 'id1'},
+        {'title': 'Playlist 2', 'playlistId': 'id2'}
+    ]
+
+    assert handler.get_playlist_id("Missing") is None
+    assert handler.get_playlist_id("Missing") is None
+    assert handler.user_playlists_id == {'Playlist 1': 'id1', 'Playlist 2': 'id2'}
+    yt_music_mock.get_library_playlists.assert_called_once_with(limit=None)
+
+
+def test_playlist_index_duplicates_ttl_and_created_playlists():
+    yt_music_mock = MagicMock()
+    yt_music_mock.get_library_playlists.return_value = [
+        {'title': 'Liked Music', 'playlistId': 'LM'},
+        {'title': 'Mix', 'playlistId': 'id1'},
+        {'title': 'Mix', 'playlistId': 'id2'}
+    ]
+    now = [0.0]
+    index = PlaylistIndex(yt_music_mock, ttl=60, clock=lambda: now[0])
+
+    assert index.get_ids('Mix') == ['id1', 'id2']
+    assert index.get_id('Mix') == 'id1'
+    index.add('New', 'id3')
+    assert index.get_id('New') == 'id3'
+    assert index.titles() == ['Mix', 'New']
+    index.remove('id1')
+    assert index.get_title('id2') == 'Mix' and index.get_id('Mix') == 'id2'
+    yt_music_mock.get_library_playlists.assert_called_once()
+
+    now[0] = 61
+    assert index.get_id('Liked Music') is None
+    assert yt_music_mock.get_library_playlists.call_count == 2
+    assert index.get_ids('Mix') == ['id1', 'id2']
+
+
+def test_playlist_index_refresh_keeps_recently_added_playlists():
+    yt_music_mock = MagicMock()
+    yt_music_mock.get_library_playlists.return_value = [{'title': 'Mix', 'playlistId': 'id1'}]
+    now = [0.0]
+    index = PlaylistIndex(yt_music_mock, ttl=60, clock=lambda: now[0])
+    index.refresh()
+    now[0] = 30
+    index.add('New', 'id2')
+    index.add('Deleted', 'id3')
+    index.remove('id3')
+
+    index.refresh(force=True)  # the listing does not return the created playlist yet
+    assert index.get_id('New') == 'id2'
+    assert index.get_id('Deleted') is None
+
+    now[0] = 91
+    assert index.get_id('New') is None
+    assert yt_music_mock.get_library_playlists.call_count == 3
+
+
 @pytest.fixture(scope="session")
 def linter_auxiliary():
     """ Test codestyle for src file of auxiliary_functions.py file. """
@@ -467,3 +1177,542 @@ def test_codestyle_score_spotify_login(linter_spotify_login, limit, runs=[]):
     print(f'pylint score = {score} limit = {limit}')
     assert score >= limit
 """
+
+
+def test_load_manifest(tmp_path):
+    json_manifest = tmp_path / 'playlists.json'
+    json_manifest.write_text(json.dumps({'playlists': ['id1', {'id': 'spotify:playlist:id2', 'title': 'Title'}]}))
+    text_manifest = tmp_path / 'playlists.txt'
+    text_manifest.write_text('# comment\nhttps://open.spotify.com/playlist/id3?si=x\n\nid4\n')
+
+    assert load_manifest(json_manifest) == [{'id': 'id1', 'title': None}, {'id': 'id2', 'title': 'Title'}]
+    assert load_manifest(text_manifest) == [{'id': 'id3', 'title': None}, {'id': 'id4', 'title': None}]
+
+
+def test_batch_exporter_reports_every_playlist():
+    spotify_mock = MagicMock()
+    spotify_mock.get_playlist.side_effect = lambda playlist_id: None if playlist_id == 'missing' else {
+        'name': f'Playlist {playlist_id}', 'snapshot_id': 'snap', 'tracks': {'href': f'href_{playlist_id}'}}
+    spotify_mock.get_playlist_items.side_effect = lambda href: ["Artist - Song 1", "Artist - Song 2"]
+    yt_mock = MagicMock()
+    yt_mock.export_playlists.side_effect = lambda playlists: [songs[1:] if title == 'Playlist partial' else []
+                                                              for title, description, songs in playlists]
+    report = io.StringIO()
+
+    results = BatchExporter(spotify_mock, yt_mock, workers=2, report=report).run(
+        [{'id': 'ok', 'title': None}, {'id': 'partial', 'title': None}, {'id': 'missing', 'title': None}])
+
+    assert [result['status'] for result in results] == ['ok', 'partial', 'error']
+    assert results[1]['failed'] == ["Artist - Song 2"]
+    assert results[0]['total'] == 2
+    lines = [json.loads(line) for line in report.getvalue().splitlines()]
+    assert sorted(line['playlist_id'] for line in lines) == ['missing', 'ok', 'partial']
+    yt_mock.export_playlists.assert_called_once()
+
+
+def test_export_planner_searches_shared_songs_once():
+    yt_music_mock = MagicMock()
+    yt_music_mock.search.side_effect = lambda query, filter: [{'videoId': f'v_{query}', 'title': query.split(' - ')[1],
+                                                              'artists': [{'name': 'Artist'}]}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    handler = YTMusicHandler(None, yt_music=yt_music_mock)
+    yt_music_mock.create_playlist.side_effect = ['yt_a', 'yt_b']
+    shared = ["Artist - Shared 1", "Artist - Shared 2"]
+
+    errors = handler.export_playlists([('A', 'a', shared + ["Artist - Only A"]),
+                                       ('B', 'b', ["Artist - Only B"] + shared)])
+
+    assert errors == [[], []]
+    assert yt_music_mock.search.call_count == 4
+    added = {call.kwargs['playlistId']: call.kwargs['videoIds']
+             for call in yt_music_mock.add_playlist_items.call_args_list}
+    assert added == {'yt_a': ['v_Artist - Shared 1', 'v_Artist - Shared 2', 'v_Artist - Only A'],
+                     'yt_b': ['v_Artist - Only B', 'v_Artist - Shared 1', 'v_Artist - Shared 2']}
+
+
+def test_export_planner_fills_playlists_as_they_are_resolved(monkeypatch):
+    monkeypatch.setattr(config_variables, 'yt_add_batch_size', 2)
+    yt_music_mock = MagicMock()
+    yt_music_mock.search.side_effect = lambda query, filter: [{'videoId': f'v_{query}', 'title': query}]
+    searched_before_add = []
+    yt_music_mock.add_playlist_items.side_effect = lambda playlistId, videoIds: (
+        searched_before_add.append((playlistId, yt_music_mock.search.call_count)), {'status': 'STATUS_SUCCEEDED'})[1]
+    yt_music_mock.create_playlist.side_effect = ['yt_a', 'yt_b', 'yt_c']
+    progress = []
+
+    errors = YTMusicHandler(None, yt_music=yt_music_mock).export_playlists(
+        [('A', 'a', ["Song 1", "Song 2"]), ('B', 'b', ["Song 2", "Song 1"]), ('C', 'c', ["Song 3", "Song 4"])],
+        on_progress=lambda **kwargs: progress.append(kwargs))
+
+    assert errors == [[], [], []]
+    assert searched_before_add == [('yt_a', 2), ('yt_b', 2), ('yt_c', 4)]
+    assert progress == [{'done': 2, 'failed': 0}] * 3
+
+
+def test_gui_bulk_export_loads_missing_playlists():
+    app = MagicMock()
+    app.spotifyApi = SpotifyApi()
+    app.spotifyApi.spotify_playlists = {'A': {'tracks_api': {'href': 'href_a'}},
+                                        'B': {'tracks_api': {'href': 'href_b'}}}
+    app.spotifyApi.spotify_playlist_songs = {'A': ["Artist - Song 1"]}
+    app.spotifyApi.get_playlist_items = lambda href: ["Artist - Song 2", "Artist - Song 3"]
+    app.ytMusic.export_playlists.side_effect = lambda playlists, on_progress, cancel_event: [
+        songs[1:] if title == 'B' else [] for title, _, songs in playlists]
+
+    errors = App.export_playlists(app, ['A', 'B'])
+
+    assert errors == ['B: Artist - Song 3']
+    assert app.spotifyApi.spotify_playlist_songs['B'] == ["Artist - Song 2", "Artist - Song 3"]
+
+
+def test_gui_bulk_export_reports_playlist_that_failed_to_load():
+    app = MagicMock()
+    app.spotifyApi = SpotifyApi()
+    app.spotifyApi.spotify_playlists = {'A': {'tracks_api': {'href': 'href_a', 'total': 2}},
+                                        'B': {'tracks_api': {'href': 'href_b', 'total': 3}}}
+
+    def get_playlist_items(href):
+        if href == 'href_b':
+            raise SpotifyApiError(href, {'status': 404, 'message': 'Not found'})
+        return ["Artist - Song 1", "Artist - Song 2"]
+
+    app.spotifyApi.get_playlist_items = get_playlist_items
+    app.ytMusic.export_playlists.side_effect = lambda playlists, on_progress, cancel_event: [
+        [] for _ in playlists]
+    progress = []
+
+    errors = App.export_playlists(app, ['A', 'B'], on_progress=lambda **kwargs: progress.append(kwargs))
+
+    assert [title for title, _, _ in app.ytMusic.export_playlists.call_args.args[0]] == ['A']
+    assert len(errors) == 1 and errors[0].startswith('B: loading the playlist failed')
+    assert progress == [{'failed': 3}]
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert App.export_playlists(app, ['A'], cancel_event=cancel_event) == ['A: Artist - Song 1', 'A: Artist - Song 2']
+
+
+def test_token_store_notifies_subscribers():
+    store = TokenStore()
+    received = []
+    store.subscribe(received.append)
+    waiter = threading.Thread(target=lambda: received.append(('waited', store.wait(5))))
+    waiter.start()
+
+    store.set('access', 'refresh', expires_in=3600)
+    waiter.join(5)
+
+    assert sorted(received, key=str) == [('waited', 'access'), 'access']
+    assert store.refresh_token == 'refresh'
+
+    store.set('expired', expires_in=-1)
+    assert store.get() is None
+    assert store.refresh_token == 'refresh'
+
+
+def test_spotify_login_store_tokens():
+    login = SpotifyLogin(token_store=TokenStore())
+
+    assert login.store_tokens({'error': 'invalid_grant'}) is False
+    assert login.is_token_available() is False
+    assert login.store_tokens({'access_token': 'access', 'refresh_token': 'refresh', 'expires_in': 3600}) is True
+    assert login.is_token_available() is True
+    assert login.access_token == 'access'
+
+
+def test_token_store_encrypted_persistence(tmp_path):
+    fernet = pytest.importorskip('cryptography.fernet')
+    key = fernet.Fernet.generate_key()
+    TokenStore(tmp_path / 'token', key).set('access', 'refresh', expires_in=3600)
+
+    assert b'access' not in (tmp_path / 'token').read_bytes()
+    assert TokenStore(tmp_path / 'token', key).get() == 'access'
+
+
+def test_token_manager_refreshes_once_before_expiry():
+    store = TokenStore()
+    store.set('old', 'refresh', expires_in=30)
+    calls = []
+
+    def refresh(refresh_token):
+        calls.append(refresh_token)
+        time.sleep(0.05)
+        return {'access_token': 'new', 'expires_in': 3600}
+
+    received = []
+    store.subscribe(received.append)
+    manager = TokenManager(store, refresh, margin=60)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(executor.map(lambda _: manager.get_token(), range(8)))
+
+    assert tokens == ['new'] * 8
+    assert calls == ['refresh']
+    assert received == ['old']  # a refresh is not a login, subscribers are not notified again
+    assert store.refresh_token == 'refresh'
+
+
+def test_token_manager_keeps_token_when_refresh_request_fails():
+    store = TokenStore()
+    store.set('old', 'refresh', expires_in=3600)
+
+    def refresh(refresh_token):
+        raise requests.exceptions.ConnectionError("offline")
+
+    assert TokenManager(store, refresh).refresh('old') == 'old'
+
+
+def test_http_client_retries_401_after_refresh():
+    store = TokenStore()
+    store.set('old', 'refresh', expires_in=3600)
+    manager = TokenManager(store, lambda refresh_token: {'access_token': 'new', 'expires_in': 3600})
+    session = MagicMock()
+    session.request.side_effect = [MagicMock(status_code=401), MagicMock(status_code=200)]
+
+    response = HttpClient(session=session, token_manager=manager).get("url")
+
+    assert response.status_code == 200
+    assert [call.kwargs['headers']['Authorization'] for call in session.request.call_args_list] == \
+        ['Bearer old', 'Bearer new']
+
+
+def test_spotify_api_refreshes_token_for_user_playlists():
+    store = TokenStore()
+    store.set('old', 'refresh', expires_in=3600)
+    api = SpotifyApi(token_manager=TokenManager(store, lambda refresh_token: {'access_token': 'new'}))
+    api.access_token = 'old'
+    api.http.session = MagicMock()
+    api.http.session.request.side_effect = [MagicMock(status_code=401),
+                                            MagicMock(status_code=200, json=lambda: {'items': []})]
+
+    assert api.get_user_playlists() == {'items': []}
+    assert [call.kwargs['headers']['Authorization'] for call in api.http.session.request.call_args_list] == \
+        ['Bearer old', 'Bearer new']
+
+
+def test_fake_spotify_server_pages_with_throttling():
+    with FakeSpotifyServer(playlists=3, playlist_sizes={'pl1': 250}, throttle_every=3) as server, \
+            offline_spotify(server) as spotify:
+        spotify.get_all_playlists()
+        tracks = spotify.get_playlist_items(spotify.spotify_playlists['Playlist 1']['tracks_api']['href'])
+
+    assert len(spotify.spotify_playlists) == 3
+    assert [track.title for track in tracks] == [f'Song {i}' for i in range(250)]
+    assert server.throttled > 0
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_iter_playlist_items_streams_pages_in_order(workers):
+    with FakeSpotifyServer(playlists=1, playlist_sizes={'pl0': 1050}) as server, \
+            offline_spotify(server) as spotify:
+        href = f'{server.base_url}/v1/playlists/pl0/tracks'
+        streamed = spotify.iter_playlist_items(href, workers=workers)
+        first = next(streamed)
+        streamed.close()
+        requests_after_close = server.requests
+        tracks = list(spotify.iter_playlist_items(href, workers=workers))
+        async_tracks = asyncio.run(collect_async_tracks(AsyncSpotifyApi(spotify), href))
+
+    assert first.title == 'Song 0'
+    assert requests_after_close <= 1 + workers
+    assert [track.title for track in tracks] == [f'Song {i}' for i in range(1050)]
+    assert async_tracks == tracks
+
+
+async def collect_async_tracks(api, href):
+    return [track async for track in api.iter_playlist_items(href)]
+
+
+def test_export_engine_exports_streamed_songs_in_batches(yt_music_handler, monkeypatch):
+    monkeypatch.setattr(config_variables, 'yt_add_batch_size', 2)
+    handler, yt_music_mock = yt_music_handler
+    yt_music_mock.search.side_effect = lambda song, filter: [] if song == "Song 3" else [{'videoId': f'id_{song}',
+                                                                                         'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    progress = []
+
+    errors = handler.export_songs("playlist_id", (f"Song {i}" for i in range(5)),
+                                  on_progress=lambda **kwargs: progress.append(kwargs))
+
+    assert errors == ["Song 3"]
+    assert progress == [{'done': 2, 'failed': 0}, {'done': 1, 'failed': 1}, {'done': 1, 'failed': 0}]
+
+
+def test_export_pipeline_adds_in_order_with_bounded_queues():
+    yt_music = MagicMock()
+    yt_music.search.side_effect = lambda song, filter: (time.sleep(0.001 * (hash(song) % 5)),
+                                                        [{'videoId': f'id_{song}', 'title': song}])[1]
+    yt_music.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    added = []
+    yt_music.add_playlist_items.side_effect = lambda playlistId, videoIds: (added.extend(videoIds),
+                                                                            {'status': 'STATUS_SUCCEEDED'})[1]
+    ahead = []
+
+    def songs():
+        for i in range(60):
+            ahead.append(i - len(added))
+            yield f"Song {i}"
+
+    pipeline = ExportPipeline(ExportEngine(yt_music, workers=4, batch_size=10), queue_size=4)
+    with patch('src.YTmusicHandler.export_pipeline.RESOLVE_CHUNK', 2):
+        errors = pipeline.export("playlist_id", songs())
+
+    assert errors == []
+    assert added == [f'id_Song {i}' for i in range(60)]
+    assert max(ahead) < 40
+    assert set(pipeline.stats) == {'fetch', 'resolve', 'add'}
+    assert pipeline.stats['resolve']['items'] == 60
+    assert all(0 <= stats['utilization'] <= 1 for stats in pipeline.stats.values())
+
+
+def test_export_pipeline_stops_on_fetch_error_and_cancel():
+    yt_music = MagicMock()
+    yt_music.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+
+    def failing_songs():
+        yield "Song 0"
+        raise ValueError("page could not be retrieved")
+
+    with pytest.raises(ValueError):
+        ExportPipeline(ExportEngine(yt_music, batch_size=2)).export("playlist_id", failing_songs())
+
+    cancel_event = threading.Event()
+    errors = ExportPipeline(ExportEngine(yt_music, batch_size=2)).export(
+        "playlist_id", (f"Song {i}" for i in range(1000)), on_progress=lambda **_: cancel_event.set(),
+        cancel_event=cancel_event)
+
+    assert yt_music.add_playlist_items.call_count == 1
+    assert errors == [f"Song {i}" for i in range(2, 2 + len(errors))]
+    assert len(errors) < 998
+
+
+def test_bench_export_records_cold_and_warm_cache():
+    results = bench_export([10], repeat=1)
+
+    assert [(result['name'], result['params']) for result in results] == [
+        ('export', {'tracks': 10, 'cache': 'cold'}), ('export', {'tracks': 10, 'cache': 'warm'})]
+    assert all(result['min'] > 0 for result in results)
+
+
+def test_metrics_record_http_calls_and_cache(yt_music_handler, tmp_path):
+    registry = Metrics(enabled=True)
+    session = MagicMock()
+    session.request.return_value = MagicMock(status_code=200, content=b'12345')
+    handler, yt_music_mock = yt_music_handler
+    handler.match_cache = SongMatchCache(tmp_path / 'cache.sqlite3')
+    handler.match_cache.put('song 1', 'cached_id')
+    yt_music_mock.search.return_value = [{'videoId': 'searched_id', 'title': 'Song 2'}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+
+    with patch.object(metrics.get_metrics, 'instance', registry):
+        HttpClient(session=session).get("https://api.spotify.com/v1/playlists/abc123/tracks?offset=100")
+        handler.export_songs("playlist_id", ["Song 1", "Song 2"])
+
+    summary = registry.summary()
+    assert summary['operations']['GET /v1/playlists/{id}/tracks']['count'] == 1
+    assert summary['operations']['ytmusic.search']['count'] == 1
+    assert summary['operations']['yt.export_songs']['count'] == 1
+    assert summary['counters']['bytes_received'] == {'GET /v1/playlists/{id}/tracks': 5}
+    assert summary['counters']['cache_hits'] == {'match_cache': 1}
+    assert summary['counters']['cache_misses'] == {'match_cache': 1}
+    assert 'senyafy_operation_duration_seconds_count{operation="ytmusic.search"} 1' in registry.to_prometheus()
+
+
+def test_metrics_label_retries_with_endpoint():
+    registry = Metrics(enabled=True)
+    session = MagicMock()
+    session.request.side_effect = [MagicMock(status_code=503, headers={}, content=b''),
+                                   requests.exceptions.Timeout("slow"), MagicMock(status_code=200, content=b'')]
+    scheduler = RequestScheduler(bucket=TokenBucket(rate=100, capacity=100), max_retries=2, sleep=lambda s: None)
+
+    with patch.object(metrics.get_metrics, 'instance', registry):
+        HttpClient(session=session, scheduler=scheduler).get("https://api.spotify.com/v1/playlists/abc123/tracks")
+
+    assert registry.summary()['counters']['retries'] == {
+        'GET api.spotify.com/v1/playlists/{id}/tracks 503': 1,
+        'GET api.spotify.com/v1/playlists/{id}/tracks Timeout': 1}
+
+
+def test_metrics_disabled_records_nothing():
+    registry = Metrics(enabled=False)
+    registry.observe("operation", 0.1)
+    registry.count("retries", "429")
+    with registry.timer("operation"):
+        pass
+
+    assert registry.summary() == {'operations': {}, 'counters': {}}
+
+
+def test_library_mirror_roundtrip():
+    mirror = LibraryMirror(':memory:')
+    playlists = {'Mix': {'images': [{'url': 'cover'}], 'tracks_api': {'href': 'mix_url', 'total': 2},
+                         'id': 'mix', 'snapshot_id': 's1'},
+                 'Empty': {'images': None, 'tracks_api': {'href': 'empty_url', 'total': 0},
+                           'id': 'empty', 'snapshot_id': 's1'}}
+    tracks = TrackList([Track('Song (Remastered)', ('Artist', 'Guest'), 'Album', 200000, 'ISRC1', 'id1'),
+                        Track('Local Song', ('Someone',))])
+    mirror.save_playlists(playlists)
+    mirror.save_tracks('Mix', tracks)
+
+    assert mirror.load_playlists() == playlists
+    assert mirror.stale_playlists() == ['Empty']
+    assert mirror.load_tracks('Mix') == tracks
+    assert mirror.find_tracks(isrc='ISRC1') == [tracks[0]]
+    assert mirror.find_tracks(title='song remastered', artists=('artist', 'guest')) == [tracks[0]]
+    assert mirror.find_tracks(track_id='missing') == []
+
+    mirror.save_playlists({'Empty': playlists['Empty']})
+
+    assert mirror.load_tracks('Mix') == TrackList()
+    assert mirror.find_tracks(isrc='ISRC1') == []
+
+
+def test_library_mirror_removes_only_orphaned_tracks():
+    mirror = LibraryMirror(':memory:')
+    mirror.save_playlists({name: {'images': None, 'tracks_api': {'href': name, 'total': 2}, 'id': name,
+                                  'snapshot_id': 's1'} for name in ('A', 'B')})
+    shared = Track('Shared', ('Artist',), isrc='ISRC1')
+    only_a = Track('Only A', ('Artist',), isrc='ISRC2')
+    mirror.save_tracks('A', TrackList([shared, only_a]))
+    mirror.save_tracks('B', TrackList([shared]))
+
+    mirror.save_tracks('A', TrackList([Track('New', ('Artist',))]))
+
+    assert mirror.find_tracks(isrc='ISRC1') == [shared]
+    assert mirror.find_tracks(isrc='ISRC2') == []
+
+
+def test_refresh_library_reloads_only_changed_playlists(spotify_api_instance):
+    spotify_api_instance.mirror = LibraryMirror(':memory:')
+    snapshots = {'A': 's1', 'B': 's1'}
+
+    def get_all_playlists(api):
+        api.spotify_playlists = {
+            name: {'images': None, 'tracks_api': {'href': name, 'total': 1}, 'id': name, 'snapshot_id': snapshot}
+            for name, snapshot in snapshots.items()}
+        return True
+
+    spotify_api_instance.get_all_playlists = lambda: get_all_playlists(spotify_api_instance)
+    assert spotify_api_instance.refresh_library() == ['A', 'B']
+    for name in snapshots:
+        spotify_api_instance.store_playlist_songs(name, TrackList([Track(f'Song {name}', ('Artist',))]))
+
+    snapshots['B'] = 's2'
+    restarted = SpotifyApi(mirror=spotify_api_instance.mirror)
+    restarted.get_all_playlists = lambda: get_all_playlists(restarted)
+    restarted.load_from_mirror()
+
+    assert list(restarted.spotify_playlist_songs) == ['A', 'B']
+    assert restarted.refresh_library() == ['B']
+    assert list(restarted.spotify_playlist_songs) == ['A']
+    assert restarted.spotify_playlist_songs['A'].labels() == ['Artist - Song A']
+
+
+def test_refresh_library_keeps_library_when_listing_fails(spotify_api_instance, monkeypatch):
+    spotify_api_instance.mirror = LibraryMirror(':memory:')
+    playlists = {'A': {'images': None, 'tracks_api': {'href': 'A', 'total': 1}, 'id': 'A', 'snapshot_id': 's1'}}
+    spotify_api_instance.mirror.save_playlists(playlists)
+    spotify_api_instance.load_from_mirror()
+    monkeypatch.setattr(spotify_api_instance, "get_user_playlists", lambda: None)
+
+    assert spotify_api_instance.refresh_library() == []
+    assert spotify_api_instance.spotify_playlists == playlists
+    assert spotify_api_instance.mirror.load_playlists() == playlists
+
+
+def test_interrupted_export_resumes_from_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_variables, 'yt_add_batch_size', 2)
+    yt_music_mock = MagicMock()
+    yt_music_mock.create_playlist.return_value = 'yt_id'
+    yt_music_mock.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    songs = ["Song 1", "Song 2", "Song 3", "Song 4", "Song 5"]
+    cancel_event = threading.Event()
+
+    first_run = YTMusicHandler(None, yt_music=yt_music_mock, journal_dir=tmp_path)
+    errors = first_run.create_playlist_push_songs("Mix", "", songs, on_progress=lambda **_: cancel_event.set(),
+                                                  cancel_event=cancel_event)
+    assert errors == songs[2:]
+    assert len(list(tmp_path.iterdir())) == 1
+
+    yt_music_mock.search.reset_mock()
+    yt_music_mock.add_playlist_items.reset_mock()
+    progress = []
+    second_run = YTMusicHandler(None, yt_music=yt_music_mock, journal_dir=tmp_path)
+
+    assert second_run.create_playlist_push_songs("Mix", "", songs,
+                                                 on_progress=lambda **kwargs: progress.append(kwargs)) == []
+    yt_music_mock.create_playlist.assert_called_once()
+    assert sorted(call.args[0] for call in yt_music_mock.search.call_args_list) == songs[2:]
+    assert progress[0] == {'done': 2, 'failed': 0}
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('songs_factory', [list, iter])
+def test_journaled_export_keeps_duplicated_songs(tmp_path, monkeypatch, songs_factory):
+    monkeypatch.setattr(config_variables, 'yt_add_batch_size', 2)
+    yt_music_mock = MagicMock()
+    yt_music_mock.create_playlist.return_value = 'yt_id'
+    yt_music_mock.search.side_effect = lambda song, filter: [{'videoId': f'id_{song}', 'title': song}]
+    yt_music_mock.add_playlist_items.return_value = {'status': 'STATUS_SUCCEEDED'}
+    progress = []
+
+    handler = YTMusicHandler(None, yt_music=yt_music_mock, journal_dir=tmp_path)
+    errors = handler.create_playlist_push_songs("Mix", "", songs_factory(["Song 1", "Song 2", "Song 3", "Song 1"]),
+                                                on_progress=lambda **kwargs: progress.append(kwargs))
+
+    assert errors == []
+    added = [video_id for call in yt_music_mock.add_playlist_items.call_args_list
+             for video_id in call.kwargs['videoIds']]
+    assert added == ['id_Song 1', 'id_Song 2', 'id_Song 3', 'id_Song 1']
+    assert progress == [{'done': 2, 'failed': 0}, {'done': 2, 'failed': 0}]
+
+
+def test_streamed_exports_do_not_share_journals(tmp_path):
+    handler = YTMusicHandler(None, yt_music=MagicMock(), journal_dir=tmp_path)
+    handler.playlists.refresh = MagicMock()
+
+    first = handler.open_journal('new:Mix', iter(["Song 1"]), source='spotify_a:snap_1')
+    first.record_added(['song 1'])
+    first.close()
+
+    assert handler.open_journal('new:Mix', iter(["Song 2"]), source='spotify_b:snap_1').added == set()
+    assert handler.open_journal('new:Mix', iter(["Song 1"]), source='spotify_a:snap_1').added == {'song 1'}
+    assert handler.open_journal('new:Mix', iter(["Song 1"])) is None
+    assert handler.push_to_existing_playlist('Missing', ["Song 1"]) == ["Song 1"]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_export_journal_ignores_partly_written_record(tmp_path):
+    journal = ExportJournal(tmp_path / 'journal.ndjson', fsync_every=2)
+    journal.record_playlist('yt_id')
+    journal.record_resolved({'song 1': 'video_1'})
+    journal.record_added(['song 1'])
+    journal.close()
+    with open(tmp_path / 'journal.ndjson', 'a', encoding='utf-8') as f:
+        f.write('{"type": "added", "keys": ["song')
+
+    replayed = ExportJournal(tmp_path / 'journal.ndjson')
+
+    assert replayed.resumed and replayed.playlist_id == 'yt_id'
+    assert replayed.resolved == {'song 1': 'video_1'}
+    assert replayed.added == {'song 1'}
+    replayed.record_added(['song 2'])
+    replayed.close()
+    assert ExportJournal(tmp_path / 'journal.ndjson').added == {'song 1', 'song 2'}
+
+
+def test_gui_import_loads_heavy_modules_lazily():
+    result = bench_import_time(['src.gui.app'], repeat=1)[0]
+
+    assert result['eager'] == []
+    assert result['min'] <= result['limit']
+
+
+def test_icon_store_decodes_each_icon_once_pre_sized():
+    store = IconStore()
+
+    icon = store.decode('youtube.png', (20, 20))
+
+    assert icon.size == (40, 40)
+    assert store.decode('youtube.png', (20, 20)) is icon